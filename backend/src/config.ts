@@ -11,5 +11,15 @@ export const config = {
     serviceUrl: Bun.env.LLM_SERVICE_URL || 'http://host.containers.internal:8011',
     timeout: parseInt(Bun.env.LLM_TIMEOUT || '30000', 10),
     contextMaxFields: parseInt(Bun.env.CONTEXT_MAX_FIELDS || '16', 10),
+    // The LLM service selects the most relevant contextMaxFields fields for the prompt,
+    // so the world itself may grow up to this limit
+    contextHardMaxFields: parseInt(Bun.env.CONTEXT_HARD_MAX_FIELDS || '128', 10),
+    // Request/response body format for the LLM service: 'json' or 'msgpack'
+    wireFormat: Bun.env.LLM_WIRE_FORMAT === 'msgpack' ? 'msgpack' : 'json',
+    // 'http': one request per generation; 'websocket': all generations multiplexed over one
+    // long-lived connection to the service's /ws/generate channel
+    transport: Bun.env.LLM_TRANSPORT === 'websocket' ? 'websocket' : 'http',
+    // Streamed deltas the service may send ahead of the client (WebSocket flow control)
+    streamWindow: parseInt(Bun.env.LLM_STREAM_WINDOW || '64', 10),
   },
 };
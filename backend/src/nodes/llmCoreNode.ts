@@ -31,7 +31,9 @@ export class LLMCoreNode extends BaseNode {
         req.userInput,
         req.inputType,
         context,
-        req.preLogSummary
+        req.preLogSummary,
+        req.elapsedSeconds,
+        req.sessionId
       );
 
       console.log(`[LLMCoreNode] Event generated: ${event.description}`);
@@ -69,7 +71,9 @@ export class LLMCoreNode extends BaseNode {
     userInput: string,
     inputType: 'action' | 'question',
     context: Context,
-    preLogSummary?: { summary: string; recentEvents: string[] }
+    preLogSummary?: { summary: string; recentEvents: string[] },
+    elapsedSeconds?: number,
+    sessionId?: string
   ): Promise<Event> {
     // Convert preLogSummary to snake_case for LLM service
     const preLogSummaryForService = preLogSummary
@@ -85,7 +89,9 @@ export class LLMCoreNode extends BaseNode {
       context,
       userInput,
       inputType,
-      preLogSummaryForService
+      preLogSummaryForService,
+      elapsedSeconds,
+      sessionId
     );
 
     // Call LLM service
@@ -96,6 +102,10 @@ export class LLMCoreNode extends BaseNode {
       throw new Error(`LLM generation failed: ${response.message} (${response.error_code})`);
     }
 
+    if (response.degraded) {
+      console.warn(`[LLMCoreNode] Degraded result from the LLM service: ${response.message}`);
+    }
+
     // Parse result
     if (!response.result) {
       throw new Error('LLM response missing result field');
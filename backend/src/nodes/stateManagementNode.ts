@@ -1,7 +1,8 @@
 import { BaseNode, PluginNodeMetadata } from '../core/pluginNode.ts';
 import { Context, ContextField } from '../types/index.ts';
+import { config } from '../config.ts';
 
-const MAX_CONTEXT_FIELDS = 16;
+const MAX_CONTEXT_FIELDS = config.llm.contextHardMaxFields;
 
 /**
  * State Management Node
@@ -19,6 +19,8 @@ export class TimeManagementNode extends BaseNode {
     // Increment game time by 1 hour per step (3600 seconds)
     const timeIncrement = 3600;
     context.gameTime += timeIncrement;
+    // Drives the LLM service's deterministic context rules (hunger, energy, ...)
+    (request as any).elapsedSeconds = timeIncrement;
 
     console.log(`[TimeManagementNode] Updated game time: ${context.gameTime}`);
 
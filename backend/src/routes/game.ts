@@ -136,7 +136,7 @@ gameRouter.post('/step', async (c) => {
     const chain = createProcessingChain();
 
     // Prepare request object
-    const request = { input };
+    const request = { input, sessionId };
 
     // Execute processing chain
     await chain.execute(request, currentContext);
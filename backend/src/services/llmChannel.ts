@@ -0,0 +1,184 @@
+import { encode, decode } from '@msgpack/msgpack';
+import { LLMGenerationRequest, LLMGenerationResponse } from '../types/index.ts';
+
+/**
+ * Message sent by the LLM service on the generation channel
+ */
+interface ChannelMessage {
+  type: 'delta' | 'end' | 'result' | 'cancelled' | 'error';
+  id: string | number | null;
+  content?: string;
+  response?: LLMGenerationResponse;
+  error_code?: string;
+  message?: string;
+}
+
+interface PendingExchange {
+  resolve: (response: LLMGenerationResponse | null) => void;
+  reject: (error: Error) => void;
+  onDelta?: (content: string) => void;
+  timer: ReturnType<typeof setTimeout>;
+  // Deltas received since credit was last granted
+  received: number;
+}
+
+/**
+ * LLM Channel
+ * Multiplexes generation requests over one long-lived WebSocket to the LLM
+ * service's /ws/generate endpoint. Requests are tagged with an ID; streamed
+ * deltas are acknowledged with credit so the service never runs more than
+ * `window` deltas ahead.
+ */
+export class LLMChannel {
+  private url: string;
+  private useMsgpack: boolean;
+  private timeout: number;
+  private window: number;
+  private socket: WebSocket | null = null;
+  private connecting: Promise<WebSocket> | null = null;
+  private pending = new Map<string, PendingExchange>();
+  private nextId = 1;
+
+  constructor(serviceUrl: string, useMsgpack: boolean, timeout: number, window: number) {
+    this.url = `${serviceUrl.replace(/^http/, 'ws')}/ws/generate`;
+    this.useMsgpack = useMsgpack;
+    this.timeout = timeout;
+    this.window = window;
+  }
+
+  /**
+   * Run a generation to its final response
+   */
+  async generate(request: LLMGenerationRequest): Promise<LLMGenerationResponse> {
+    const response = await this.exchange({ ...request, stream: false });
+    if (!response) {
+      throw new Error('LLM channel ended the request without a response');
+    }
+    return response;
+  }
+
+  /**
+   * Run a streaming generation, passing each content delta to onDelta.
+   * Resolves with null when the stream completes, or with the service's
+   * response when it rejected the request before generating.
+   */
+  async stream(request: LLMGenerationRequest, onDelta: (content: string) => void): Promise<LLMGenerationResponse | null> {
+    return this.exchange({ ...request, stream: true }, onDelta);
+  }
+
+  private async exchange(
+    request: LLMGenerationRequest,
+    onDelta?: (content: string) => void
+  ): Promise<LLMGenerationResponse | null> {
+    const socket = await this.connect();
+    const id = String(this.nextId++);
+
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.send(socket, { type: 'cancel', id });
+        this.settle(id)?.reject(new Error(`LLM channel request timed out after ${this.timeout}ms`));
+      }, this.timeout);
+
+      this.pending.set(id, { resolve, reject, onDelta, timer, received: 0 });
+      this.send(socket, {
+        type: 'generate',
+        id,
+        request,
+        window: onDelta ? this.window : undefined,
+      });
+    });
+  }
+
+  private connect(): Promise<WebSocket> {
+    if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+      return Promise.resolve(this.socket);
+    }
+    if (this.connecting) {
+      return this.connecting;
+    }
+
+    this.connecting = new Promise<WebSocket>((resolve, reject) => {
+      console.log(`[LLMChannel] Connecting to ${this.url}`);
+      const socket = new WebSocket(this.url);
+      socket.binaryType = 'arraybuffer';
+
+      socket.onopen = () => {
+        this.socket = socket;
+        this.connecting = null;
+        resolve(socket);
+      };
+      socket.onmessage = (event) => this.receive(event.data);
+      socket.onerror = () => {
+        if (this.connecting) {
+          this.connecting = null;
+          reject(new Error(`Cannot connect to ${this.url}`));
+        }
+      };
+      socket.onclose = () => {
+        console.warn(`[LLMChannel] Connection closed, failing ${this.pending.size} pending requests`);
+        if (this.socket === socket) {
+          this.socket = null;
+        }
+        for (const id of [...this.pending.keys()]) {
+          this.settle(id)?.reject(new Error('LLM channel connection closed'));
+        }
+      };
+    });
+    return this.connecting;
+  }
+
+  private send(socket: WebSocket, message: Record<string, unknown>): void {
+    if (socket.readyState !== WebSocket.OPEN) {
+      return;
+    }
+    socket.send(this.useMsgpack ? encode(message) : JSON.stringify(message));
+  }
+
+  private receive(data: string | ArrayBuffer): void {
+    const message = (
+      typeof data === 'string' ? JSON.parse(data) : decode(new Uint8Array(data))
+    ) as ChannelMessage;
+    const id = message.id === null ? null : String(message.id);
+
+    if (id === null || !this.pending.has(id)) {
+      if (message.type === 'error') {
+        console.error(`[LLMChannel] Channel error: ${message.error_code} - ${message.message}`);
+      }
+      return;
+    }
+
+    const exchange = this.pending.get(id)!;
+    switch (message.type) {
+      case 'delta':
+        exchange.onDelta?.(message.content ?? '');
+        // Grant credit in batches of half the window
+        exchange.received += 1;
+        if (this.socket && exchange.received >= Math.max(1, Math.floor(this.window / 2))) {
+          this.send(this.socket, { type: 'credit', id, credits: exchange.received });
+          exchange.received = 0;
+        }
+        break;
+      case 'end':
+        this.settle(id)?.resolve(null);
+        break;
+      case 'result':
+        this.settle(id)?.resolve(message.response ?? null);
+        break;
+      case 'cancelled':
+        this.settle(id)?.reject(new Error('LLM channel request cancelled'));
+        break;
+      case 'error':
+        this.settle(id)?.reject(new Error(`${message.error_code}: ${message.message}`));
+        break;
+    }
+  }
+
+  private settle(id: string): PendingExchange | undefined {
+    const exchange = this.pending.get(id);
+    if (exchange) {
+      clearTimeout(exchange.timer);
+      this.pending.delete(id);
+    }
+    return exchange;
+  }
+}
@@ -1,4 +1,6 @@
+import { encode, decode } from '@msgpack/msgpack';
 import { config } from '../config.ts';
+import { LLMChannel } from './llmChannel.ts';
 import { LLMGenerationRequest, LLMGenerationResponse, SchemaField, ContextField, Context } from '../types/index.ts';
 
 /**
@@ -8,10 +10,16 @@ import { LLMGenerationRequest, LLMGenerationResponse, SchemaField, ContextField,
 export class LLMClient {
   private serviceUrl: string;
   private timeout: number;
+  private useMsgpack: boolean;
+  private channel: LLMChannel | null;
 
   constructor() {
     this.serviceUrl = config.llm.serviceUrl;
     this.timeout = config.llm.timeout;
+    this.useMsgpack = config.llm.wireFormat === 'msgpack';
+    this.channel = config.llm.transport === 'websocket'
+      ? new LLMChannel(this.serviceUrl, this.useMsgpack, this.timeout, config.llm.streamWindow)
+      : null;
   }
 
   /**
@@ -19,16 +27,27 @@ export class LLMClient {
    */
   async generateStructured(request: LLMGenerationRequest): Promise<LLMGenerationResponse> {
     try {
+      if (this.channel) {
+        const data = await this.channel.generate(request);
+        console.log(`[LLMClient] Channel response success: ${data.success}`);
+        if (!data.success) {
+          console.error(`[LLMClient] LLM error: ${data.error_code} - ${data.message}`);
+        }
+        return data;
+      }
+
       console.log(`[LLMClient] Sending request to ${this.serviceUrl}/generate_structured`);
       console.log(`[LLMClient] Request context fields: ${Object.keys(request.context).length}`);
       console.log(`[LLMClient] Request user_input: ${request.user_input}`);
 
+      const contentType = this.useMsgpack ? 'application/msgpack' : 'application/json';
       const response = await fetch(`${this.serviceUrl}/generate_structured`, {
         method: 'POST',
         headers: {
-          'Content-Type': 'application/json',
+          'Content-Type': contentType,
+          Accept: contentType,
         },
-        body: JSON.stringify(request),
+        body: this.useMsgpack ? encode(request) : JSON.stringify(request),
         signal: AbortSignal.timeout(this.timeout),
       });
 
@@ -40,16 +59,20 @@ export class LLMClient {
         throw new Error(`LLM service returned ${response.status}: ${response.statusText}`);
       }
 
-      const responseText = await response.text();
-      console.log(`[LLMClient] Raw response: ${responseText.substring(0, 500)}`);
-
       let data: LLMGenerationResponse;
-      try {
-        data = JSON.parse(responseText);
-      } catch (parseError) {
-        console.error(`[LLMClient] Failed to parse JSON response: ${parseError}`);
-        console.error(`[LLMClient] Response text: ${responseText}`);
-        throw parseError;
+      if (response.headers.get('content-type')?.startsWith('application/msgpack')) {
+        data = decode(new Uint8Array(await response.arrayBuffer())) as LLMGenerationResponse;
+      } else {
+        const responseText = await response.text();
+        console.log(`[LLMClient] Raw response: ${responseText.substring(0, 500)}`);
+
+        try {
+          data = JSON.parse(responseText);
+        } catch (parseError) {
+          console.error(`[LLMClient] Failed to parse JSON response: ${parseError}`);
+          console.error(`[LLMClient] Response text: ${responseText}`);
+          throw parseError;
+        }
       }
 
       console.log(`[LLMClient] Response success: ${data.success}`);
@@ -74,7 +97,9 @@ export class LLMClient {
     context: Context,
     userInput: string,
     inputType: 'action' | 'question',
-    preLogSummary?: { summary: string; recent_events: string[] }
+    preLogSummary?: { summary: string; recent_events: string[] },
+    elapsedSeconds?: number,
+    sessionId?: string
   ): LLMGenerationRequest {
     // Build user-specific prompt instruction
     const userPromptInstruction = this.buildUserPromptInstruction(inputType);
@@ -98,6 +123,9 @@ export class LLMClient {
       user_input: userInput,
       schema,
       stream: false,
+      elapsed_seconds: elapsedSeconds,
+      // Lets the service keep per-session state (speculative results, input history)
+      session_id: sessionId,
     };
   }
 
@@ -136,6 +136,9 @@ export interface LLMGenerationRequest {
   };
   stream?: boolean;
   model?: string;
+  // Game time elapsed since the previous step (drives the service's context rules)
+  elapsed_seconds?: number;
+  session_id?: string;
 }
 
 /**
@@ -150,4 +153,6 @@ export interface LLMGenerationResponse {
   error_code?: string;
   validation_errors?: ValidationResult[];
   fix_suggestion?: string;
+  // Result made by the LLM service's local fallback while the upstream is down or overloaded
+  degraded?: boolean;
 }
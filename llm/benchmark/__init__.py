@@ -0,0 +1,4 @@
+"""
+Benchmarks for the OpenAI LLM Service
+Run from the llm directory, e.g. `python -m benchmark.prompt_encoding`.
+"""
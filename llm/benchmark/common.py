@@ -0,0 +1,60 @@
+"""Shared benchmark fixtures"""
+
+import os
+from typing import Dict, Any
+
+# The service configuration requires an API key even for offline benchmarks
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-offline")
+
+EVENT_SCHEMA = {
+    "event_description": {
+        "type": "string",
+        "description": "Narrative description of what happens in the game world. Should be 3-5 sentences, vivid and immersive, directly responding to the player action."
+    },
+    "context_changes": {
+        "type": "object",
+        "description": "Object containing only the context fields that changed. Each field should have {value, type, description}. Use null to remove a field."
+    }
+}
+
+PROMPT = "You are an AI game master for WordVoyage. Generate an event describing what happens in the game world as a result of the player's action. Update only the context fields that change."
+
+PRE_LOG_SUMMARY = {
+    "summary": "You crash-landed on an unknown planet and salvaged what you could from the wreckage.",
+    "recent_events": [
+        "You pulled a medical kit from the cargo bay.",
+        "A distant howl echoed across the red dunes.",
+        "The emergency beacon flickered and went silent."
+    ]
+}
+
+
+def build_context(field_count: int) -> Dict[str, Dict[str, Any]]:
+    """Build a realistic context with scalar and nested fields"""
+    context = {
+        "health": {"value": 85, "type": "number", "description": "Health points"},
+        "hunger": {"value": 40, "type": "number", "description": "Hunger level (higher is hungrier)"},
+        "thirst": {"value": 55, "type": "number", "description": "Thirst level (higher is thirstier)"},
+        "energy": {"value": 70, "type": "number", "description": "Energy level"},
+        "location": {"value": "Crashed Spaceship", "type": "string", "description": "Current location"},
+        "weather": {"value": "Dust storm approaching", "type": "string", "description": "Current weather conditions"},
+        "inventory": {
+            "value": ["medical kit", "flashlight", "ration pack", "multitool"],
+            "type": "array",
+            "description": "Items carried by the player"
+        },
+        "ship_status": {
+            "value": {"hull": 35, "engine": "destroyed", "beacon": {"power": 5, "active": False}},
+            "type": "object",
+            "description": "Condition of the crashed spaceship"
+        },
+    }
+    index = 0
+    while len(context) < field_count:
+        context[f"discovery_{index}"] = {
+            "value": {"name": f"Alien artifact {index}", "studied": index % 2 == 0, "notes": ["glows at night"]},
+            "type": "object",
+            "description": f"Details about discovered artifact number {index}"
+        }
+        index += 1
+    return dict(list(context.items())[:field_count])
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Event-loop lag benchmark
+
+Parses large model responses (reasoning text followed by the JSON object)
+while a timer measures how late the event loop runs, once with every parse
+on the loop and once through the size-aware offloader.
+"""
+
+import argparse
+import asyncio
+import json
+
+from . import common  # noqa: F401  (offline service configuration)
+from src.offload import LoopLagMonitor, Offloader
+from src.openai_client import parse_json_content
+
+
+def build_content(size: int) -> str:
+    reasoning = "The traveller weighs the options carefully. " * (size // 44)
+    result = {"event_description": "The storm passes.", "context_changes": {"energy": {"value": 60, "type": "number"}}}
+    return f"{reasoning}\n{json.dumps(result)}"
+
+
+async def run_case(offloader: Offloader, content: str, parses: int, concurrency: int) -> dict:
+    monitor = LoopLagMonitor(interval=0.005, window=100000)
+    monitor.start()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def parse():
+        async with semaphore:
+            await offloader.run(len(content), parse_json_content, content, None)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await asyncio.gather(*(parse() for _ in range(parses)))
+    elapsed = loop.time() - started
+    await asyncio.sleep(0.01)
+    monitor.stop()
+    return dict(monitor.snapshot(), seconds=round(elapsed, 2))
+
+
+async def run_benchmark(sizes, parses: int, concurrency: int, workers: int, kind: str):
+    print(f"{'chars':>8} | {'mode':>7} | {'seconds':>7} | {'lag p50 ms':>10} | {'lag p99 ms':>10} | {'lag max ms':>10}")
+    for size in sizes:
+        content = build_content(size)
+        cases = {
+            "inline": Offloader(inline_max_chars=len(content), workers=0),
+            kind: Offloader(inline_max_chars=0, workers=workers, kind=kind)
+        }
+        for mode, offloader in cases.items():
+            result = await run_case(offloader, content, parses, concurrency)
+            offloader.shutdown()
+            print(
+                f"{size:>8} | {mode:>7} | {result['seconds']:>7} | {result['lag_ms_p50']:>10} | "
+                f"{result['lag_ms_p99']:>10} | {result['lag_ms_max']:>10}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-loop lag while parsing large responses")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20000, 100000], help="Response sizes (characters)")
+    parser.add_argument("--parses", type=int, default=40, help="Responses parsed per case")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parses in flight at once")
+    parser.add_argument("--workers", type=int, default=4, help="Offload pool size")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread", help="Offload pool kind")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.sizes, args.parses, args.concurrency, args.workers, args.executor))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Prompt context encoding benchmark
+
+Compares prompt token counts of the verbose and compact context encodings and,
+with --live, runs real generations with each encoding and checks the outputs
+against the schema.
+"""
+
+import argparse
+import asyncio
+import time
+
+from .common import EVENT_SCHEMA, PROMPT, PRE_LOG_SUMMARY, build_context
+from src.models import PreLogSummary, SchemaField
+from src.openai_client import build_system_prompt, build_user_prompt, generate_structured
+from src.tokens import estimate_tokens
+from src.transcript import build_delta_prompt, snapshot_context
+from src.validator import validate_schema
+
+ENCODINGS = ["verbose", "compact"]
+
+
+def get_token_counter():
+    """Return (name, counter) using tiktoken when installed"""
+    try:
+        import tiktoken
+        encoder = tiktoken.get_encoding("o200k_base")
+        return "tiktoken/o200k_base", lambda text: len(encoder.encode(text))
+    except Exception:
+        # Not installed, or the encoding cannot be downloaded
+        return "estimate (chars/4)", estimate_tokens
+
+
+def run_token_benchmark(field_counts):
+    """Print prompt token counts per encoding and context size"""
+    counter_name, count_tokens = get_token_counter()
+    schema = {name: SchemaField(**field) for name, field in EVENT_SCHEMA.items()}
+    summary = PreLogSummary(**PRE_LOG_SUMMARY)
+    system_tokens = count_tokens(build_system_prompt(schema))
+
+    print(f"Token counter: {counter_name}")
+    print(f"System prompt: {system_tokens} tokens")
+    print(f"{'fields':>6} | " + " | ".join(f"{encoding:>8}" for encoding in ENCODINGS) + " | saving")
+    for field_count in field_counts:
+        context = build_context(field_count)
+        counts = [
+            count_tokens(build_user_prompt(PROMPT, context, summary, "search the wreckage", encoding=encoding))
+            for encoding in ENCODINGS
+        ]
+        saving = 1 - counts[1] / counts[0]
+        print(f"{field_count:>6} | " + " | ".join(f"{count:>8}" for count in counts) + f" | {saving:6.1%}")
+
+    # Session transcript turn: three fields changed since the previous turn
+    context = build_context(max(field_counts))
+    previous = snapshot_context(context)
+    for field_name in ("energy", "inventory", "ship_status"):
+        context[field_name] = dict(context[field_name], value=f"updated {field_name}")
+    current = snapshot_context(context)
+    counts = [
+        count_tokens(build_delta_prompt(previous, current, user_input="search the wreckage", encoding=encoding))
+        for encoding in ENCODINGS
+    ]
+    print(f"{'delta':>6} | " + " | ".join(f"{count:>8}" for count in counts) + f" | {1 - counts[1] / counts[0]:6.1%}")
+
+
+async def run_live_benchmark(field_count: int, runs: int, model: str = None):
+    """Generate with each encoding and check outputs against the schema"""
+    schema = {name: SchemaField(**field) for name, field in EVENT_SCHEMA.items()}
+    summary = PreLogSummary(**PRE_LOG_SUMMARY)
+    context = build_context(field_count)
+
+    for encoding in ENCODINGS:
+        valid = 0
+        changes_valid = 0
+        elapsed = 0.0
+        for _ in range(runs):
+            start = time.perf_counter()
+            try:
+                result, _ = await generate_structured(
+                    prompt=PROMPT,
+                    context=context,
+                    schema=schema,
+                    pre_log_summary=summary,
+                    user_input="search the wreckage",
+                    model=model,
+                    encoding=encoding
+                )
+            except ValueError as e:
+                print(f"  {encoding}: invalid JSON ({e})")
+                continue
+            finally:
+                elapsed += time.perf_counter() - start
+
+            if not validate_schema(result, schema):
+                valid += 1
+                # Changed fields must keep the {value, type, description} shape
+                changes = result.get("context_changes") or {}
+                if all(change is None or (isinstance(change, dict) and "value" in change) for change in changes.values()):
+                    changes_valid += 1
+
+        print(
+            f"{encoding:>8}: schema valid {valid}/{runs}, context_changes well-formed {changes_valid}/{runs}, "
+            f"avg latency {elapsed / runs:.2f}s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt context encoding benchmark")
+    parser.add_argument("--fields", type=int, nargs="+", default=[4, 8, 16, 32], help="Context sizes to compare")
+    parser.add_argument("--live", action="store_true", help="Also run real generations (requires OPENAI_API_KEY)")
+    parser.add_argument("--runs", type=int, default=5, help="Generations per encoding with --live")
+    parser.add_argument("--model", default=None, help="Model override with --live")
+    args = parser.parse_args()
+
+    run_token_benchmark(args.fields)
+    if args.live:
+        print()
+        asyncio.run(run_live_benchmark(max(args.fields), args.runs, args.model))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Request decoding benchmark
+
+Compares per-request CPU of FastAPI's default body handling (json.loads, then
+the nested Pydantic models) with the single-pass decode into slotted objects,
+each followed by building the user prompt from the decoded request.
+"""
+
+import argparse
+import json
+import timeit
+
+from .common import EVENT_SCHEMA, PROMPT, PRE_LOG_SUMMARY, build_context
+from src.fast_request import decode_request
+from src.models import StructuredGenerationRequest
+from src.openai_client import build_user_prompt
+
+
+def build_body(field_count: int) -> bytes:
+    return json.dumps({
+        "prompt": PROMPT,
+        "context": build_context(field_count),
+        "pre_log_summary": PRE_LOG_SUMMARY,
+        "user_input": "search the wreckage",
+        "schema": EVENT_SCHEMA,
+        "stream": False
+    }).encode("utf-8")
+
+
+def pydantic_path(body: bytes) -> str:
+    request = StructuredGenerationRequest.model_validate(json.loads(body))
+    return build_user_prompt(request.prompt, request.context, request.pre_log_summary, request.user_input)
+
+
+def fast_path(body: bytes) -> str:
+    request = decode_request(body)
+    return build_user_prompt(request.prompt, request.context, request.pre_log_summary, request.user_input)
+
+
+def measure(function, number: int) -> float:
+    """Best per-call time in microseconds"""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def run_benchmark(field_counts, number: int):
+    print(f"{'fields':>6} | {'pydantic us':>11} | {'fast us':>8} | saving")
+    for field_count in field_counts:
+        body = build_body(field_count)
+        assert pydantic_path(body) == fast_path(body)
+        pydantic_us = measure(lambda: pydantic_path(body), number)
+        fast_us = measure(lambda: fast_path(body), number)
+        print(f"{field_count:>6} | {pydantic_us:>11.1f} | {fast_us:>8.1f} | {1 - fast_us / pydantic_us:6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request decoding benchmark")
+    parser.add_argument("--fields", type=int, nargs="+", default=[4, 16, 64, 128], help="Context sizes to compare")
+    parser.add_argument("--number", type=int, default=1000, help="Calls per timing run")
+    args = parser.parse_args()
+
+    run_benchmark(args.fields, args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Wire format benchmark
+
+Compares JSON and MessagePack for /generate_structured request and response
+bodies: encoded size, encode and decode time, and the full decode plus
+request validation done by the service.
+"""
+
+import argparse
+import json
+import timeit
+
+import msgpack
+
+from .common import EVENT_SCHEMA, PROMPT, PRE_LOG_SUMMARY, build_context
+from src.models import StructuredGenerationRequest, StructuredGenerationResponse
+
+FORMATS = {
+    "json": (lambda value: json.dumps(value, ensure_ascii=False).encode("utf-8"), json.loads),
+    "msgpack": (lambda value: msgpack.packb(value, use_bin_type=True), lambda body: msgpack.unpackb(body, raw=False))
+}
+
+
+def build_request(field_count: int) -> dict:
+    return {
+        "prompt": PROMPT,
+        "context": build_context(field_count),
+        "pre_log_summary": PRE_LOG_SUMMARY,
+        "user_input": "search the wreckage",
+        "schema": EVENT_SCHEMA,
+        "stream": False
+    }
+
+
+def build_response(field_count: int) -> dict:
+    context = build_context(field_count)
+    changes = {name: dict(field, value=f"changed {name}") for name, field in list(context.items())[:4]}
+    return StructuredGenerationResponse(
+        success=True,
+        message="Generation completed",
+        result={"event_description": PRE_LOG_SUMMARY["summary"] * 3, "context_changes": changes}
+    ).model_dump(mode="json")
+
+
+def measure(function, number: int) -> float:
+    """Best per-call time in microseconds"""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def run_benchmark(field_counts, number: int):
+    print(f"{'fields':>6} | {'body':>8} | {'format':>7} | {'bytes':>7} | {'encode us':>9} | {'decode us':>9} | {'decode+validate us':>18}")
+    for field_count in field_counts:
+        bodies = {"request": build_request(field_count), "response": build_response(field_count)}
+        for body_name, value in bodies.items():
+            for format_name, (encode, decode) in FORMATS.items():
+                encoded = encode(value)
+                encode_us = measure(lambda: encode(value), number)
+                decode_us = measure(lambda: decode(encoded), number)
+                if body_name == "request":
+                    validate_us = measure(lambda: StructuredGenerationRequest.model_validate(decode(encoded)), number)
+                    validate = f"{validate_us:>18.1f}"
+                else:
+                    validate = f"{'-':>18}"
+                print(
+                    f"{field_count:>6} | {body_name:>8} | {format_name:>7} | {len(encoded):>7} | "
+                    f"{encode_us:>9.1f} | {decode_us:>9.1f} | {validate}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON vs MessagePack wire format benchmark")
+    parser.add_argument("--fields", type=int, nargs="+", default=[4, 16, 64, 128], help="Context sizes to compare")
+    parser.add_argument("--number", type=int, default=200, help="Calls per timing run")
+    args = parser.parse_args()
+
+    run_benchmark(args.fields, args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 """Event generation tests"""
 
+import uuid
+
+from ..config import Config
 from ..utils.llm_client import LLMClient
 from ..utils.test_result import TestResult
 
@@ -137,9 +140,9 @@ def test_context_limit(client: LLMClient, result: TestResult):
     print("Testing context field limit...")
 
     try:
-        # Create context with too many fields (> 16)
+        # Create context with too many fields (> hard limit)
         context = {}
-        for i in range(20):
+        for i in range(Config.CONTEXT_HARD_MAX_FIELDS + 4):
             context[f"field_{i}"] = {
                 "value": i,
                 "type": "number",
@@ -181,3 +184,173 @@ def test_context_limit(client: LLMClient, result: TestResult):
         result.add_result("context_limit", "failed", str(e), str(e))
         print(f"✗ Context limit test failed with unexpected error: {e}")
         raise
+
+
+def test_context_selection(client: LLMClient, result: TestResult):
+    """Test that contexts above the prompt budget are reduced instead of rejected
+
+    Args:
+        client: LLM client
+        result: Test result tracker
+    """
+    print("Testing context field selection...")
+
+    try:
+        # More fields than rendered into the prompt, but below the hard limit
+        context = {
+            "health": {
+                "value": 100,
+                "type": "number",
+                "description": "Player health points"
+            },
+            "torch_fuel": {
+                "value": 3,
+                "type": "number",
+                "description": "Fuel left in the torch"
+            }
+        }
+        for i in range(Config.CONTEXT_MAX_FIELDS + 4):
+            context[f"field_{i}"] = {
+                "value": i,
+                "type": "number",
+                "description": f"Test field {i}"
+            }
+
+        schema = {
+            "event_description": {
+                "type": "string",
+                "description": "Event description"
+            },
+            "context_changes": {
+                "type": "object",
+                "description": "Context changes"
+            }
+        }
+
+        response = client.generate_structured(
+            prompt="You are a game master. Generate an event based on the player's action.",
+            context=context,
+            schema=schema,
+            user_input="light the torch"
+        )
+
+        assert response["success"] is True, f"Generation failed: {response.get('message')}"
+        assert "event_description" in response["result"], "Missing 'event_description'"
+
+        message = f"Generated with {len(context)} context fields"
+        result.add_result("context_selection", "passed", message)
+        print(f"✓ Context selection test passed")
+
+    except Exception as e:
+        result.add_result("context_selection", "failed", str(e), str(e))
+        print(f"✗ Context selection test failed: {e}")
+        raise
+
+
+def test_context_version_mismatch(client: LLMClient, result: TestResult):
+    """Test that a context delta against an unknown version asks for a full resend
+
+    Args:
+        client: LLM client
+        result: Test result tracker
+    """
+    print("Testing context version mismatch...")
+
+    try:
+        # Delta for a session the service has never seen
+        context = {
+            "energy": {
+                "value": 60,
+                "type": "number",
+                "description": "Player energy level"
+            }
+        }
+
+        schema = {
+            "event_description": {
+                "type": "string",
+                "description": "Event description"
+            },
+            "context_changes": {
+                "type": "object",
+                "description": "Context changes"
+            }
+        }
+
+        response = client.generate_structured(
+            prompt="Generate a test event",
+            context=context,
+            schema=schema,
+            user_input="test",
+            session_id=f"e2e-{uuid.uuid4()}",
+            context_version=2,
+            base_context_version=1
+        )
+
+        # Should ask for a full resend
+        assert response["success"] is False, "Should fail with an unknown base version"
+        assert response["error_code"] == "CONTEXT_VERSION_MISMATCH", f"Wrong error code: {response.get('error_code')}"
+
+        message = "Context version mismatch correctly reported"
+        result.add_result("context_version_mismatch", "passed", message)
+        print(f"✓ Context version mismatch test passed")
+
+    except Exception as e:
+        result.add_result("context_version_mismatch", "failed", str(e), str(e))
+        print(f"✗ Context version mismatch test failed: {e}")
+        raise
+
+
+def test_idempotent_retry(client: LLMClient, result: TestResult):
+    """Test that a retried request with the same Idempotency-Key gets the original result
+
+    Args:
+        client: LLM client
+        result: Test result tracker
+    """
+    print("Testing idempotent retry...")
+
+    try:
+        context = {
+            "health": {
+                "value": 100,
+                "type": "number",
+                "description": "Player health points"
+            }
+        }
+
+        schema = {
+            "event_description": {
+                "type": "string",
+                "description": "Event description"
+            },
+            "context_changes": {
+                "type": "object",
+                "description": "Context changes"
+            }
+        }
+
+        idempotency_key = f"e2e-{uuid.uuid4()}"
+        responses = [
+            client.generate_structured(
+                prompt="Generate a test event",
+                context=context,
+                schema=schema,
+                user_input="open the door",
+                idempotency_key=idempotency_key
+            )
+            for _ in range(2)
+        ]
+
+        assert responses[0]["success"] is True, f"Generation failed: {responses[0].get('message')}"
+        # Generation is stochastic: only a replay returns the identical result
+        assert responses[1]["result"] == responses[0]["result"], "Retry should return the original result"
+
+        message = "Retry returned the original result"
+        result.add_result("idempotent_retry", "passed", message)
+        print(f"✓ Idempotent retry test passed")
+
+    except Exception as e:
+        result.add_result("idempotent_retry", "failed", str(e), str(e))
+        print(f"✗ Idempotent retry test failed: {e}")
+        raise
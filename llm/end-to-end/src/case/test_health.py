@@ -25,6 +25,8 @@ def test_health_check(client: LLMClient, result: TestResult):
 
         assert "model" in health, "Missing 'model' in health response"
         assert "context_max_fields" in health, "Missing 'context_max_fields' in health response"
+        assert "context_hard_max_fields" in health, "Missing 'context_hard_max_fields' in health response"
+        assert "rate_limits" in health, "Missing 'rate_limits' in health response"
 
         message = f"Service is healthy (model: {health['model']}, max fields: {health['context_max_fields']})"
         result.add_result("health_check", "passed", message)
@@ -34,3 +36,31 @@ def test_health_check(client: LLMClient, result: TestResult):
         result.add_result("health_check", "failed", str(e), str(e))
         print(f"✗ Health check failed: {e}")
         raise
+
+
+def test_stats(client: LLMClient, result: TestResult):
+    """Test usage statistics endpoint
+
+    Args:
+        client: LLM client
+        result: Test result tracker
+    """
+    print("Testing stats endpoint...")
+
+    try:
+        stats = client.get_stats(window=3600)
+
+        # Verify response structure
+        assert "usage" in stats, "Missing 'usage' in stats response"
+        assert "3600s" in stats["usage"], "Missing requested window in stats response"
+        assert "models" in stats["usage"]["3600s"], "Missing 'models' in stats window"
+
+        models = stats["usage"]["3600s"]["models"]
+        message = f"Stats available for models: {list(models.keys())}"
+        result.add_result("stats", "passed", message)
+        print(f"✓ Stats check passed: {message}")
+
+    except Exception as e:
+        result.add_result("stats", "failed", str(e), str(e))
+        print(f"✗ Stats check failed: {e}")
+        raise
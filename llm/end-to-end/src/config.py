@@ -11,6 +11,7 @@ class Config:
 
     # Test context limits
     CONTEXT_MAX_FIELDS = 16
+    CONTEXT_HARD_MAX_FIELDS = 128
 
     @classmethod
     def validate(cls):
@@ -26,5 +27,6 @@ class Config:
         print("=" * 50)
         print(f"Service URL: {cls.SERVICE_URL}")
         print(f"Context Max Fields: {cls.CONTEXT_MAX_FIELDS}")
+        print(f"Context Hard Max Fields: {cls.CONTEXT_HARD_MAX_FIELDS}")
         print("=" * 50)
         print()
@@ -10,11 +10,14 @@ import argparse
 from .config import Config
 from .utils.llm_client import LLMClient
 from .utils.test_result import TestResult
-from .case.test_health import test_health_check
+from .case.test_health import test_health_check, test_stats
 from .case.test_generate import (
     test_simple_generation,
     test_context_changes,
-    test_context_limit
+    test_context_limit,
+    test_context_selection,
+    test_context_version_mismatch,
+    test_idempotent_retry
 )
 
 
@@ -70,6 +73,26 @@ def run_all_tests(service_url: str = None) -> bool:
             except Exception as e:
                 print(f"\nContext limit test failed: {e}")
 
+            try:
+                test_context_selection(client, result)
+            except Exception as e:
+                print(f"\nContext selection test failed: {e}")
+
+            try:
+                test_context_version_mismatch(client, result)
+            except Exception as e:
+                print(f"\nContext version mismatch test failed: {e}")
+
+            try:
+                test_idempotent_retry(client, result)
+            except Exception as e:
+                print(f"\nIdempotent retry test failed: {e}")
+
+            try:
+                test_stats(client, result)
+            except Exception as e:
+                print(f"\nStats test failed: {e}")
+
     except ConnectionError as e:
         print(f"\n✗ Connection failed: {e}")
         print("\nTip: Ensure LLM service is running and OPENAI_API_KEY is set")
@@ -49,6 +49,20 @@ class LLMClient:
         response.raise_for_status()
         return response.json()
 
+    def get_stats(self, window: Optional[int] = None) -> Dict[str, Any]:
+        """Get usage statistics
+
+        Args:
+            window: Rolling window in seconds
+
+        Returns:
+            Usage statistics data
+        """
+        params = {"window": window} if window else None
+        response = self._client.get(f"{self.service_url}/stats", params=params)
+        response.raise_for_status()
+        return response.json()
+
     def generate_structured(
         self,
         prompt: str,
@@ -56,7 +70,11 @@ class LLMClient:
         schema: Dict[str, Any],
         pre_log_summary: Optional[Dict[str, Any]] = None,
         user_input: Optional[str] = None,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        session_id: Optional[str] = None,
+        context_version: Optional[int] = None,
+        base_context_version: Optional[int] = None,
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """Generate structured data
 
@@ -67,6 +85,10 @@ class LLMClient:
             pre_log_summary: Historical events summary
             user_input: User's current input
             model: Model override
+            session_id: Session key
+            context_version: Version of the context sent
+            base_context_version: Version the context delta applies to
+            idempotency_key: Idempotency-Key header value
 
         Returns:
             Generation response
@@ -87,9 +109,21 @@ class LLMClient:
         if model:
             request_data["model"] = model
 
+        if session_id:
+            request_data["session_id"] = session_id
+
+        if context_version is not None:
+            request_data["context_version"] = context_version
+
+        if base_context_version is not None:
+            request_data["base_context_version"] = base_context_version
+
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+
         response = self._client.post(
             f"{self.service_url}/generate_structured",
-            json=request_data
+            json=request_data,
+            headers=headers
         )
         response.raise_for_status()
         return response.json()
@@ -0,0 +1,105 @@
+# Model cascade: cheaper models first, escalate when their output fails checks
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Awaitable, Callable, Deque, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TierStats:
+    """Outcome counters and recent latencies of one cascade tier"""
+
+    def __init__(self, window: int):
+        self.attempts = 0
+        self.accepted = 0
+        self.rejections: Dict[str, int] = {}
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+
+        def percentile(value: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(value * len(ordered)))], 3) if ordered else 0.0
+
+        return {
+            'attempts': self.attempts,
+            'accepted': self.accepted,
+            'hit_rate': round(self.accepted / self.attempts, 3) if self.attempts else 0.0,
+            'rejections': dict(self.rejections),
+            'latency_p50': percentile(0.5),
+            'latency_p95': percentile(0.95)
+        }
+
+
+class ModelCascade:
+    """Tries models in order and escalates when a tier's output fails the checks"""
+
+    def __init__(self, models: List[str], window: int = 1000):
+        """
+        Args:
+            models: Model names, cheapest and fastest first
+            window: Number of recent latencies kept per tier
+        """
+        self.models = models
+        self._stats = {model: TierStats(window) for model in models}
+        self._lock = threading.Lock()
+
+    async def run(
+        self,
+        generate: Callable[[str], Awaitable[Tuple[Dict[str, Any], Any]]],
+        check: Callable[[Dict[str, Any]], List[str]]
+    ) -> Tuple[Dict[str, Any], Any]:
+        """
+        Generate with each tier until one passes the checks
+
+        Args:
+            generate: Coroutine function generating with the given model, returning (result, usage)
+            check: Returns the issues found in a result (empty when acceptable)
+
+        Returns:
+            (result, usage) of the first accepted tier, or of the last tier as is;
+            errors of the last tier propagate
+        """
+        for tier, model in enumerate(self.models):
+            last_tier = tier == len(self.models) - 1
+            started = time.perf_counter()
+            reason = None
+            try:
+                result, usage = await generate(model)
+                issues = check(result)
+                if issues:
+                    reason = 'checks'
+                    logger.info(f"Cascade tier {model} failed checks: {'; '.join(issues)}")
+            except ValueError as e:
+                if last_tier:
+                    self._record(model, started, 'invalid_json')
+                    raise
+                reason = 'invalid_json'
+                logger.info(f"Cascade tier {model} returned invalid JSON: {e}")
+            except Exception as e:
+                if last_tier:
+                    self._record(model, started, 'error')
+                    raise
+                reason = 'error'
+                logger.warning(f"Cascade tier {model} failed: {e}")
+
+            self._record(model, started, reason)
+            if reason is None or last_tier:
+                return result, usage
+
+    def _record(self, model: str, started: float, reason: str = None) -> None:
+        with self._lock:
+            stats = self._stats[model]
+            stats.attempts += 1
+            stats.latencies.append(time.perf_counter() - started)
+            if reason is None:
+                stats.accepted += 1
+            else:
+                stats.rejections[reason] = stats.rejections.get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-tier hit rates and latencies"""
+        with self._lock:
+            return {model: stats.snapshot() for model, stats in self._stats.items()}
@@ -15,7 +15,30 @@ if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY environment variable is required but not set")
 
 # Context limits
+# CONTEXT_MAX_FIELDS: fields rendered into the prompt. With relevance selection enabled,
+# larger contexts are reduced to the most relevant fields instead of being rejected,
+# and only contexts above CONTEXT_HARD_MAX_FIELDS are rejected.
 CONTEXT_MAX_FIELDS = int(os.getenv("CONTEXT_MAX_FIELDS", "16"))
+CONTEXT_SELECTION_ENABLED = os.getenv("CONTEXT_SELECTION_ENABLED", "true").lower() == "true"
+CONTEXT_HARD_MAX_FIELDS = int(os.getenv("CONTEXT_HARD_MAX_FIELDS", "128"))
+# Fields always kept in the prompt (comma separated)
+CONTEXT_PINNED_FIELDS = [
+    name.strip() for name in os.getenv("CONTEXT_PINNED_FIELDS", "health,location").split(",") if name.strip()
+]
+
+# Prompt context encoding
+# verbose: one "- name: value (description)" line per field
+# compact: sorted field|value|description table with minimal JSON for non-string values;
+#          session transcripts only repeat descriptions of new fields
+# Compact is not a meaningful token saving: benchmark/prompt_encoding.py measures it 0.6% larger
+# at 4 fields and 2.4% / 5.0% / 6.2% smaller at 8 / 16 / 32 fields (chars/4 estimate). What it
+# adds is a canonical rendering (identical states give identical prompts). Verbose stays the default.
+PROMPT_CONTEXT_ENCODING = os.getenv("PROMPT_CONTEXT_ENCODING", "verbose").lower()
+
+# Session context cache (context-delta protocol)
+# Callers may send only the fields changed since a cached context version
+CONTEXT_CACHE_MAX_SESSIONS = int(os.getenv("CONTEXT_CACHE_MAX_SESSIONS", "1000"))
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "1800"))
 
 # LLM generation parameters
 # max_tokens: Maximum tokens for LLM output (events + context changes)
@@ -23,5 +46,215 @@ CONTEXT_MAX_FIELDS = int(os.getenv("CONTEXT_MAX_FIELDS", "16"))
 # Setting to 3000 for safety margin
 LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "3000"))
 
+# Context rules
+# JSON file with a list of deterministic per-step rules, e.g.
+# {"field": "hunger", "per_hour": 5, "per_step": 0, "min": 0, "max": 100}, applied by the service
+# using the request's elapsed_seconds. The model is told these fields are machine-managed and
+# the rule changes are merged into context_changes (model changes to the same field win).
+# Not applied to streaming requests.
+CONTEXT_RULES_PATH = os.getenv("CONTEXT_RULES_PATH", "")
+
+# Model cascade
+# Comma separated models, cheapest and fastest first. Requests without an explicit model try
+# each in turn and escalate when the output is invalid or fails the schema and quality checks.
+LLM_CASCADE_MODELS = [model.strip() for model in os.getenv("LLM_CASCADE_MODELS", "").split(",") if model.strip()]
+
+# N-best generation
+# Number of candidates sampled per generation; the first one passing schema validation is
+# returned. 'n' asks for all candidates in one upstream call (OpenAI n parameter); 'parallel'
+# issues concurrent calls and cancels the rest once one is accepted (for upstreams without n).
+LLM_CANDIDATES = max(int(os.getenv("LLM_CANDIDATES", "1")), 1)
+LLM_CANDIDATES_MODE = os.getenv("LLM_CANDIDATES_MODE", "n").strip().lower()
+if LLM_CANDIDATES_MODE not in ("n", "parallel"):
+    raise ValueError(f"Unknown LLM_CANDIDATES_MODE: {LLM_CANDIDATES_MODE} (expected 'n' or 'parallel')")
+
+# Adaptive upstream rate limiting
+# In-flight request and token limits per model, adapted from the upstream rate-limit headers
+# (additive increase on success, halved on 429). Requests are held, for at most
+# RATE_LIMIT_MAX_WAIT_SECONDS, while the reported remaining quota is exhausted.
+# Off by default: when enabled, a deployment starts at RATE_LIMIT_INITIAL_CONCURRENCY calls per model.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "false").lower() == "true"
+RATE_LIMIT_INITIAL_CONCURRENCY = int(os.getenv("RATE_LIMIT_INITIAL_CONCURRENCY", "8"))
+RATE_LIMIT_MAX_CONCURRENCY = int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "64"))
+RATE_LIMIT_INITIAL_TOKENS = int(os.getenv("RATE_LIMIT_INITIAL_TOKENS", "100000"))
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "30"))
+# Models with a tracked limiter (models are chosen by clients), and idle time before one is dropped
+RATE_LIMIT_MAX_MODELS = int(os.getenv("RATE_LIMIT_MAX_MODELS", "64"))
+RATE_LIMIT_MODEL_TTL_SECONDS = int(os.getenv("RATE_LIMIT_MODEL_TTL_SECONDS", "3600"))
+
+# Request scheduling
+# At most SCHEDULER_MAX_CONCURRENCY generations run at once; waiting requests are served by
+# priority class (interactive > background > batch) and fairly across session / tenant keys.
+# Each key may send SCHEDULER_KEY_RATE requests per second with bursts of SCHEDULER_KEY_BURST
+# (rate 0 disables the per-key limit). Off by default: generations then start at once, unlimited.
+# Speculation's idle-slot check and degraded mode's queue-depth signal need the scheduler.
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "false").lower() == "true"
+SCHEDULER_MAX_CONCURRENCY = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "16"))
+SCHEDULER_KEY_RATE = float(os.getenv("SCHEDULER_KEY_RATE", "2"))
+SCHEDULER_KEY_BURST = float(os.getenv("SCHEDULER_KEY_BURST", "10"))
+SCHEDULER_MAX_KEYS = int(os.getenv("SCHEDULER_MAX_KEYS", "10000"))
+SCHEDULER_MAX_QUEUE_SECONDS = float(os.getenv("SCHEDULER_MAX_QUEUE_SECONDS", "60"))
+# Fair-queuing weights of keys, e.g. "studio-a=4,studio-b=2": while both have requests waiting, a
+# key of weight 4 is served four times as often as a key of weight 1. Unlisted keys weigh 1.
+SCHEDULER_KEY_WEIGHTS = {
+    key.strip(): float(weight)
+    for key, _, weight in (entry.partition("=") for entry in os.getenv("SCHEDULER_KEY_WEIGHTS", "").split(","))
+    if key.strip()
+}
+
+# Degraded mode
+# Interactive requests are answered at once with a local templated result (narrative keyed by
+# the action verb and location, empty context_changes) flagged degraded, instead of going
+# upstream, while DEGRADED_QUEUE_DEPTH or more requests wait for a scheduler slot (0 disables),
+# or while the circuit breaker is open. The breaker opens after DEGRADED_FAILURE_THRESHOLD
+# consecutive upstream failures (connection errors, timeouts, 408/409/429/5xx statuses, or calls
+# slower than DEGRADED_SLOW_SECONDS; 0 disables) and lets a probe request through after
+# DEGRADED_OPEN_SECONDS. Degraded results are not cached or kept for an Idempotency-Key.
+DEGRADED_MODE_ENABLED = os.getenv("DEGRADED_MODE_ENABLED", "false").lower() == "true"
+DEGRADED_QUEUE_DEPTH = int(os.getenv("DEGRADED_QUEUE_DEPTH", "32"))
+DEGRADED_FAILURE_THRESHOLD = int(os.getenv("DEGRADED_FAILURE_THRESHOLD", "5"))
+DEGRADED_SLOW_SECONDS = float(os.getenv("DEGRADED_SLOW_SECONDS", "30"))
+DEGRADED_OPEN_SECONDS = float(os.getenv("DEGRADED_OPEN_SECONDS", "30"))
+
+# Speculative pre-generation
+# After a step of a session, the SPECULATION_TOP_K inputs most likely to come next (by how often
+# they were sent, in this session and overall; at least SPECULATION_MIN_COUNT times) are generated
+# in the background for the context the client will then hold. Results are kept for
+# SPECULATION_TTL_SECONDS and served once to a matching request. Speculation runs in the batch
+# priority class, only while more than SPECULATION_RESERVE_SLOTS scheduler slots are idle, with at
+# most SPECULATION_MAX_CONCURRENCY generations at once and SPECULATION_MAX_PER_MINUTE started per minute.
+# Input counts of up to SPECULATION_MAX_SESSIONS sessions are kept, each dropped after
+# SPECULATION_SESSION_TTL_SECONDS without a step. Like the response caches, speculation is off for
+# sessions while SESSION_TRANSCRIPT_ENABLED is on.
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "false").lower() == "true"
+SPECULATION_TOP_K = int(os.getenv("SPECULATION_TOP_K", "2"))
+SPECULATION_MIN_COUNT = int(os.getenv("SPECULATION_MIN_COUNT", "3"))
+SPECULATION_MAX_INPUTS = int(os.getenv("SPECULATION_MAX_INPUTS", "10000"))
+SPECULATION_MAX_SESSIONS = int(os.getenv("SPECULATION_MAX_SESSIONS", "10000"))
+SPECULATION_SESSION_TTL_SECONDS = int(os.getenv("SPECULATION_SESSION_TTL_SECONDS", "3600"))
+SPECULATION_MAX_CONCURRENCY = int(os.getenv("SPECULATION_MAX_CONCURRENCY", "2"))
+SPECULATION_RESERVE_SLOTS = int(os.getenv("SPECULATION_RESERVE_SLOTS", "8"))
+SPECULATION_MAX_PER_MINUTE = float(os.getenv("SPECULATION_MAX_PER_MINUTE", "30"))
+SPECULATION_MAX_ENTRIES = int(os.getenv("SPECULATION_MAX_ENTRIES", "1000"))
+SPECULATION_TTL_SECONDS = int(os.getenv("SPECULATION_TTL_SECONDS", "120"))
+
+# Idempotency keys
+# Responses of /generate_structured requests sent with an Idempotency-Key header are kept this
+# long, so a retried request gets the original result instead of a new generation.
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+
+# Response cache
+# Successful results keyed by a hash of the full request (not used for session transcripts).
+# Off by default since generation is meant to vary. Results are kept in memory and, when
+# RESPONSE_CACHE_PATH is set, in a SQLite file (WAL mode) shared by all workers on the host
+# and kept across restarts; least recently used entries are evicted above RESPONSE_CACHE_MAX_BYTES.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_MEMORY_ENTRIES = int(os.getenv("RESPONSE_CACHE_MEMORY_ENTRIES", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+# e.g. /app/data/response-cache.sqlite3; empty keeps the cache in memory only
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "")
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Near-duplicate input cache
+# Successful results indexed by the normalized user input (lowercase, no punctuation but
+# apostrophes) as hashed character n-gram vectors, grouped by a fingerprint of the rest of the
+# request (prompt, context, pre_log_summary, schema, model). A request whose input scores at least
+# SIMILARITY_CACHE_THRESHOLD (cosine) against an input of its group, with the same negations and
+# numbers ("don't", "5"), gets that result. The index holds SIMILARITY_CACHE_ENTRIES vectors, least
+# recently used replaced first. A fraction SIMILARITY_CACHE_SAMPLE_RATE of non-exact matches is
+# listed in /stats for review.
+SIMILARITY_CACHE_ENABLED = os.getenv("SIMILARITY_CACHE_ENABLED", "false").lower() == "true"
+SIMILARITY_CACHE_THRESHOLD = float(os.getenv("SIMILARITY_CACHE_THRESHOLD", "0.95"))
+SIMILARITY_CACHE_ENTRIES = int(os.getenv("SIMILARITY_CACHE_ENTRIES", "10000"))
+SIMILARITY_CACHE_DIMENSIONS = int(os.getenv("SIMILARITY_CACHE_DIMENSIONS", "512"))
+SIMILARITY_CACHE_NGRAM = int(os.getenv("SIMILARITY_CACHE_NGRAM", "3"))
+SIMILARITY_CACHE_TTL_SECONDS = int(os.getenv("SIMILARITY_CACHE_TTL_SECONDS", "3600"))
+SIMILARITY_CACHE_SAMPLE_RATE = float(os.getenv("SIMILARITY_CACHE_SAMPLE_RATE", "0.1"))
+
+# Response post-processing (JSON extraction, control-character cleanup, parsing)
+# Responses up to OFFLOAD_INLINE_MAX_CHARS characters are processed on the event loop; larger
+# ones on a pool of OFFLOAD_WORKERS threads ("thread") or processes ("process"), so one huge
+# response does not stall every other connection. OFFLOAD_WORKERS=0 keeps everything inline.
+OFFLOAD_EXECUTOR = os.getenv("OFFLOAD_EXECUTOR", "thread").lower()
+OFFLOAD_INLINE_MAX_CHARS = int(os.getenv("OFFLOAD_INLINE_MAX_CHARS", "16384"))
+OFFLOAD_WORKERS = int(os.getenv("OFFLOAD_WORKERS", "4"))
+
+# Event-loop lag (/stats): how late a timer scheduled every EVENT_LOOP_LAG_INTERVAL_SECONDS
+# fires; the last EVENT_LOOP_LAG_WINDOW samples are summarized.
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("EVENT_LOOP_LAG_INTERVAL_SECONDS", "0.1"))
+EVENT_LOOP_LAG_WINDOW = int(os.getenv("EVENT_LOOP_LAG_WINDOW", "600"))
+
+# SSE frame coalescing (/generate_structured_stream)
+# Content deltas are merged into one frame until STREAM_COALESCE_MAX_BYTES are buffered, the
+# oldest buffered delta is STREAM_COALESCE_MAX_DELAY_MS old, or a top-level JSON field ends.
+# Up to STREAM_COALESCE_QUEUE_SIZE deltas are read ahead of a slow client before the upstream
+# stream is paused. STREAM_COALESCE_MAX_DELAY_MS=0 sends one frame per delta.
+STREAM_COALESCE_MAX_BYTES = int(os.getenv("STREAM_COALESCE_MAX_BYTES", "1024"))
+STREAM_COALESCE_MAX_DELAY_MS = float(os.getenv("STREAM_COALESCE_MAX_DELAY_MS", "20"))
+STREAM_COALESCE_QUEUE_SIZE = int(os.getenv("STREAM_COALESCE_QUEUE_SIZE", "256"))
+
+# Multiplexed WebSocket channel (/ws/generate)
+# Most generation requests one connection may have in flight; more are rejected.
+WS_MAX_IN_FLIGHT = int(os.getenv("WS_MAX_IN_FLIGHT", "64"))
+
+# Debug endpoints
+# Admin-only profiling (cProfile / stack sampling), tracemalloc snapshots and in-flight request
+# listing under /debug, authenticated with the X-Admin-Token header. Not mounted unless enabled.
+DEBUG_ENDPOINTS_ENABLED = os.getenv("DEBUG_ENDPOINTS_ENABLED", "false").lower() == "true"
+DEBUG_ADMIN_TOKEN = os.getenv("DEBUG_ADMIN_TOKEN", "")
+DEBUG_MAX_PROFILE_SECONDS = float(os.getenv("DEBUG_MAX_PROFILE_SECONDS", "60"))
+
+# Ask the upstream for a final usage chunk on streams (OpenAI stream_options.include_usage)
+LLM_STREAM_INCLUDE_USAGE = os.getenv("LLM_STREAM_INCLUDE_USAGE", "true").lower() == "true"
+
+# Adaptive max_tokens
+# Once enough responses have been observed for a schema and model, max_tokens is set to a
+# high percentile of their completion tokens plus a margin (capped by LLM_MAX_TOKENS).
+# Responses cut off with finish_reason == "length" are retried with a doubled limit.
+ADAPTIVE_MAX_TOKENS_ENABLED = os.getenv("ADAPTIVE_MAX_TOKENS_ENABLED", "true").lower() == "true"
+ADAPTIVE_MAX_TOKENS_PERCENTILE = float(os.getenv("ADAPTIVE_MAX_TOKENS_PERCENTILE", "0.99"))
+ADAPTIVE_MAX_TOKENS_MARGIN = int(os.getenv("ADAPTIVE_MAX_TOKENS_MARGIN", "128"))
+ADAPTIVE_MAX_TOKENS_MIN = int(os.getenv("ADAPTIVE_MAX_TOKENS_MIN", "256"))
+ADAPTIVE_MAX_TOKENS_WINDOW = int(os.getenv("ADAPTIVE_MAX_TOKENS_WINDOW", "200"))
+ADAPTIVE_MAX_TOKENS_MIN_SAMPLES = int(os.getenv("ADAPTIVE_MAX_TOKENS_MIN_SAMPLES", "20"))
+# Schema / model keys tracked (models are chosen by clients), and idle time before a key is dropped
+ADAPTIVE_MAX_TOKENS_MAX_KEYS = int(os.getenv("ADAPTIVE_MAX_TOKENS_MAX_KEYS", "1000"))
+ADAPTIVE_MAX_TOKENS_TTL_SECONDS = int(os.getenv("ADAPTIVE_MAX_TOKENS_TTL_SECONDS", "86400"))
+
+# Session transcript mode
+# Requests carrying a session_id reuse an append-only chat transcript (static system
+# prompt, earlier user turns, compact assistant outputs) so the provider can serve
+# the unchanged prefix from its prompt cache. Only context deltas are appended.
+SESSION_TRANSCRIPT_ENABLED = os.getenv("SESSION_TRANSCRIPT_ENABLED", "false").lower() == "true"
+# Estimated transcript size (tokens) at which it is compacted back to a full snapshot
+SESSION_TRANSCRIPT_MAX_TOKENS = int(os.getenv("SESSION_TRANSCRIPT_MAX_TOKENS", "8000"))
+SESSION_TRANSCRIPT_MAX_SESSIONS = int(os.getenv("SESSION_TRANSCRIPT_MAX_SESSIONS", "1000"))
+SESSION_TRANSCRIPT_TTL_SECONDS = int(os.getenv("SESSION_TRANSCRIPT_TTL_SECONDS", "1800"))
+
+# Upstream exchange archive
+# record: append every upstream request/response (with stream chunk timings) to the archive
+# replay: serve matching requests from the archive instead of calling the upstream
+LLM_ARCHIVE_MODE = os.getenv("LLM_ARCHIVE_MODE", "off").lower()
+LLM_ARCHIVE_PATH = os.getenv("LLM_ARCHIVE_PATH", "/app/data/llm-archive")
+# Replay speed factor: 1.0 = recorded timing, 10 = ten times faster, 0 = no delays
+LLM_REPLAY_SPEED = float(os.getenv("LLM_REPLAY_SPEED", "1.0"))
+
+# Usage statistics (/stats)
+# Rolling windows in seconds, comma separated
+USAGE_STATS_WINDOWS = [int(window) for window in os.getenv("USAGE_STATS_WINDOWS", "60,300,3600").split(",")]
+USAGE_STATS_MAX_SAMPLES = int(os.getenv("USAGE_STATS_MAX_SAMPLES", "10000"))
+USAGE_STATS_MAX_SESSIONS = int(os.getenv("USAGE_STATS_MAX_SESSIONS", "1000"))
+# Models with tracked samples (models are chosen by clients), and idle time before one is dropped
+USAGE_STATS_MAX_MODELS = int(os.getenv("USAGE_STATS_MAX_MODELS", "64"))
+USAGE_STATS_MODEL_TTL_SECONDS = int(os.getenv("USAGE_STATS_MODEL_TTL_SECONDS", "3600"))
+
 # Logging
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
\ No newline at end of file
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# Prompt / response payload dumps
+# Fraction of requests (chosen deterministically by request ID) whose full payloads are logged
+# at INFO level; with LOG_LEVEL=DEBUG all payloads are logged. Each dump is cut to
+# LOG_PAYLOAD_MAX_CHARS characters.
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
\ No newline at end of file
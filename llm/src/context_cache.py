@@ -0,0 +1,93 @@
+# Per-session context cache for the context-delta request protocol
+import logging
+from typing import Dict, Any, List, Optional
+
+from .ttl_store import TTLStore
+
+logger = logging.getLogger(__name__)
+
+
+class SessionContext:
+    """Context of a session as of one version"""
+
+    def __init__(
+        self,
+        version: int,
+        fields: Dict[str, Any],
+        pre_log_summary: Any = None,
+        changed_at: Dict[str, int] = None
+    ):
+        self.version = version
+        self.fields = fields
+        self.pre_log_summary = pre_log_summary
+        # Version at which each field last changed
+        self.changed_at = changed_at if changed_at is not None else {name: version for name in fields}
+
+
+class ContextCache:
+    """Bounded, TTL-evicted cache of the last context seen for each session"""
+
+    def __init__(self, max_sessions: int, ttl_seconds: float):
+        self._sessions = TTLStore(max_sessions, ttl_seconds)
+
+    def get(self, session_id: str) -> Optional[SessionContext]:
+        """Return the cached context of a session"""
+        return self._sessions.get(session_id)
+
+    def resolve(
+        self,
+        session_id: str,
+        context: Dict[str, Any],
+        context_version: Optional[int] = None,
+        base_context_version: Optional[int] = None,
+        removed_fields: Optional[List[str]] = None,
+        pre_log_summary: Any = None
+    ) -> Optional[SessionContext]:
+        """
+        Merge a full or delta context into the session cache
+
+        Args:
+            session_id: Session key
+            context: Full context, or only the changed fields when base_context_version is set
+            context_version: Version of the context described by this request
+            base_context_version: Version the delta applies to (None for a full resend)
+            removed_fields: Fields removed since base_context_version
+            pre_log_summary: Historical events summary; a delta without one keeps the cached summary
+
+        Returns:
+            The resolved session context, or None if the delta base does not match the cache
+        """
+        previous = self._sessions.get(session_id)
+
+        if base_context_version is None:
+            # Full resend
+            version = context_version if context_version is not None else (previous.version + 1 if previous else 0)
+            fields = dict(context)
+            summary = pre_log_summary
+        else:
+            if previous is None or previous.version != base_context_version:
+                cached_version = previous.version if previous else None
+                logger.info(
+                    f"Context version mismatch for session {session_id}: "
+                    f"base={base_context_version}, cached={cached_version}"
+                )
+                return None
+            version = context_version if context_version is not None else base_context_version + 1
+            fields = dict(previous.fields)
+            fields.update(context)
+            for field_name in removed_fields or []:
+                fields.pop(field_name, None)
+            summary = pre_log_summary if pre_log_summary is not None else previous.pre_log_summary
+
+        if previous is None:
+            changed_at = {name: version for name in fields}
+        else:
+            changed_at = {}
+            for name, field in fields.items():
+                unchanged = name in previous.fields and previous.fields[name] == field
+                changed_at[name] = previous.changed_at.get(name, version) if unchanged else version
+
+        resolved = SessionContext(version, fields, summary, changed_at)
+        self._sessions.set(session_id, resolved)
+        return resolved
+
@@ -0,0 +1,108 @@
+# Relevance-based selection of context fields for the prompt
+import re
+from typing import Dict, Any, Iterable, List, Optional, Set
+
+from .openai_client import context_field_parts
+
+# Latin words/numbers, or single CJK characters
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[一-鿿]")
+# Split camelCase field names before tokenizing
+_CAMEL_PATTERN = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'i', 'in', 'is', 'it',
+    'my', 'of', 'on', 'or', 'the', 'to', 'with', 'you', 'your'
+}
+
+# Score weights
+USER_INPUT_WEIGHT = 1.0
+RECENT_EVENTS_WEIGHT = 0.4
+RECENCY_WEIGHT = 0.5
+
+
+def tokenize(text: str) -> Set[str]:
+    """Lowercase word set with stopwords and plural suffixes removed"""
+    tokens = set()
+    for token in _TOKEN_PATTERN.findall(_CAMEL_PATTERN.sub(' ', text).lower()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s'):
+            token = token[:-1]
+        tokens.add(token)
+    return tokens
+
+
+def _field_tokens(field_name: str, field_value: Any) -> Set[str]:
+    value, _, description = context_field_parts(field_value)
+    text = f"{field_name.replace('_', ' ')} {description or ''}"
+    # Only short scalar values are useful for matching (e.g. location names)
+    if isinstance(value, str) and len(value) <= 200:
+        text += f" {value}"
+    return tokenize(text)
+
+
+def score_context_fields(
+    context: Dict[str, Any],
+    user_input: Optional[str] = None,
+    recent_events: Optional[Iterable[str]] = None,
+    changed_at: Optional[Dict[str, int]] = None,
+    current_version: Optional[int] = None
+) -> Dict[str, float]:
+    """
+    Score context fields by relevance to the current turn
+
+    Args:
+        context: Full game context
+        user_input: User's current input
+        recent_events: Recent event descriptions
+        changed_at: Version at which each field last changed (session context cache)
+        current_version: Current context version
+
+    Returns:
+        Relevance score per field name
+    """
+    input_tokens = tokenize(user_input or "")
+    event_tokens = tokenize(" ".join(recent_events or []))
+
+    scores = {}
+    for field_name, field_value in context.items():
+        tokens = _field_tokens(field_name, field_value)
+        score = 0.0
+        if tokens:
+            score += USER_INPUT_WEIGHT * len(tokens & input_tokens) / len(tokens) ** 0.5
+            score += RECENT_EVENTS_WEIGHT * len(tokens & event_tokens) / len(tokens) ** 0.5
+        if changed_at is not None and current_version is not None and field_name in changed_at:
+            age = max(current_version - changed_at[field_name], 0)
+            score += RECENCY_WEIGHT / (1 + age)
+        scores[field_name] = score
+    return scores
+
+
+def select_context_fields(
+    context: Dict[str, Any],
+    top_k: int,
+    pinned_fields: Iterable[str] = (),
+    user_input: Optional[str] = None,
+    recent_events: Optional[Iterable[str]] = None,
+    changed_at: Optional[Dict[str, int]] = None,
+    current_version: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Keep the top_k most relevant context fields for the prompt
+
+    Pinned fields are always kept. The selected fields keep their original order.
+
+    Returns:
+        Selected subset of context
+    """
+    if len(context) <= top_k:
+        return context
+
+    scores = score_context_fields(context, user_input, recent_events, changed_at, current_version)
+    pinned = [name for name in pinned_fields if name in context]
+    ranked: List[str] = sorted(
+        (name for name in context if name not in pinned),
+        key=lambda name: -scores[name]
+    )
+    keep = set(pinned[:top_k]) | set(ranked[:max(top_k - len(pinned), 0)])
+    return {name: field for name, field in context.items() if name in keep}
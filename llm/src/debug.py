@@ -0,0 +1,196 @@
+# Admin-only profiling and introspection endpoints
+import asyncio
+import cProfile
+import contextvars
+import hmac
+import io
+import itertools
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+from .config import DEBUG_ADMIN_TOKEN, DEBUG_MAX_PROFILE_SECONDS
+
+# Longest stack kept per sample
+_MAX_STACK_DEPTH = 64
+
+
+class InFlightRequest:
+    """An HTTP request being served and its current processing stage"""
+
+    def __init__(self, request_id: int, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started = time.monotonic()
+        self.stage = 'received'
+        self.stage_started = self.started
+
+
+_current_request: contextvars.ContextVar[Optional[InFlightRequest]] = contextvars.ContextVar(
+    'debug_current_request', default=None
+)
+_in_flight: Dict[int, InFlightRequest] = {}
+_request_ids = itertools.count(1)
+
+
+def set_stage(stage: str) -> None:
+    """Record the processing stage of the current request (no-op unless debug endpoints are enabled)"""
+    entry = _current_request.get()
+    if entry is not None:
+        entry.stage = stage
+        entry.stage_started = time.monotonic()
+
+
+async def track_in_flight(request: Request, call_next):
+    """HTTP middleware registering requests while they are served"""
+    entry = InFlightRequest(next(_request_ids), request.method, request.url.path)
+    _in_flight[entry.request_id] = entry
+    token = _current_request.set(entry)
+    try:
+        return await call_next(request)
+    finally:
+        _current_request.reset(token)
+        del _in_flight[entry.request_id]
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not DEBUG_ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, DEBUG_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+router = APIRouter(prefix="/debug", dependencies=[Depends(require_admin)])
+
+# One profiler at a time: cProfile and sampling both observe the whole process
+_profile_lock = asyncio.Lock()
+_snapshots: Dict[str, tracemalloc.Snapshot] = {}
+
+
+def _format_frame(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+
+def _sample_stacks(thread_id: int, seconds: float, interval: float, stop: threading.Event) -> Counter:
+    """Sample the stack of one thread, counting identical stacks"""
+    stacks = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline and not stop.is_set():
+        frame = sys._current_frames().get(thread_id)
+        stack = []
+        while frame is not None and len(stack) < _MAX_STACK_DEPTH:
+            stack.append(_format_frame(frame))
+            frame = frame.f_back
+        if stack:
+            stacks[';'.join(reversed(stack))] += 1
+        time.sleep(interval)
+    return stacks
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(seconds: float = 10.0, mode: str = 'cprofile', sort: str = 'cumulative', limit: int = 50):
+    """
+    Profile the event loop thread for a number of seconds
+
+    Args:
+        seconds: Profiling duration
+        mode: 'cprofile' (deterministic, pstats text) or 'sample' (collapsed stacks, for flame graphs)
+        sort: pstats sort key for 'cprofile'
+        limit: Number of pstats rows for 'cprofile'
+    """
+    if mode not in ('cprofile', 'sample'):
+        raise HTTPException(status_code=400, detail=f"Unknown profiling mode: {mode}")
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    seconds = min(max(seconds, 0.1), DEBUG_MAX_PROFILE_SECONDS)
+
+    async with _profile_lock:
+        if mode == 'sample':
+            stop = threading.Event()
+            loop_thread = threading.get_ident()
+            try:
+                stacks = await asyncio.to_thread(_sample_stacks, loop_thread, seconds, 0.005, stop)
+            finally:
+                stop.set()
+            return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+
+@router.post("/tracemalloc/start")
+async def tracemalloc_start(frames: int = 1):
+    """Start tracing memory allocations (tracing slows allocations down until stopped)"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    return {"tracing": True, "frames": tracemalloc.get_traceback_limit()}
+
+
+@router.post("/tracemalloc/stop")
+async def tracemalloc_stop():
+    """Stop tracing and drop the stored snapshots"""
+    tracemalloc.stop()
+    _snapshots.clear()
+    return {"tracing": False}
+
+
+@router.post("/tracemalloc/snapshot")
+async def tracemalloc_snapshot(name: str = 'latest', compare_to: Optional[str] = None, limit: int = 30):
+    """
+    Take a named allocation snapshot, optionally diffed against an earlier one
+
+    Args:
+        name: Name to store the snapshot under
+        compare_to: Name of an earlier snapshot to diff against
+        limit: Number of lines returned
+    """
+    if not tracemalloc.is_tracing():
+        raise HTTPException(status_code=409, detail="tracemalloc is not tracing, call /debug/tracemalloc/start")
+    if compare_to is not None and compare_to not in _snapshots:
+        raise HTTPException(status_code=404, detail=f"Unknown snapshot: {compare_to}")
+
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>")
+    ])
+    _snapshots[name] = snapshot
+    current, peak = tracemalloc.get_traced_memory()
+
+    if compare_to is not None:
+        lines = [str(stat) for stat in snapshot.compare_to(_snapshots[compare_to], 'lineno')[:limit]]
+    else:
+        lines = [str(stat) for stat in snapshot.statistics('lineno')[:limit]]
+    return {"name": name, "compare_to": compare_to, "traced_bytes": current, "peak_bytes": peak, "top": lines}
+
+
+@router.get("/requests")
+async def in_flight_requests(min_seconds: float = 0.0) -> List[Dict[str, Any]]:
+    """In-flight requests running for at least min_seconds, slowest first"""
+    now = time.monotonic()
+    entries = [entry for entry in list(_in_flight.values()) if now - entry.started >= min_seconds]
+    entries.sort(key=lambda entry: entry.started)
+    return [
+        {
+            "request_id": entry.request_id,
+            "method": entry.method,
+            "path": entry.path,
+            "elapsed_seconds": round(now - entry.started, 3),
+            "stage": entry.stage,
+            "stage_seconds": round(now - entry.stage_started, 3)
+        }
+        for entry in entries
+    ]
@@ -0,0 +1,288 @@
+# Degraded mode: local templated results while the upstream is down or saturated
+import asyncio
+import logging
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import openai
+
+from .fast_request import FastGenerationRequest
+from .scheduler import FairScheduler
+
+logger = logging.getLogger(__name__)
+
+# Context fields holding the player's whereabouts, most specific first
+LOCATION_FIELDS = ('location', 'current_location', 'place', 'area', 'room', 'scene', 'position')
+
+# Action groups by verb; the first known verb of the input picks the group
+ACTION_VERBS = {
+    'move': {'go', 'walk', 'run', 'move', 'head', 'travel', 'enter', 'leave', 'climb', 'cross', 'follow',
+             'return', 'explore', 'north', 'south', 'east', 'west'},
+    'look': {'look', 'examine', 'inspect', 'observe', 'watch', 'check', 'scan', 'survey', 'read'},
+    'search': {'search', 'take', 'pick', 'grab', 'collect', 'gather', 'loot', 'find', 'dig', 'forage'},
+    'fight': {'attack', 'fight', 'hit', 'strike', 'kill', 'shoot', 'stab', 'defend', 'block', 'throw'},
+    'talk': {'talk', 'ask', 'say', 'tell', 'speak', 'call', 'shout', 'greet', 'trade', 'buy', 'sell'},
+    'rest': {'rest', 'sleep', 'wait', 'sit', 'camp', 'hide', 'relax', 'meditate'},
+    'consume': {'eat', 'drink', 'cook', 'consume', 'heal', 'bandage'},
+    'use': {'use', 'open', 'close', 'light', 'build', 'craft', 'repair', 'push', 'pull', 'unlock', 'equip'},
+}
+
+DIRECTIONS = {'north', 'south', 'east', 'west'}
+
+# Target of an input that names none ("eat", "look around")
+DEFAULT_TARGETS = {
+    'move': 'new ground',
+    'look': 'your surroundings',
+    'search': 'anything useful',
+    'fight': 'the danger',
+    'talk': 'whoever is near',
+    'rest': 'a while',
+    'consume': 'something to eat or drink',
+    'use': 'what is at hand',
+    'other': 'it',
+}
+
+# Narratives that leave the game state as it is, so empty context_changes stay consistent
+TEMPLATES = {
+    'move': [
+        "You set off toward {target}, but the going is slow; for now you are still {where}.",
+        "You get ready to head for {target} and take stock of the way ahead. For now you stay {where}.",
+    ],
+    'look': [
+        "You take a careful look around. Nothing {where} seems to have changed since a moment ago.",
+        "You study {target} for a while. Nothing new stands out {where}.",
+    ],
+    'search': [
+        "You search for {target} {where}, but come away empty-handed for now.",
+        "You look for {target} {where}; whatever you hoped for is not within reach yet.",
+    ],
+    'fight': [
+        "You brace yourself against {target}, watching for an opening. Neither side gains ground yet.",
+        "You keep {target} at a distance and hold your position {where}.",
+    ],
+    'talk': [
+        "You try to talk to {target}, but get no clear answer yet.",
+        "Your words hang in the air {where}; there is no reply for now.",
+    ],
+    'rest': [
+        "You pause {where} to catch your breath. Time passes quietly.",
+        "You stay still for a while {where}, listening to your surroundings.",
+    ],
+    'consume': [
+        "You check your supplies for {target}, but decide to save them for now.",
+        "You think about {target}, then put it off for a better moment.",
+    ],
+    'use': [
+        "You try to use {target}, but nothing comes of it yet.",
+        "You fiddle with {target} {where} without much success so far.",
+    ],
+    'other': [
+        "You try to {action} {where}, but nothing notable happens yet.",
+        "You attempt to {action}. For now, things {where} stay as they are.",
+    ],
+}
+
+_WORDS = re.compile(r"[a-z0-9']+")
+# Words between a verb and its object ("go to the cave", "pick up the key")
+_PARTICLES = {'to', 'at', 'on', 'in', 'into', 'with', 'for', 'up', 'around', 'over', 'through', 'towards', 'toward'}
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """
+    Whether an error of a generation says the upstream is unhealthy
+
+    Only connection failures (the client wraps transport errors), timeouts and
+    overload or server error statuses count; rejected requests, unparsable
+    output and errors of this service do not.
+    """
+    # APITimeoutError is an APIConnectionError
+    if isinstance(error, (openai.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500 or error.status_code in (408, 409, 429)
+    return False
+
+
+class CircuitBreaker:
+    """
+    Tracks upstream health from generation outcomes
+
+    Opens after failure_threshold consecutive failures, where calls slower
+    than slow_seconds count as failures. While open, allow() refuses requests
+    for open_seconds; then a single probe request is let through (half open),
+    whose success closes the breaker and whose failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int, open_seconds: float, slow_seconds: float):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+            open_seconds: Time the breaker stays open before a probe
+            slow_seconds: Duration above which a call counts as failed (0 disables)
+        """
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.slow_seconds = slow_seconds
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_at = 0.0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        """Whether a request may go upstream"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if self.state == 'open' and now - self.opened_at >= self.open_seconds:
+                self.state = 'half_open'
+                self.probe_at = now
+                logger.info("Circuit breaker half open, probing the upstream")
+                return True
+            # A probe that never reported (cancelled) is replaced after open_seconds
+            if self.state == 'half_open' and now - self.probe_at >= self.open_seconds:
+                self.probe_at = now
+                return True
+            return False
+
+    def record(self, succeeded: bool, seconds: float) -> None:
+        """Report the outcome of an upstream call"""
+        failed = not succeeded or (self.slow_seconds > 0 and seconds > self.slow_seconds)
+        with self._lock:
+            if not failed:
+                if self.state != 'closed':
+                    logger.info("Circuit breaker closed, upstream recovered")
+                self.state = 'closed'
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                logger.warning(f"Circuit breaker open after {self.failures} upstream failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self.trips += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'state': self.state, 'consecutive_failures': self.failures, 'trips': self.trips}
+
+
+def _words(text: Optional[str]) -> List[str]:
+    return _WORDS.findall((text or '').lower())
+
+
+def _action(words: List[str]) -> Tuple[str, str]:
+    """Action group of the input and the words after its verb"""
+    for index, word in enumerate(words):
+        for group, verbs in ACTION_VERBS.items():
+            if word in verbs:
+                target = words[index + 1:]
+                while target and target[0] in _PARTICLES:
+                    target = target[1:]
+                target = ['your' if w == 'my' else w for w in target]
+                # Directions are both verb and target ("north", "head north")
+                if not target and word in DIRECTIONS:
+                    target = [word]
+                if len(target) == 1 and target[0] in DIRECTIONS:
+                    target = ['the', target[0]]
+                return group, ' '.join(target) or DEFAULT_TARGETS[group]
+    return 'other', DEFAULT_TARGETS['other']
+
+
+def _where(context: Dict[str, Any]) -> str:
+    """Phrase for the player's location, from the first location field of the context"""
+    fields = {name.lower(): field for name, field in context.items()}
+    for name in LOCATION_FIELDS:
+        field = fields.get(name)
+        value = getattr(field, 'value', None)
+        if isinstance(value, str) and value.strip():
+            value = value.strip()
+            if value[0].isupper() or value.lower().startswith('the '):
+                return f"in {value}"
+            return f"in the {value}"
+    return 'here'
+
+
+def local_narrative(user_input: Optional[str], context: Dict[str, Any]) -> str:
+    """Templated narrative for a player input, keyed by its action verb and the location"""
+    words = _words(user_input)
+    group, target = _action(words)
+    templates = TEMPLATES[group]
+    # Same input, same narrative
+    template = templates[zlib.crc32(' '.join(words).encode('utf-8')) % len(templates)]
+    return template.format(
+        target=target,
+        where=_where(context),
+        action=' '.join(words) or 'act'
+    )
+
+
+def local_result(request: FastGenerationRequest) -> Dict[str, Any]:
+    """
+    Schema-shaped result built without the upstream
+
+    String fields get the narrative; other fields get an empty value of their
+    type, so context_changes is {} and nothing in the game state is changed.
+    """
+    narrative = local_narrative(request.user_input, request.context)
+    result = {}
+    for name, field in request.schema.items():
+        if field.type == 'string':
+            result[name] = narrative
+        elif field.type == 'number':
+            result[name] = 0
+        elif field.type == 'boolean':
+            result[name] = False
+        elif field.type == 'array':
+            result[name] = []
+        else:
+            result[name] = {}
+    return result
+
+
+class DegradedMode:
+    """
+    Decides when interactive requests are answered locally instead of upstream
+
+    Degraded mode is on while the circuit breaker is open, or while at least
+    queue_depth requests wait for a scheduler slot (when scheduling is on).
+    """
+
+    def __init__(self, breaker: CircuitBreaker, scheduler: Optional[FairScheduler], queue_depth: int):
+        """
+        Args:
+            breaker: Upstream circuit breaker
+            scheduler: Generation scheduler whose queue is watched
+            queue_depth: Waiting requests that turn degraded mode on (0 disables the signal)
+        """
+        self.breaker = breaker
+        self.scheduler = scheduler
+        self.queue_depth = queue_depth
+        self.served: Dict[str, int] = {}
+
+    def reason(self, request: FastGenerationRequest) -> Optional[str]:
+        """Why the request must be answered locally, or None when it may go upstream"""
+        # Background and batch work can wait for the upstream
+        if request.priority != 'interactive':
+            return None
+        if self.scheduler is not None and self.queue_depth and self.scheduler.queued() >= self.queue_depth:
+            return 'queue_depth'
+        if not self.breaker.allow():
+            return 'circuit_open'
+        return None
+
+    def record_served(self, reason: str) -> None:
+        self.served[reason] = self.served.get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'breaker': self.breaker.snapshot(),
+            'queued': self.scheduler.queued() if self.scheduler is not None else None,
+            'queue_depth': self.queue_depth,
+            'served': dict(self.served)
+        }
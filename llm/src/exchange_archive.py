@@ -0,0 +1,150 @@
+# Record-and-replay archive of upstream LLM exchanges
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, Any, AsyncIterator, List, Tuple
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from .fingerprint import fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Request arguments that do not identify an exchange (they vary with adaptive limits)
+_UNKEYED_ARGUMENTS = {'max_tokens', 'stream_options'}
+
+# Record header: payload length
+_HEADER = struct.Struct('<I')
+
+
+class ArchiveMiss(LookupError):
+    """No recorded exchange matches the request"""
+
+
+def exchange_key(request: Dict[str, Any]) -> str:
+    """Key identifying an upstream request"""
+    return fingerprint({name: value for name, value in request.items() if name not in _UNKEYED_ARGUMENTS})
+
+
+class ExchangeArchive:
+    """
+    Append-only archive of upstream request/response pairs
+
+    Records are zlib-compressed JSON, length-prefixed, in <path>.data; <path>.index
+    holds one JSON line per record with its key, offset and length. Replay
+    memory-maps the data file and serves matching requests with their recorded
+    timing, scaled by speed.
+    """
+
+    def __init__(self, path: str, mode: str, speed: float = 1.0):
+        """
+        Args:
+            path: Archive path prefix
+            mode: 'record' or 'replay'
+            speed: Replay speed factor (1.0 = recorded timing, 0 = no delays)
+        """
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._index: Dict[str, List[Tuple[int, int]]] = {}
+        self._replay_cursor: Dict[str, int] = {}
+        self._data = None
+
+        if mode == 'record':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._data_file = open(f"{path}.data", 'ab')
+            self._index_file = open(f"{path}.index", 'a', encoding='utf-8')
+        elif mode == 'replay':
+            self._load()
+        else:
+            raise ValueError(f"Unknown archive mode: {mode}")
+
+    def _load(self) -> None:
+        with open(f"{self.path}.index", encoding='utf-8') as index_file:
+            for line in index_file:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._index.setdefault(entry['key'], []).append((entry['offset'], entry['length']))
+        with open(f"{self.path}.data", 'rb') as data_file:
+            self._data = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        logger.info(f"Loaded {sum(len(v) for v in self._index.values())} archived exchanges from {self.path}")
+
+    def _append(self, key: str, record: Dict[str, Any]) -> None:
+        payload = zlib.compress(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        with self._lock:
+            offset = self._data_file.tell()
+            self._data_file.write(_HEADER.pack(len(payload)) + payload)
+            self._data_file.flush()
+            self._index_file.write(json.dumps({'key': key, 'offset': offset, 'length': len(payload)}) + '\n')
+            self._index_file.flush()
+
+    def _read(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        key = exchange_key(request)
+        entries = self._index.get(key)
+        if not entries:
+            raise ArchiveMiss(f"No archived exchange for request {key}")
+        # Repeated requests cycle through their recordings in order
+        with self._lock:
+            cursor = self._replay_cursor.get(key, 0)
+            self._replay_cursor[key] = cursor + 1
+        offset, length = entries[cursor % len(entries)]
+        start = offset + _HEADER.size
+        return json.loads(zlib.decompress(self._data[start:start + length]))
+
+    async def _delay(self, seconds: float) -> None:
+        if self.speed > 0 and seconds > 0:
+            await asyncio.sleep(seconds / self.speed)
+
+    def record_completion(self, request: Dict[str, Any], completion: Any, elapsed: float) -> None:
+        """Archive a non-streaming exchange"""
+        self._append(exchange_key(request), {
+            'request': request,
+            'response': completion.model_dump(),
+            'elapsed': round(elapsed, 4)
+        })
+
+    async def record_stream(self, request: Dict[str, Any], stream: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """Pass a chunk stream through, archiving it with chunk timings once complete"""
+        started = time.perf_counter()
+        chunks = []
+        try:
+            async for chunk in stream:
+                chunks.append([round(time.perf_counter() - started, 4), chunk.model_dump()])
+                yield chunk
+        finally:
+            # Leaving early must also close the upstream stream (and return its rate-limit slot)
+            close = getattr(stream, 'aclose', None)
+            if close is not None:
+                await close()
+        self._append(exchange_key(request), {
+            'request': request,
+            'chunks': chunks,
+            'elapsed': round(time.perf_counter() - started, 4)
+        })
+
+    async def replay_completion(self, request: Dict[str, Any]) -> ChatCompletion:
+        """Serve a non-streaming exchange from the archive"""
+        record = self._read(request)
+        await self._delay(record['elapsed'])
+        return ChatCompletion.model_validate(record['response'])
+
+    def replay_stream(self, request: Dict[str, Any]) -> AsyncIterator[ChatCompletionChunk]:
+        """Serve a streaming exchange from the archive with its chunk timings"""
+        # Read eagerly so a miss surfaces at call time, like an upstream error
+        record = self._read(request)
+
+        async def chunks() -> AsyncIterator[ChatCompletionChunk]:
+            previous = 0.0
+            for offset, chunk in record['chunks']:
+                await self._delay(offset - previous)
+                previous = offset
+                yield ChatCompletionChunk.model_validate(chunk)
+
+        return chunks()
@@ -0,0 +1,114 @@
+# Single-pass decoding of generation requests into slotted objects
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+
+from .models import StructuredGenerationRequest
+from .wire_format import MSGPACK_MEDIA_TYPE, decoded_body
+
+# These mirror the Pydantic models in models.py, which document the API;
+# tests/test_fast_request.py checks that fields and defaults match.
+
+
+@dataclass(slots=True)
+class FastContextField:
+    value: Any
+    type: str
+    description: Optional[str] = None
+
+
+@dataclass(slots=True)
+class FastPreLogSummary:
+    summary: str
+    recent_events: List[str]
+
+
+@dataclass(slots=True)
+class FastSchemaField:
+    type: str
+    description: str
+
+
+@dataclass(slots=True)
+class FastGenerationRequest:
+    prompt: str
+    context: Dict[str, FastContextField]
+    schema: Dict[str, FastSchemaField]
+    pre_log_summary: Optional[FastPreLogSummary] = None
+    user_input: Optional[str] = None
+    stream: Optional[bool] = False
+    model: Optional[str] = None
+    session_id: Optional[str] = None
+    context_version: Optional[int] = None
+    base_context_version: Optional[int] = None
+    removed_context_fields: Optional[List[str]] = None
+    priority: Optional[str] = "interactive"
+    tenant_id: Optional[str] = None
+    elapsed_seconds: Optional[float] = None
+
+
+# Built once: validation runs in pydantic-core straight from the raw bytes
+_request_adapter = TypeAdapter(FastGenerationRequest)
+
+
+def decode_request(body: bytes) -> FastGenerationRequest:
+    """Parse and validate a JSON request body in one pass"""
+    return _request_adapter.validate_json(body)
+
+
+def validate_request(value: Any) -> FastGenerationRequest:
+    """Validate an already decoded request body"""
+    return _request_adapter.validate_python(value)
+
+
+def _inline_refs(node: Any, definitions: Dict[str, Any]) -> Any:
+    if isinstance(node, dict):
+        ref = node.get('$ref')
+        if ref is not None:
+            return _inline_refs(definitions[ref.rsplit('/', 1)[-1]], definitions)
+        return {key: _inline_refs(value, definitions) for key, value in node.items() if key != '$defs'}
+    if isinstance(node, list):
+        return [_inline_refs(item, definitions) for item in node]
+    return node
+
+
+def request_body_openapi() -> Dict[str, Any]:
+    """
+    OpenAPI request body of the generation endpoints
+
+    parse_generation_request reads the body itself, so FastAPI cannot derive
+    it; routes pass this as openapi_extra. The schema is that of
+    models.StructuredGenerationRequest with its references inlined.
+    """
+    model_schema = StructuredGenerationRequest.model_json_schema()
+    schema = _inline_refs(model_schema, model_schema.get('$defs', {}))
+    return {
+        'requestBody': {
+            'required': True,
+            'content': {
+                'application/json': {'schema': schema},
+                MSGPACK_MEDIA_TYPE: {'schema': schema}
+            }
+        }
+    }
+
+
+async def parse_generation_request(request: Request) -> FastGenerationRequest:
+    """
+    FastAPI dependency decoding the generation request body
+
+    Replaces FastAPI's body handling (json.loads, then building the nested
+    Pydantic models). Errors are reported as the usual 422 validation response.
+    """
+    try:
+        decoded = decoded_body(request)
+        if decoded is not None:
+            return validate_request(decoded)
+        return decode_request(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, 'loc': ('body', *error['loc'])} for error in e.errors(include_url=False)]
+        )
@@ -0,0 +1,21 @@
+# Stable content fingerprints for cache and statistics keys
+import dataclasses
+import hashlib
+import json
+from typing import Any
+
+
+def _default(value: Any) -> Any:
+    # Pydantic models
+    if hasattr(value, 'model_dump'):
+        return value.model_dump()
+    # Slotted request objects; same shape as the models they mirror
+    if dataclasses.is_dataclass(value):
+        return {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+    return str(value)
+
+
+def fingerprint(value: Any) -> str:
+    """Return a short, stable hash of a JSON-compatible value"""
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=_default)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=12).hexdigest()
@@ -0,0 +1,95 @@
+# Logging setup: request IDs, off-loop output and sampled payload dumps
+import atexit
+import contextvars
+import hashlib
+import logging
+import logging.handlers
+import queue
+import uuid
+from typing import Optional
+
+from .config import LOG_PAYLOAD_SAMPLE_RATE, LOG_PAYLOAD_MAX_CHARS
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar('request_id', default='-')
+
+payload_logger = logging.getLogger('src.payloads')
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the ID of the request being served"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves message formatting to the listener thread
+
+    The stock QueueHandler formats each record before enqueueing it, which
+    would keep the formatting cost on the event loop. Log arguments must
+    therefore not be mutated after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(level: str) -> None:
+    """Route all records through a queue drained by a background thread"""
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, level.upper()))
+
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    # Flush what is still queued on shutdown
+    atexit.register(listener.stop)
+
+
+def payload_sampled(request_id: Optional[str] = None) -> bool:
+    """Whether full payloads of a request are dumped; the same for every record of the request"""
+    if LOG_PAYLOAD_SAMPLE_RATE <= 0:
+        return False
+    if LOG_PAYLOAD_SAMPLE_RATE >= 1:
+        return True
+    request_id = request_id or request_id_var.get()
+    bucket = int.from_bytes(hashlib.blake2b(request_id.encode('utf-8'), digest_size=4).digest(), 'big')
+    return bucket < LOG_PAYLOAD_SAMPLE_RATE * 2 ** 32
+
+
+def log_payload(label: str, payload: Optional[str]) -> None:
+    """
+    Dump a prompt or response payload, truncated to LOG_PAYLOAD_MAX_CHARS
+
+    Payloads are written at DEBUG level, and at INFO level for sampled
+    requests; nothing is formatted otherwise.
+    """
+    if payload_sampled():
+        level = logging.INFO
+    elif payload_logger.isEnabledFor(logging.DEBUG):
+        level = logging.DEBUG
+    else:
+        return
+
+    if payload is None:
+        payload = 'N/A'
+    elif len(payload) > LOG_PAYLOAD_MAX_CHARS:
+        payload = f"{payload[:LOG_PAYLOAD_MAX_CHARS]}... [{len(payload) - LOG_PAYLOAD_MAX_CHARS} more chars]"
+    payload_logger.log(level, "%s: %s", label, payload)
@@ -26,6 +26,18 @@ class StructuredGenerationRequest(BaseModel):
     schema: Dict[str, SchemaField]
     stream: Optional[bool] = False
     model: Optional[str] = None
+    session_id: Optional[str] = None
+    # Context-delta protocol: with base_context_version set, context only carries
+    # the fields changed since that version and removed_context_fields lists deletions
+    context_version: Optional[int] = None
+    base_context_version: Optional[int] = None
+    removed_context_fields: Optional[List[str]] = None
+    # Scheduling: priority class ('interactive', 'background' or 'batch') and
+    # fair-queuing key (defaults to session_id)
+    priority: Optional[str] = "interactive"
+    tenant_id: Optional[str] = None
+    # Game time elapsed since the previous step, driving the context rules
+    elapsed_seconds: Optional[float] = None
 
 
 class ContextChange(BaseModel):
@@ -40,10 +52,26 @@ class ValidationResult(BaseModel):
     received: str
 
 
+class UsageInfo(BaseModel):
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    reasoning_tokens: int = 0
+    cached_tokens: int = 0
+    total_tokens: int
+    upstream_seconds: float
+    completion_tokens_per_second: Optional[float] = None
+    attempts: int = 1
+
+
 class StructuredGenerationResponse(BaseModel):
     success: bool
     message: str
     result: Optional[Dict[str, Any]] = None
     error_code: Optional[str] = None
     validation_errors: Optional[List[ValidationResult]] = None
-    fix_suggestion: Optional[str] = None
\ No newline at end of file
+    fix_suggestion: Optional[str] = None
+    context_version: Optional[int] = None
+    usage: Optional[UsageInfo] = None
+    # Result made locally without the upstream (outage or overload)
+    degraded: bool = False
\ No newline at end of file
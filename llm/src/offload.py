@@ -0,0 +1,146 @@
+# Size-aware offloading of CPU-heavy work and event-loop lag monitoring
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_KINDS = ('thread', 'process')
+
+
+class Offloader:
+    """
+    Runs CPU-bound calls inline when their input is small, on a bounded pool otherwise
+
+    Thread workers still share the GIL, but the interpreter switches threads
+    every few milliseconds, so the event loop keeps serving other connections
+    while a large payload is processed. Process workers take the work off the
+    interpreter entirely; their arguments and results must be picklable, and
+    log records written in the worker processes are not routed through the
+    service's logging setup.
+    """
+
+    def __init__(self, inline_max_chars: int, workers: int, kind: str = 'thread'):
+        """
+        Args:
+            inline_max_chars: Largest input size processed on the event loop
+            workers: Pool size (0 runs everything inline)
+            kind: 'thread' or 'process'
+        """
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.inline_max_chars = inline_max_chars
+        self.workers = workers
+        self.kind = kind
+        self._executor: Optional[Executor] = None
+        self.inline_calls = 0
+        self.offloaded_calls = 0
+        self.offloaded_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        # Created on first use so idle services do not start workers
+        if self._executor is None:
+            if self.kind == 'process':
+                # spawn: forking a process that runs threads (logging, uvicorn) is unsafe
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            else:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='offload')
+        return self._executor
+
+    async def run(self, size: int, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        Call function(*args), off the event loop when size exceeds the inline limit
+
+        Args:
+            size: Size of the input (characters), deciding where the call runs
+            function: Module-level function (picklable for process workers)
+            args: Positional arguments
+        """
+        if size <= self.inline_max_chars or self.workers <= 0:
+            self.inline_calls += 1
+            return function(*args)
+
+        self.offloaded_calls += 1
+        if self.kind == 'process':
+            call = functools.partial(function, *args)
+        else:
+            # Keep the request ID in log records written by the worker thread
+            call = functools.partial(contextvars.copy_context().run, function, *args)
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), call)
+        finally:
+            self.offloaded_seconds += time.perf_counter() - started
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'executor': self.kind,
+            'workers': self.workers,
+            'inline_max_chars': self.inline_max_chars,
+            'inline_calls': self.inline_calls,
+            'offloaded_calls': self.offloaded_calls,
+            'offloaded_seconds': round(self.offloaded_seconds, 3)
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop runs a periodic timer"""
+
+    def __init__(self, interval: float, window: int):
+        """
+        Args:
+            interval: Seconds between samples
+            window: Number of recent samples summarized
+        """
+        self.interval = interval
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start sampling on the running loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self._samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self._samples)
+
+        def percentile(value: float) -> float:
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(value * len(ordered)))] * 1000, 2)
+
+        return {
+            'samples': len(ordered),
+            'interval_seconds': self.interval,
+            'lag_ms_last': round(self._samples[-1] * 1000, 2) if self._samples else 0.0,
+            'lag_ms_p50': percentile(0.5),
+            'lag_ms_p99': percentile(0.99),
+            'lag_ms_window_max': round(ordered[-1] * 1000, 2) if ordered else 0.0,
+            'lag_ms_max': round(self.max_lag * 1000, 2)
+        }
@@ -1,15 +1,63 @@
 # OpenAI Client Utility
+import asyncio
 import json
 import logging
-from typing import Dict, Any, Iterator
-from openai import OpenAI
-from .config import OPENAI_BASE_URL, OPENAI_API_KEY, OPENAI_MODEL, LOG_LEVEL, LLM_MAX_TOKENS
+import re
+import time
+from typing import Dict, Any, Callable, List, Optional, Set, Tuple
+from openai import AsyncOpenAI, RateLimitError
+from .config import (
+    OPENAI_BASE_URL, OPENAI_API_KEY, OPENAI_MODEL, LOG_LEVEL, LLM_MAX_TOKENS, PROMPT_CONTEXT_ENCODING,
+    ADAPTIVE_MAX_TOKENS_ENABLED, ADAPTIVE_MAX_TOKENS_PERCENTILE, ADAPTIVE_MAX_TOKENS_MARGIN,
+    ADAPTIVE_MAX_TOKENS_MIN, ADAPTIVE_MAX_TOKENS_WINDOW, ADAPTIVE_MAX_TOKENS_MIN_SAMPLES,
+    ADAPTIVE_MAX_TOKENS_MAX_KEYS, ADAPTIVE_MAX_TOKENS_TTL_SECONDS,
+    LLM_STREAM_INCLUDE_USAGE, LLM_ARCHIVE_MODE, LLM_ARCHIVE_PATH, LLM_REPLAY_SPEED,
+    LLM_CANDIDATES, LLM_CANDIDATES_MODE, RATE_LIMIT_ENABLED, RATE_LIMIT_INITIAL_CONCURRENCY,
+    RATE_LIMIT_MAX_CONCURRENCY, RATE_LIMIT_INITIAL_TOKENS, RATE_LIMIT_MAX_WAIT_SECONDS,
+    RATE_LIMIT_MAX_MODELS, RATE_LIMIT_MODEL_TTL_SECONDS,
+    OFFLOAD_EXECUTOR, OFFLOAD_INLINE_MAX_CHARS, OFFLOAD_WORKERS
+)
+from .exchange_archive import ExchangeArchive
+from .fast_request import FastContextField
+from .logging_config import log_payload
+from .models import UsageInfo
+from .offload import Offloader
+from .rate_limiter import RateLimiter
+from .token_budget import TokenBudget
+from .tokens import estimate_message_tokens
 
 logger = logging.getLogger(__name__)
 
-
-def build_system_prompt(schema: Dict[str, Any]) -> str:
-    """Build system prompt with schema requirements"""
+token_budget = TokenBudget(
+    max_tokens=LLM_MAX_TOKENS,
+    min_tokens=ADAPTIVE_MAX_TOKENS_MIN,
+    percentile=ADAPTIVE_MAX_TOKENS_PERCENTILE,
+    margin_tokens=ADAPTIVE_MAX_TOKENS_MARGIN,
+    window=ADAPTIVE_MAX_TOKENS_WINDOW,
+    min_samples=ADAPTIVE_MAX_TOKENS_MIN_SAMPLES,
+    max_keys=ADAPTIVE_MAX_TOKENS_MAX_KEYS,
+    ttl_seconds=ADAPTIVE_MAX_TOKENS_TTL_SECONDS
+)
+
+archive = (
+    ExchangeArchive(LLM_ARCHIVE_PATH, LLM_ARCHIVE_MODE, LLM_REPLAY_SPEED) if LLM_ARCHIVE_MODE != 'off' else None
+)
+
+rate_limiter = RateLimiter(
+    initial_concurrency=RATE_LIMIT_INITIAL_CONCURRENCY,
+    max_concurrency=RATE_LIMIT_MAX_CONCURRENCY,
+    initial_tokens=RATE_LIMIT_INITIAL_TOKENS,
+    max_wait_seconds=RATE_LIMIT_MAX_WAIT_SECONDS,
+    max_models=RATE_LIMIT_MAX_MODELS,
+    ttl_seconds=RATE_LIMIT_MODEL_TTL_SECONDS
+) if RATE_LIMIT_ENABLED else None
+
+# Response parsing runs off the event loop for large responses
+offloader = Offloader(OFFLOAD_INLINE_MAX_CHARS, OFFLOAD_WORKERS, OFFLOAD_EXECUTOR)
+
+
+def build_system_prompt(schema: Dict[str, Any], managed_fields: List[str] = None) -> str:
+    """Build system prompt with schema requirements and the context fields updated by rules"""
     schema_description = "You must respond with ONLY valid JSON that follows this exact schema:\n"
 
     for field_name, field_def in schema.items():
@@ -24,28 +72,140 @@ CRITICAL RULES:
 5. Your entire response must be valid JSON starting with opening brace and ending with closing brace
 """
 
+    if managed_fields:
+        schema_description += (
+            f"6. These context fields are updated automatically every turn: {', '.join(managed_fields)}. "
+            "Include them in context_changes only when the event itself changes them\n"
+        )
+
     return schema_description
 
 
-def build_user_prompt(prompt: str, context: Dict[str, Any], pre_log_summary: str = None, user_input: str = None) -> str:
+def context_field_parts(field_value: Any) -> Tuple[Any, Optional[str], Optional[str]]:
+    """Return (value, type, description) of a context field"""
+    # Decoded requests: direct slot access
+    if type(field_value) is FastContextField:
+        return field_value.value, field_value.type, field_value.description
+    # Handle both dict and Pydantic model
+    if isinstance(field_value, dict):
+        return field_value.get('value', ''), field_value.get('type'), field_value.get('description', '')
+    # Pydantic model or object with attributes
+    return (
+        getattr(field_value, 'value', ''),
+        getattr(field_value, 'type', None),
+        getattr(field_value, 'description', '')
+    )
+
+
+def canonical_json(value: Any) -> str:
+    """Minimal, key-sorted JSON encoding"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+
+
+def format_context_value(value: Any, encoding: str) -> str:
+    """Render a context value for the prompt"""
+    if encoding != 'compact':
+        return str(value)
+    if isinstance(value, str):
+        # Bare strings, unless they would break the table or read as another JSON type
+        if '|' in value or '\n' in value or value != value.strip() or _looks_like_json(value):
+            return canonical_json(value)
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return canonical_json(value)
+
+
+def _looks_like_json(text: str) -> bool:
+    if text in ('true', 'false', 'null', '') or text[0] in '[{"':
+        return True
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _is_redundant_description(field_name: str, description: str) -> bool:
+    """Whether a description only restates the field name (e.g. health -> 'Health')"""
+    return description.strip().lower().rstrip('.') == field_name.replace('_', ' ').lower()
+
+
+def build_context_block(
+    context: Dict[str, Any],
+    encoding: str = None,
+    described_fields: Set[str] = None,
+    header: str = "Current game state",
+    legend: bool = True
+) -> str:
+    """
+    Render context fields for the prompt
+
+    The compact encoding is canonical (sorted fields, minimal JSON) but only
+    marginally shorter than verbose: within about 6% either way for 4 to 32
+    fields (benchmark/prompt_encoding.py).
+
+    Args:
+        context: Context fields (dicts or Pydantic models)
+        encoding: 'verbose' (one '- name: value (description)' line per field) or
+            'compact' (sorted field|value|description table, minimal JSON for
+            non-string values, descriptions omitted for described_fields);
+            defaults to PROMPT_CONTEXT_ENCODING
+        described_fields: Fields whose description the model has already seen
+        header: Block heading
+        legend: Whether the compact heading names the columns; transcript
+            delta turns leave it out, the snapshot turn before them had it
+
+    Returns:
+        Rendered block, ending with a blank line
+    """
+    encoding = encoding or PROMPT_CONTEXT_ENCODING
+    described_fields = described_fields or set()
+
+    if encoding != 'compact':
+        block = f"{header}:\n"
+        for field_name, field_value in context.items():
+            value, _, description = context_field_parts(field_value)
+            if field_name in described_fields:
+                block += f"- {field_name}: {value}\n"
+            else:
+                block += f"- {field_name}: {value} ({description})\n"
+        return block + "\n"
+
+    # Deterministic ordering keeps identical states byte-identical across calls.
+    # Types are implied by the values: bare text for strings, JSON for everything else.
+    block = f"{header} (field|value|description):\n" if legend else f"{header}:\n"
+    for field_name in sorted(context):
+        value, _, description = context_field_parts(context[field_name])
+        row = f"{field_name}|{format_context_value(value, encoding)}"
+        if (
+            description
+            and field_name not in described_fields
+            and not _is_redundant_description(field_name, description)
+        ):
+            row += f"|{description}"
+        block += row + "\n"
+    return block + "\n"
+
+
+def build_user_prompt(
+    prompt: str,
+    context: Dict[str, Any],
+    pre_log_summary: str = None,
+    user_input: str = None,
+    omitted_fields: List[str] = None,
+    encoding: str = None
+) -> str:
     """Build user prompt with all context information"""
     user_prompt = f"{prompt}\n\n"
 
     # Add context
     if context:
-        user_prompt += "Current game state:\n"
-        for field_name, field_value in context.items():
-            # Handle both dict and Pydantic model
-            if isinstance(field_value, dict):
-                value = field_value.get('value', '')
-                description = field_value.get('description', '')
-            else:
-                # Pydantic model or object with attributes
-                value = getattr(field_value, 'value', '')
-                description = getattr(field_value, 'description', '')
+        user_prompt += build_context_block(context, encoding)
 
-            user_prompt += f"- {field_name}: {value} ({description})\n"
-        user_prompt += "\n"
+    # Fields left out by relevance selection still exist and must not be recreated
+    if omitted_fields:
+        user_prompt += f"Other state fields (unchanged, not shown): {', '.join(omitted_fields)}\n\n"
 
     # Add pre-log summary if provided
     if pre_log_summary:
@@ -63,15 +223,356 @@ def build_user_prompt(prompt: str, context: Dict[str, Any], pre_log_summary: str
     return user_prompt
 
 
-def generate_structured(
+_client: Optional[AsyncOpenAI] = None
+
+
+def get_client() -> AsyncOpenAI:
+    """Shared upstream client, so connections are pooled across requests"""
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(base_url=OPENAI_BASE_URL, api_key=OPENAI_API_KEY)
+    return _client
+
+
+async def call_upstream(client: AsyncOpenAI, **request: Any) -> Any:
+    """Call the upstream chat completions API within the adaptive rate limits"""
+    if rate_limiter is None:
+        return await client.chat.completions.create(**request)
+
+    limiter = rate_limiter.limiter(request['model'])
+    tokens = estimate_message_tokens(request['messages']) + request.get('max_tokens', 0) * request.get('n', 1)
+    await limiter.acquire(tokens)
+    try:
+        raw = await client.chat.completions.with_raw_response.create(**request)
+        response = raw.parse()
+    except RateLimitError as e:
+        limiter.release(tokens, e.response.headers, throttled=True)
+        raise
+    except BaseException:
+        limiter.release(tokens)
+        raise
+
+    if request.get('stream', False):
+        # The slot stays taken until the stream is consumed or closed
+        return rate_limiter.hold_stream(limiter, tokens, response, raw.headers)
+    limiter.release(tokens, raw.headers)
+    return response
+
+
+async def create_completion(client: AsyncOpenAI, **request: Any) -> Any:
+    """Call the upstream chat completions API, through the exchange archive when enabled"""
+    if archive is None:
+        return await call_upstream(client, **request)
+
+    stream = request.get('stream', False)
+    if archive.mode == 'replay':
+        return archive.replay_stream(request) if stream else await archive.replay_completion(request)
+
+    if stream:
+        return archive.record_stream(request, await call_upstream(client, **request))
+    started = time.perf_counter()
+    completion = await call_upstream(client, **request)
+    archive.record_completion(request, completion, time.perf_counter() - started)
+    return completion
+
+
+# Try to parse JSON from response with adaptive extraction
+def extract_json_from_text(text: str) -> str:
+    """Extract JSON from mixed content (thoughts + JSON)"""
+    text = text.strip()
+
+    # Method 1: Find JSON code blocks
+    if '```json' in text:
+        start = text.find('```json') + 7
+        end = text.find('```', start)
+        if end != -1:
+            return text[start:end].strip()
+    elif '```' in text:
+        start = text.find('```') + 3
+        end = text.find('```', start)
+        if end != -1:
+            return text[start:end].strip()
+
+    # Method 2: Find JSON object boundaries
+    json_start = -1
+    brace_count = 0
+    in_string = False
+    escape_next = False
+
+    for i, char in enumerate(text):
+        if escape_next:
+            escape_next = False
+            continue
+
+        if char == '\\':
+            escape_next = True
+            continue
+
+        if char == '"' and not escape_next:
+            in_string = not in_string
+            continue
+
+        if not in_string:
+            if char == '{':
+                if json_start == -1:
+                    json_start = i
+                brace_count += 1
+            elif char == '}':
+                if json_start != -1:
+                    brace_count -= 1
+                    if brace_count == 0:
+                        return text[json_start:i+1]
+
+    # Method 3: Try to find simple JSON patterns
+    lines = text.split('\n')
+    json_lines = []
+    in_json = False
+
+    for line in lines:
+        line = line.strip()
+        if line.startswith('{'):
+            in_json = True
+            json_lines.append(line)
+        elif in_json:
+            json_lines.append(line)
+            if line.endswith('}'):
+                break
+
+    if json_lines:
+        potential_json = '\n'.join(json_lines)
+        try:
+            json.loads(potential_json)
+            return potential_json
+        except:
+            pass
+
+    # Method 4: Try the whole text as last resort
+    return text
+
+
+def clean_json_string(json_str: str) -> str:
+    """Clean JSON string by removing/escaping control characters"""
+    # Remove control characters except \n, \r, \t
+    # Control chars are 0x00-0x1F except tab(0x09), newline(0x0A), carriage return(0x0D)
+    cleaned = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F]', '', json_str)
+    return cleaned
+
+
+def parse_json_content(content: str, reasoning_content: str = None) -> Dict[str, Any]:
+    """Parse the JSON object of a model response, falling back to the reasoning text"""
+    # Use content field for JSON parsing, ignore reasoning_content
+    if not content:
+        raise ValueError("No content received from OpenAI API")
+
+    try:
+        # Strategy 1: Try to extract from content first (most reliable)
+        json_content = extract_json_from_text(content)
+        log_payload("Extracted JSON from content", json_content)
+
+        # Validate it's actually JSON-like (starts with { or [)
+        json_content_stripped = json_content.strip()
+        if not json_content_stripped.startswith('{') and not json_content_stripped.startswith('['):
+            logger.warning("Extracted content doesn't look like JSON, trying with reasoning...")
+            # Strategy 2: If content extraction failed, try full text including reasoning
+            if reasoning_content:
+                full_text = f"{reasoning_content}\n\n{content}"
+                json_content = extract_json_from_text(full_text)
+                log_payload("Extracted JSON from full text", json_content)
+
+        # Clean control characters
+        json_content_cleaned = clean_json_string(json_content)
+        if json_content != json_content_cleaned:
+            logger.warning("Control characters found and removed from JSON")
+            log_payload("Cleaned JSON content", json_content_cleaned)
+
+        return json.loads(json_content_cleaned)
+
+    except json.JSONDecodeError as e:
+        logger.error("Failed to parse JSON response: %s (content: %d chars)", e, len(content))
+        log_payload("Extracted JSON content", json_content if 'json_content' in locals() else None)
+        log_payload("Full content", content)
+        log_payload("Reasoning content", reasoning_content or None)
+        raise ValueError(f"Invalid JSON response: {e}")
+
+
+async def parse_choice(choice: Any) -> Dict[str, Any]:
+    """Parse the JSON object of one completion choice, off the event loop when it is large"""
+    message = choice.message
+    content = getattr(message, 'content', '')
+    reasoning_content = getattr(message, 'reasoning_content', '')
+
+    log_payload("Reasoning content", reasoning_content or None)
+    log_payload("Main content", content)
+
+    size = len(content or '') + len(reasoning_content or '')
+    return await offloader.run(size, parse_json_content, content, reasoning_content)
+
+
+def build_usage_info(usages: List[Any], model: str, upstream_seconds: float) -> Optional[UsageInfo]:
+    """Sum the upstream usage blocks of all attempts of one generation"""
+    usages = [usage for usage in usages if usage is not None]
+    if not usages:
+        return None
+
+    def detail(usage: Any, details_name: str, field_name: str) -> int:
+        details = getattr(usage, details_name, None)
+        return (getattr(details, field_name, None) or 0) if details is not None else 0
+
+    prompt_tokens = sum(usage.prompt_tokens or 0 for usage in usages)
+    completion_tokens = sum(usage.completion_tokens or 0 for usage in usages)
+    return UsageInfo(
+        model=model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        reasoning_tokens=sum(detail(usage, 'completion_tokens_details', 'reasoning_tokens') for usage in usages),
+        cached_tokens=sum(detail(usage, 'prompt_tokens_details', 'cached_tokens') for usage in usages),
+        total_tokens=prompt_tokens + completion_tokens,
+        upstream_seconds=round(upstream_seconds, 3),
+        completion_tokens_per_second=round(completion_tokens / upstream_seconds, 1) if upstream_seconds else None,
+        attempts=len(usages)
+    )
+
+
+async def _complete(
+    client: AsyncOpenAI,
+    model: str,
+    messages: List[Dict[str, str]],
+    budget_key: str,
+    n: int = 1
+) -> Tuple[Any, List[Any], float]:
+    """
+    Request a completion, retrying with a larger max_tokens when it is cut off
+
+    Returns:
+        Tuple of (completion, usage blocks of all attempts, upstream seconds)
+    """
+    max_tokens = token_budget.limit(budget_key) if ADAPTIVE_MAX_TOKENS_ENABLED else LLM_MAX_TOKENS
+
+    usages = []
+    upstream_seconds = 0.0
+    while True:
+        logger.info("Calling OpenAI with model=%s, max_tokens=%d, n=%d", model, max_tokens, n)
+
+        # Create completion without streaming
+        started = time.perf_counter()
+        completion = await create_completion(
+            client,
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+            stream=False,
+            **({'n': n} if n > 1 else {})
+        )
+        upstream_seconds += time.perf_counter() - started
+        usages.append(getattr(completion, 'usage', None))
+
+        # Extract content from the completion
+        if not getattr(completion, 'choices', None):
+            logger.error("Invalid response structure from model %s", model)
+            log_payload("Invalid response", repr(completion))
+            raise ValueError("Invalid response structure from OpenAI API")
+
+        truncated = all(choice.finish_reason == 'length' for choice in completion.choices)
+        if not truncated or max_tokens >= LLM_MAX_TOKENS:
+            break
+        # Cut off by the learned limit: retry with more room
+        logger.warning("Response truncated at max_tokens=%d, retrying with a larger limit", max_tokens)
+        max_tokens = min(max_tokens * 2, LLM_MAX_TOKENS)
+
+    usage = usages[-1]
+    if not truncated and usage is not None and usage.completion_tokens:
+        token_budget.record(budget_key, usage.completion_tokens // len(completion.choices))
+    return completion, usages, upstream_seconds
+
+
+async def _generate_n_choices(
+    client: AsyncOpenAI,
+    model: str,
+    messages: List[Dict[str, str]],
+    budget_key: str,
+    candidates: int,
+    accept: Optional[Callable[[Dict[str, Any]], bool]]
+) -> Tuple[Dict[str, Any], Optional[UsageInfo]]:
+    """Request several choices in one call and return the first acceptable one"""
+    completion, usages, upstream_seconds = await _complete(client, model, messages, budget_key, n=candidates)
+    usage_info = build_usage_info(usages, model, upstream_seconds)
+
+    fallback = None
+    first_error = None
+    for index, choice in enumerate(completion.choices):
+        try:
+            result = await parse_choice(choice)
+        except ValueError as e:
+            first_error = first_error or e
+            continue
+        if accept is None or accept(result):
+            logger.info("Selected candidate %d/%d", index + 1, len(completion.choices))
+            return result, usage_info
+        if fallback is None:
+            fallback = result
+
+    if fallback is not None:
+        return fallback, usage_info
+    raise first_error or ValueError("Invalid response structure from OpenAI API")
+
+
+async def _generate_parallel(
+    client: AsyncOpenAI,
+    model: str,
+    messages: List[Dict[str, str]],
+    budget_key: str,
+    candidates: int,
+    accept: Optional[Callable[[Dict[str, Any]], bool]]
+) -> Tuple[Dict[str, Any], Optional[UsageInfo]]:
+    """Run parallel calls, return the first acceptable result and cancel the rest"""
+    started = time.perf_counter()
+    usages = []
+
+    async def attempt() -> Dict[str, Any]:
+        completion, attempt_usages, _ = await _complete(client, model, messages, budget_key)
+        usages.extend(attempt_usages)
+        return await parse_choice(completion.choices[0])
+
+    tasks = [asyncio.create_task(attempt()) for _ in range(candidates)]
+    fallback = None
+    first_error = None
+    try:
+        for index, next_done in enumerate(asyncio.as_completed(tasks)):
+            try:
+                result = await next_done
+            except Exception as e:
+                first_error = first_error or e
+                continue
+            if accept is None or accept(result):
+                logger.info("Selected candidate %d of %d parallel calls", index + 1, candidates)
+                return result, build_usage_info(usages, model, time.perf_counter() - started)
+            if fallback is None:
+                fallback = result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if fallback is not None:
+        return fallback, build_usage_info(usages, model, time.perf_counter() - started)
+    raise first_error
+
+
+async def generate_structured(
     prompt: str,
     context: Dict[str, Any],
     schema: Dict[str, Any],
     pre_log_summary: str = None,
     user_input: str = None,
     model: str = None,
-    stream: bool = False
-) -> Dict[str, Any]:
+    stream: bool = False,
+    messages: List[Dict[str, str]] = None,
+    omitted_fields: List[str] = None,
+    encoding: str = None,
+    candidates: int = None,
+    accept: Callable[[Dict[str, Any]], bool] = None,
+    managed_fields: List[str] = None
+) -> Any:
     """
     Generate structured output using OpenAI API
 
@@ -83,168 +584,56 @@ def generate_structured(
         user_input: User's current input
         model: Override model (defaults to config model)
         stream: Whether to use streaming
+        messages: Prebuilt chat messages (session transcript); replaces the prompts built from the other arguments
+        omitted_fields: Context fields left out of the prompt by relevance selection
+        encoding: Context encoding override ('verbose' or 'compact')
+        candidates: Number of candidates to sample (defaults to LLM_CANDIDATES)
+        accept: Returns whether a parsed candidate is acceptable; the first
+            acceptable candidate wins, otherwise the first parsed one is returned
+        managed_fields: Context fields updated by rules, listed in the system prompt
 
     Returns:
-        Dict with generated structured data
+        Tuple of (dict with generated structured data, usage info), or the
+        upstream chunk stream when stream is set
     """
-    client = OpenAI(base_url=OPENAI_BASE_URL, api_key=OPENAI_API_KEY)
+    client = get_client()
     model = model or OPENAI_MODEL
 
-    system_prompt = build_system_prompt(schema)
-    user_prompt = build_user_prompt(prompt, context, pre_log_summary, user_input)
+    if messages is None:
+        system_prompt = build_system_prompt(schema, managed_fields)
+        user_prompt = build_user_prompt(prompt, context, pre_log_summary, user_input, omitted_fields, encoding)
 
-    logger.debug(f"System prompt: {system_prompt}")
-    logger.debug(f"User prompt: {user_prompt}")
-    logger.info(f"Calling OpenAI with model={model}, max_tokens={LLM_MAX_TOKENS}")
+        log_payload("System prompt", system_prompt)
+        log_payload("User prompt", user_prompt)
 
-    messages = [
-        {'role': 'system', 'content': system_prompt},
-        {'role': 'user', 'content': user_prompt}
-    ]
+        messages = [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_prompt}
+        ]
+    else:
+        logger.debug("Transcript messages: %d", len(messages))
+        log_payload("Last user prompt", messages[-1]['content'])
 
     if stream:
-        return client.chat.completions.create(
+        logger.info("Calling OpenAI with model=%s, max_tokens=%d", model, LLM_MAX_TOKENS)
+        return await create_completion(
+            client,
             model=model,
             messages=messages,
             max_tokens=LLM_MAX_TOKENS,
             response_format={"type": "json_object"},
-            stream=True
-        )
-    else:
-        # Create completion without streaming
-        completion = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            max_tokens=LLM_MAX_TOKENS,
-            response_format={"type": "json_object"},
-            stream=False
+            stream=True,
+            **({'stream_options': {'include_usage': True}} if LLM_STREAM_INCLUDE_USAGE else {})
         )
 
-        # Extract content from the completion
-        if not hasattr(completion, 'choices') or len(completion.choices) == 0:
-            logger.error(f"Invalid response structure: {completion}")
-            raise ValueError("Invalid response structure from OpenAI API")
+    budget_key = TokenBudget.key(schema, model)
+    candidates = candidates or LLM_CANDIDATES
 
-        message = completion.choices[0].message
-        content = getattr(message, 'content', '')
-        reasoning_content = getattr(message, 'reasoning_content', '')
-
-        logger.debug(f"Reasoning content: {reasoning_content}")
-        logger.debug(f"Main content: {content}")
-
-        # Use content field for JSON parsing, ignore reasoning_content
-        if not content:
-            raise ValueError("No content received from OpenAI API")
-
-        # Try to parse JSON from response with adaptive extraction
-        def extract_json_from_text(text: str) -> str:
-            """Extract JSON from mixed content (thoughts + JSON)"""
-            text = text.strip()
-
-            # Method 1: Find JSON code blocks
-            if '```json' in text:
-                start = text.find('```json') + 7
-                end = text.find('```', start)
-                if end != -1:
-                    return text[start:end].strip()
-            elif '```' in text:
-                start = text.find('```') + 3
-                end = text.find('```', start)
-                if end != -1:
-                    return text[start:end].strip()
-
-            # Method 2: Find JSON object boundaries
-            json_start = -1
-            brace_count = 0
-            in_string = False
-            escape_next = False
-
-            for i, char in enumerate(text):
-                if escape_next:
-                    escape_next = False
-                    continue
-
-                if char == '\\':
-                    escape_next = True
-                    continue
-
-                if char == '"' and not escape_next:
-                    in_string = not in_string
-                    continue
-
-                if not in_string:
-                    if char == '{':
-                        if json_start == -1:
-                            json_start = i
-                        brace_count += 1
-                    elif char == '}':
-                        if json_start != -1:
-                            brace_count -= 1
-                            if brace_count == 0:
-                                return text[json_start:i+1]
-
-            # Method 3: Try to find simple JSON patterns
-            lines = text.split('\n')
-            json_lines = []
-            in_json = False
-
-            for line in lines:
-                line = line.strip()
-                if line.startswith('{'):
-                    in_json = True
-                    json_lines.append(line)
-                elif in_json:
-                    json_lines.append(line)
-                    if line.endswith('}'):
-                        break
-
-            if json_lines:
-                potential_json = '\n'.join(json_lines)
-                try:
-                    json.loads(potential_json)
-                    return potential_json
-                except:
-                    pass
-
-            # Method 4: Try the whole text as last resort
-            return text
-
-        def clean_json_string(json_str: str) -> str:
-            """Clean JSON string by removing/escaping control characters"""
-            import re
-            # Remove control characters except \n, \r, \t
-            # Control chars are 0x00-0x1F except tab(0x09), newline(0x0A), carriage return(0x0D)
-            cleaned = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F]', '', json_str)
-            return cleaned
+    if candidates > 1:
+        if LLM_CANDIDATES_MODE == 'parallel':
+            return await _generate_parallel(client, model, messages, budget_key, candidates, accept)
+        return await _generate_n_choices(client, model, messages, budget_key, candidates, accept)
 
-        try:
-            # Strategy 1: Try to extract from content first (most reliable)
-            json_content = extract_json_from_text(content)
-            logger.debug(f"Extracted JSON from content: {json_content[:200]}...")
-
-            # Validate it's actually JSON-like (starts with { or [)
-            json_content_stripped = json_content.strip()
-            if not json_content_stripped.startswith('{') and not json_content_stripped.startswith('['):
-                logger.warning("Extracted content doesn't look like JSON, trying with reasoning...")
-                # Strategy 2: If content extraction failed, try full text including reasoning
-                if reasoning_content:
-                    full_text = f"{reasoning_content}\n\n{content}"
-                    json_content = extract_json_from_text(full_text)
-                    logger.debug(f"Extracted JSON from full text: {json_content[:200]}...")
-
-            # Clean control characters
-            json_content_cleaned = clean_json_string(json_content)
-            if json_content != json_content_cleaned:
-                logger.warning("Control characters found and removed from JSON")
-                logger.debug(f"Cleaned JSON content: {json_content_cleaned[:200]}...")
-
-            result = json.loads(json_content_cleaned)
-            logger.debug(f"Parsed result: {result}")
-            return result
-
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {e}")
-            logger.error(f"Extracted JSON content: {json_content if 'json_content' in locals() else 'N/A'}")
-            logger.error(f"Full content: {content[:500]}...")
-            logger.error(f"Reasoning content: {reasoning_content[:500] if reasoning_content else 'N/A'}")
-            raise ValueError(f"Invalid JSON response: {e}")
\ No newline at end of file
+    completion, usages, upstream_seconds = await _complete(client, model, messages, budget_key)
+    result = await parse_choice(completion.choices[0])
+    return result, build_usage_info(usages, model, upstream_seconds)
@@ -1,57 +1,516 @@
 # OpenAI LLM Service - FastAPI HTTP Server
+import asyncio
 import logging
-from fastapi import FastAPI, HTTPException
+import time
+from contextlib import nullcontext
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple, Union
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response, WebSocket
 from fastapi.responses import StreamingResponse
 import uvicorn
 
 from .config import (
-    SERVICE_HOST, SERVICE_PORT, OPENAI_MODEL, CONTEXT_MAX_FIELDS, LOG_LEVEL
+    SERVICE_HOST, SERVICE_PORT, OPENAI_MODEL, CONTEXT_MAX_FIELDS, LOG_LEVEL,
+    SESSION_TRANSCRIPT_ENABLED, SESSION_TRANSCRIPT_MAX_TOKENS,
+    SESSION_TRANSCRIPT_MAX_SESSIONS, SESSION_TRANSCRIPT_TTL_SECONDS,
+    CONTEXT_CACHE_MAX_SESSIONS, CONTEXT_CACHE_TTL_SECONDS,
+    CONTEXT_SELECTION_ENABLED, CONTEXT_HARD_MAX_FIELDS, CONTEXT_PINNED_FIELDS,
+    USAGE_STATS_WINDOWS, USAGE_STATS_MAX_SAMPLES, USAGE_STATS_MAX_SESSIONS, USAGE_STATS_MAX_MODELS,
+    USAGE_STATS_MODEL_TTL_SECONDS,
+    LLM_CASCADE_MODELS, SCHEDULER_MAX_CONCURRENCY, SCHEDULER_KEY_RATE, SCHEDULER_KEY_BURST,
+    SCHEDULER_MAX_KEYS, SCHEDULER_MAX_QUEUE_SECONDS, SCHEDULER_KEY_WEIGHTS, SCHEDULER_ENABLED, IDEMPOTENCY_MAX_KEYS, IDEMPOTENCY_TTL_SECONDS,
+    RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_MEMORY_ENTRIES, RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_BYTES, DEBUG_ENDPOINTS_ENABLED, DEBUG_ADMIN_TOKEN,
+    EVENT_LOOP_LAG_INTERVAL_SECONDS, EVENT_LOOP_LAG_WINDOW, WS_MAX_IN_FLIGHT,
+    STREAM_COALESCE_MAX_BYTES, STREAM_COALESCE_MAX_DELAY_MS, STREAM_COALESCE_QUEUE_SIZE, CONTEXT_RULES_PATH,
+    SPECULATION_ENABLED, SPECULATION_TOP_K, SPECULATION_MIN_COUNT, SPECULATION_MAX_INPUTS,
+    SPECULATION_MAX_SESSIONS, SPECULATION_SESSION_TTL_SECONDS,
+    SPECULATION_MAX_CONCURRENCY, SPECULATION_RESERVE_SLOTS, SPECULATION_MAX_PER_MINUTE,
+    SPECULATION_MAX_ENTRIES, SPECULATION_TTL_SECONDS, SIMILARITY_CACHE_ENABLED, SIMILARITY_CACHE_THRESHOLD,
+    SIMILARITY_CACHE_ENTRIES, SIMILARITY_CACHE_DIMENSIONS, SIMILARITY_CACHE_NGRAM,
+    SIMILARITY_CACHE_TTL_SECONDS, SIMILARITY_CACHE_SAMPLE_RATE, DEGRADED_MODE_ENABLED, DEGRADED_QUEUE_DEPTH,
+    DEGRADED_FAILURE_THRESHOLD, DEGRADED_SLOW_SECONDS, DEGRADED_OPEN_SECONDS
 )
-from .models import StructuredGenerationRequest, StructuredGenerationResponse
-from .validator import validate_schema, generate_fix_suggestion
+from .cascade import ModelCascade
+from .context_cache import ContextCache
+from .context_selector import select_context_fields
+from .debug import set_stage
+from .fingerprint import fingerprint
+from .logging_config import setup_logging, new_request_id, request_id_var
+from .fast_request import FastGenerationRequest, parse_generation_request, request_body_openapi
+from .models import StructuredGenerationResponse, UsageInfo, ValidationResult
+from .offload import LoopLagMonitor
+from .response_cache import DiskCache, ResponseCache
+from .rules import RuleEngine
+from .degraded import CircuitBreaker, DegradedMode, is_upstream_failure, local_result
+from .scheduler import FairScheduler, SchedulerRejected
+from .similarity_cache import SimilarityCache
+from .speculation import InputFrequencyModel, Speculator
+from .stream_coalescer import StreamStats, coalesce_deltas, sse_frame
+from .transcript import TranscriptStore
+from .ttl_store import TTLStore
+from .usage_stats import UsageStats
+from .validator import validate_schema, validate_context_changes, check_quality, generate_fix_suggestion
+from .wire_format import MsgPackRoute, negotiate
+from .ws_channel import GenerationChannel
 
 # Configure logging
-logging.basicConfig(
-    level=getattr(logging, LOG_LEVEL.upper()),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+setup_logging(LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="OpenAI LLM Service", version="1.0.0")
+# Generation endpoints accept MessagePack as well as JSON bodies
+app.router.route_class = MsgPackRoute
 
 
-@app.post("/generate_structured", response_model=StructuredGenerationResponse)
-async def generate_structured_data(request: StructuredGenerationRequest):
-    """Generate structured data using OpenAI API"""
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """Tag the request, and every log record written while serving it, with a request ID"""
+    request_id = request.headers.get("X-Request-ID") or new_request_id()
+    token = request_id_var.set(request_id)
     try:
-        logger.info(f"Processing structured generation request")
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
 
-        # Validate context length
-        if len(request.context) > CONTEXT_MAX_FIELDS:
-            error_msg = f"Context exceeds maximum allowed fields: {len(request.context)} > {CONTEXT_MAX_FIELDS}"
-            logger.error(error_msg)
+
+loop_lag = LoopLagMonitor(EVENT_LOOP_LAG_INTERVAL_SECONDS, EVENT_LOOP_LAG_WINDOW)
+
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    loop_lag.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_work():
+    from .openai_client import offloader
+
+    loop_lag.stop()
+    offloader.shutdown()
+
+
+if DEBUG_ENDPOINTS_ENABLED:
+    from .debug import router as debug_router, track_in_flight
+
+    if not DEBUG_ADMIN_TOKEN:
+        logger.warning("DEBUG_ENDPOINTS_ENABLED is set without DEBUG_ADMIN_TOKEN, debug endpoints will reject all calls")
+    app.include_router(debug_router)
+    app.middleware("http")(track_in_flight)
+
+transcript_store = TranscriptStore(
+    max_sessions=SESSION_TRANSCRIPT_MAX_SESSIONS,
+    ttl_seconds=SESSION_TRANSCRIPT_TTL_SECONDS,
+    max_tokens=SESSION_TRANSCRIPT_MAX_TOKENS
+)
+
+context_cache = ContextCache(
+    max_sessions=CONTEXT_CACHE_MAX_SESSIONS,
+    ttl_seconds=CONTEXT_CACHE_TTL_SECONDS
+)
+
+usage_stats = UsageStats(
+    windows=USAGE_STATS_WINDOWS,
+    max_samples=USAGE_STATS_MAX_SAMPLES,
+    max_sessions=USAGE_STATS_MAX_SESSIONS,
+    max_models=USAGE_STATS_MAX_MODELS,
+    model_ttl_seconds=USAGE_STATS_MODEL_TTL_SECONDS
+)
+
+model_cascade = ModelCascade(LLM_CASCADE_MODELS) if LLM_CASCADE_MODELS else None
+
+rule_engine = RuleEngine.load(CONTEXT_RULES_PATH) if CONTEXT_RULES_PATH else None
+
+response_cache = ResponseCache(
+    memory_entries=RESPONSE_CACHE_MEMORY_ENTRIES,
+    ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+    disk=DiskCache.open(
+        path=RESPONSE_CACHE_PATH,
+        max_bytes=RESPONSE_CACHE_MAX_BYTES,
+        ttl_seconds=RESPONSE_CACHE_TTL_SECONDS
+    ) if RESPONSE_CACHE_PATH else None
+) if RESPONSE_CACHE_ENABLED else None
+
+similarity_cache = SimilarityCache(
+    max_entries=SIMILARITY_CACHE_ENTRIES,
+    dimensions=SIMILARITY_CACHE_DIMENSIONS,
+    ngram=SIMILARITY_CACHE_NGRAM,
+    threshold=SIMILARITY_CACHE_THRESHOLD,
+    ttl_seconds=SIMILARITY_CACHE_TTL_SECONDS,
+    sample_rate=SIMILARITY_CACHE_SAMPLE_RATE
+) if SIMILARITY_CACHE_ENABLED else None
+
+# Idempotency-Key -> (request fingerprint, generation task)
+idempotency_store = TTLStore(IDEMPOTENCY_MAX_KEYS, IDEMPOTENCY_TTL_SECONDS)
+
+scheduler = FairScheduler(
+    max_concurrency=SCHEDULER_MAX_CONCURRENCY,
+    key_rate=SCHEDULER_KEY_RATE,
+    key_burst=SCHEDULER_KEY_BURST,
+    max_keys=SCHEDULER_MAX_KEYS,
+    max_queue_seconds=SCHEDULER_MAX_QUEUE_SECONDS,
+    weights=SCHEDULER_KEY_WEIGHTS
+) if SCHEDULER_ENABLED else None
+
+degraded_mode = DegradedMode(
+    breaker=CircuitBreaker(
+        failure_threshold=DEGRADED_FAILURE_THRESHOLD,
+        open_seconds=DEGRADED_OPEN_SECONDS,
+        slow_seconds=DEGRADED_SLOW_SECONDS
+    ),
+    scheduler=scheduler,
+    queue_depth=DEGRADED_QUEUE_DEPTH
+) if DEGRADED_MODE_ENABLED else None
+
+# Frames sent on /generate_structured_stream
+stream_stats = StreamStats()
+
+
+def record_usage(usage: Optional[UsageInfo], session_id: Optional[str] = None) -> None:
+    """Add the usage of one generation to the rolling statistics"""
+    if usage is None:
+        return
+    usage_stats.record(
+        model=usage.model,
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens,
+        reasoning_tokens=usage.reasoning_tokens,
+        cached_tokens=usage.cached_tokens,
+        upstream_seconds=usage.upstream_seconds,
+        session_id=session_id
+    )
+
+
+def response_cache_key(request: FastGenerationRequest) -> Optional[str]:
+    """Response cache key of a request, or None when it must not be cached"""
+    # Session transcripts depend on the turns before, not only on the request
+    if response_cache is None or (SESSION_TRANSCRIPT_ENABLED and request.session_id):
+        return None
+    return fingerprint({
+        'prompt': request.prompt,
+        'context': request.context,
+        'pre_log_summary': request.pre_log_summary,
+        'user_input': request.user_input,
+        'schema': request.schema,
+        'model': request.model or LLM_CASCADE_MODELS or OPENAI_MODEL
+    })
+
+
+def similarity_group(request: FastGenerationRequest) -> Optional[str]:
+    """Near-duplicate cache group of a request (everything but the input), or None when it must not be cached"""
+    if similarity_cache is None or (SESSION_TRANSCRIPT_ENABLED and request.session_id):
+        return None
+    return fingerprint({
+        'prompt': request.prompt,
+        'context': request.context,
+        # The story so far shapes the narrative as much as the context does
+        'pre_log_summary': request.pre_log_summary,
+        'schema': request.schema,
+        'model': request.model or LLM_CASCADE_MODELS or OPENAI_MODEL
+    })
+
+
+def speculates(request: FastGenerationRequest) -> bool:
+    """Whether a request may be served from, and followed by, speculative generations"""
+    # Speculative prompts leave out the session transcript, and a served result commits no turn
+    return speculator is not None and bool(request.session_id) and not SESSION_TRANSCRIPT_ENABLED
+
+
+def scheduler_key(request: FastGenerationRequest) -> Optional[str]:
+    """Fair-queuing key of a request: its tenant, else its session"""
+    return request.tenant_id or request.session_id
+
+
+def generation_slot(request: FastGenerationRequest):
+    """Scheduler slot held while generating; no wait and no limit when scheduling is off"""
+    if scheduler is None:
+        return nullcontext()
+    return scheduler.slot(scheduler_key(request), request.priority)
+
+
+def scheduler_rejection(error: SchedulerRejected) -> StructuredGenerationResponse:
+    """Response for a request refused by the scheduler"""
+    return StructuredGenerationResponse(
+        success=False,
+        message=str(error),
+        error_code=error.error_code,
+        fix_suggestion="Reduce the request rate or retry later"
+    )
+
+
+def resolve_request_context(request: FastGenerationRequest) -> Optional[StructuredGenerationResponse]:
+    """
+    Expand a context-delta request into the full session context
+
+    Fills request.context and request.pre_log_summary from the session context
+    cache. Returns an error response when the delta base version is unknown,
+    in which case the caller must resend the full context.
+    """
+    if not request.session_id:
+        if request.base_context_version is not None:
             return StructuredGenerationResponse(
                 success=False,
-                message=error_msg,
-                error_code="CONTEXT_TOO_LARGE",
-                fix_suggestion=f"Reduce context fields to {CONTEXT_MAX_FIELDS} or less"
+                message="Context delta requires a session_id",
+                error_code="CONTEXT_VERSION_MISMATCH",
+                fix_suggestion="Resend the full context without base_context_version"
             )
+        return None
+
+    resolved = context_cache.resolve(
+        session_id=request.session_id,
+        context=request.context,
+        context_version=request.context_version,
+        base_context_version=request.base_context_version,
+        removed_fields=request.removed_context_fields,
+        pre_log_summary=request.pre_log_summary
+    )
+    if resolved is None:
+        cached = context_cache.get(request.session_id)
+        return StructuredGenerationResponse(
+            success=False,
+            message=f"Context base version {request.base_context_version} does not match the session cache",
+            error_code="CONTEXT_VERSION_MISMATCH",
+            fix_suggestion="Resend the full context without base_context_version",
+            context_version=cached.version if cached else None
+        )
+
+    request.context = resolved.fields
+    request.pre_log_summary = resolved.pre_log_summary
+    request.context_version = resolved.version
+    return None
+
+
+def context_field_limit() -> int:
+    """Most fields a context may hold"""
+    # With relevance selection, only the hard limit applies; the prompt gets the top CONTEXT_MAX_FIELDS
+    return CONTEXT_HARD_MAX_FIELDS if CONTEXT_SELECTION_ENABLED else CONTEXT_MAX_FIELDS
+
+
+def check_context_size(request: FastGenerationRequest) -> Optional[StructuredGenerationResponse]:
+    """Reject contexts above the field limit"""
+    max_fields = context_field_limit()
+    if len(request.context) <= max_fields:
+        return None
+
+    error_msg = f"Context exceeds maximum allowed fields: {len(request.context)} > {max_fields}"
+    logger.error(error_msg)
+    return StructuredGenerationResponse(
+        success=False,
+        message=error_msg,
+        error_code="CONTEXT_TOO_LARGE",
+        fix_suggestion=f"Reduce context fields to {max_fields} or less"
+    )
+
+
+def select_prompt_context(request: FastGenerationRequest) -> Dict[str, Any]:
+    """Return the subset of request.context rendered into the prompt"""
+    if not CONTEXT_SELECTION_ENABLED or len(request.context) <= CONTEXT_MAX_FIELDS:
+        return request.context
 
-        from .openai_client import generate_structured
+    cached = context_cache.get(request.session_id) if request.session_id else None
+    selected = select_context_fields(
+        request.context,
+        top_k=CONTEXT_MAX_FIELDS,
+        pinned_fields=CONTEXT_PINNED_FIELDS,
+        user_input=request.user_input,
+        recent_events=request.pre_log_summary.recent_events if request.pre_log_summary else None,
+        changed_at=cached.changed_at if cached else None,
+        current_version=cached.version if cached else None
+    )
+    logger.info(f"Selected {len(selected)} of {len(request.context)} context fields for the prompt")
+    return selected
+
+
+def with_rule_changes(result: Dict[str, Any], rule_changes: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """A copy of result with the request's rule changes merged in (result itself when there are none)"""
+    if not rule_changes:
+        return result
+    merged = dict(result)
+    if isinstance(merged.get('context_changes'), dict):
+        merged['context_changes'] = dict(merged['context_changes'])
+    rule_engine.merge(merged, rule_changes)
+    return merged
+
+
+def degraded_response(
+    request: FastGenerationRequest,
+    reason: str,
+    rule_changes: Optional[Dict[str, Any]]
+) -> Optional[StructuredGenerationResponse]:
+    """Local result for a request while degraded, or None when the schema cannot be filled locally"""
+    result, errors = validate_result(local_result(request), request)
+    if errors:
+        logger.warning(f"Local result does not match the schema, sending upstream: {errors}")
+        return None
+    # Rule changes are deterministic, so they still apply
+    result = with_rule_changes(result, rule_changes)
+    degraded_mode.record_served(reason)
+    logger.warning(f"Structured generation served locally in degraded mode ({reason})")
+    return StructuredGenerationResponse(
+        success=True,
+        message=f"Generation completed (degraded: {reason})",
+        result=result,
+        context_version=request.context_version,
+        degraded=True
+    )
+
+
+def validate_result(
+    result: Dict[str, Any],
+    request: FastGenerationRequest
+) -> Tuple[Dict[str, Any], List[ValidationResult]]:
+    """
+    Validate a generated result against the request schema
+
+    When the schema has context_changes, its entries are also validated and
+    normalized against the request context; the normalized result is
+    returned with the errors, and the given one is left unchanged.
+    """
+    errors = validate_schema(result, request.schema)
+    if 'context_changes' in request.schema:
+        result, change_errors = validate_context_changes(result, request.context, context_field_limit())
+        errors += change_errors
+    return result, errors
+
+
+async def run_generation(request: FastGenerationRequest) -> StructuredGenerationResponse:
+    """Generate structured data using OpenAI API"""
+    try:
+        logger.info(f"Processing structured generation request")
+
+        mismatch = resolve_request_context(request)
+        if mismatch:
+            return mismatch
+
+        # Validate context length
+        too_large = check_context_size(request)
+        if too_large:
+            return too_large
+
+        if speculates(request):
+            speculated = speculator.take(request)
+            if speculated is not None:
+                logger.info("Structured generation served from a speculative result")
+                speculator.after_step(request, speculated)
+                return StructuredGenerationResponse(
+                    success=True,
+                    message="Generation completed (speculative)",
+                    result=speculated,
+                    context_version=request.context_version
+                )
+
+        # Routine per-step effects are applied here instead of being restated by the model
+        rule_changes = None
+        managed_fields = None
+        if rule_engine:
+            request.context, rule_changes = rule_engine.apply(request.context, request.elapsed_seconds)
+            managed_fields = rule_engine.managed_fields(request.context)
+
+        # Cached results hold the model's output only; the rule changes of this request are merged in
+        cache_key = response_cache_key(request)
+        if cache_key:
+            cached = await response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Structured generation served from the response cache")
+                return StructuredGenerationResponse(
+                    success=True,
+                    message="Generation completed (cached)",
+                    result=with_rule_changes(cached, rule_changes),
+                    context_version=request.context_version
+                )
+
+        similarity_key = similarity_group(request)
+        if similarity_key:
+            similar = similarity_cache.get(similarity_key, request.user_input)
+            if similar is not None:
+                logger.info("Structured generation served from the near-duplicate cache")
+                return StructuredGenerationResponse(
+                    success=True,
+                    message="Generation completed (cached, similar input)",
+                    result=with_rule_changes(similar, rule_changes),
+                    context_version=request.context_version
+                )
+
+        # Answer at once instead of waiting on a failing or saturated upstream; returning here keeps
+        # the local answer out of the response and similarity caches
+        degraded_reason = degraded_mode.reason(request) if degraded_mode else None
+        if degraded_reason:
+            degraded = degraded_response(request, degraded_reason, rule_changes)
+            if degraded:
+                return degraded
+
+        prompt_context = select_prompt_context(request)
+        omitted_fields = [name for name in request.context if name not in prompt_context]
+
+        from .openai_client import generate_structured, build_system_prompt
 
         try:
-            result = generate_structured(
-                prompt=request.prompt,
-                context=request.context,
-                schema=request.schema,
-                pre_log_summary=request.pre_log_summary,
-                user_input=request.user_input,
-                model=request.model,
-                stream=request.stream
-            )
+            # Session mode: extend the session transcript instead of re-serializing the world
+            turn = None
+            if SESSION_TRANSCRIPT_ENABLED and request.session_id and not request.stream:
+                turn = transcript_store.begin_turn(
+                    session_id=request.session_id,
+                    system_prompt=build_system_prompt(request.schema, managed_fields),
+                    prompt=request.prompt,
+                    context=prompt_context,
+                    pre_log_summary=request.pre_log_summary,
+                    user_input=request.user_input,
+                    all_field_names=set(request.context) if omitted_fields else None
+                )
 
-            # Validate result against schema
-            validation_errors = validate_schema(result, request.schema)
+            # Candidates are checked up to three times (accept, cascade check,
+            # final), so each is validated once; the entry keeps the candidate
+            # alive, so its id is not reused
+            validations: Dict[int, Tuple[Dict[str, Any], Dict[str, Any], List[ValidationResult]]] = {}
+
+            def validated(candidate: Dict[str, Any]) -> Tuple[Dict[str, Any], List[ValidationResult]]:
+                entry = validations.get(id(candidate))
+                if entry is None:
+                    entry = validations[id(candidate)] = (candidate, *validate_result(candidate, request))
+                return entry[1], entry[2]
+
+            async def generate(model: Optional[str]):
+                result, usage = await generate_structured(
+                    prompt=request.prompt,
+                    context=prompt_context,
+                    schema=request.schema,
+                    pre_log_summary=request.pre_log_summary,
+                    user_input=request.user_input,
+                    model=model,
+                    stream=request.stream,
+                    messages=turn.messages if turn else None,
+                    omitted_fields=omitted_fields,
+                    accept=lambda candidate: not validated(candidate)[1],
+                    managed_fields=managed_fields
+                )
+                record_usage(usage, request.session_id)
+                return result, usage
+
+            def check(result: Dict[str, Any]):
+                issues = [f"{error.field}: expected {error.expected}" for error in validated(result)[1]]
+                return issues + check_quality(result, request.schema)
+
+            set_stage('queued')
+            async with generation_slot(request):
+                set_stage('generating')
+                started = time.perf_counter()
+                try:
+                    # An explicit model bypasses the cascade
+                    if model_cascade and not request.model:
+                        result, usage = await model_cascade.run(generate, check)
+                    else:
+                        result, usage = await generate(request.model)
+                except Exception as e:
+                    if degraded_mode and is_upstream_failure(e):
+                        degraded_mode.breaker.record(False, time.perf_counter() - started)
+                    raise
+                if degraded_mode:
+                    degraded_mode.breaker.record(True, time.perf_counter() - started)
+
+            set_stage('validating')
+            # Validate result against schema and the current context
+            result, validation_errors = validated(result)
 
             if validation_errors:
                 logger.warning(f"Schema validation failed: {validation_errors}")
@@ -60,16 +519,34 @@ async def generate_structured_data(request: StructuredGenerationRequest):
                     message="Generated data does not match required schema",
                     error_code="SCHEMA_VALIDATION_FAILED",
                     validation_errors=validation_errors,
-                    fix_suggestion=generate_fix_suggestion(validation_errors)
+                    fix_suggestion=generate_fix_suggestion(validation_errors),
+                    usage=usage
                 )
 
+            if turn:
+                transcript_store.commit(turn, result)
+            if cache_key:
+                await response_cache.set(cache_key, result)
+            if similarity_key:
+                similarity_cache.set(similarity_key, request.user_input, result)
+            # After the transcript commit and the caches, which keep the model's own (shorter) output:
+            # a cache hit may come with other rule changes
+            result = with_rule_changes(result, rule_changes)
+            if speculates(request):
+                speculator.after_step(request, result)
+
             logger.info("Structured generation completed successfully")
             return StructuredGenerationResponse(
                 success=True,
                 message="Generation completed",
-                result=result
+                result=result,
+                context_version=request.context_version,
+                usage=usage
             )
 
+        except SchedulerRejected as e:
+            logger.warning(f"Request rejected by scheduler: {e}")
+            return scheduler_rejection(e)
         except ValueError as e:
             logger.error(f"JSON parsing failed: {e}")
             return StructuredGenerationResponse(
@@ -92,44 +569,183 @@ async def generate_structured_data(request: StructuredGenerationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/generate_structured_stream")
-async def generate_structured_data_stream(request: StructuredGenerationRequest):
-    """Generate structured data using OpenAI API with streaming"""
-    try:
-        if not request.stream:
-            raise HTTPException(status_code=400, detail="This endpoint requires stream=true")
+speculator = Speculator(
+    generate=run_generation,
+    scheduler=scheduler,
+    model=InputFrequencyModel(
+        max_inputs=SPECULATION_MAX_INPUTS,
+        max_sessions=SPECULATION_MAX_SESSIONS,
+        ttl_seconds=SPECULATION_SESSION_TTL_SECONDS,
+        min_count=SPECULATION_MIN_COUNT
+    ),
+    top_k=SPECULATION_TOP_K,
+    max_concurrency=SPECULATION_MAX_CONCURRENCY,
+    reserve_slots=SPECULATION_RESERVE_SLOTS,
+    rate_per_minute=SPECULATION_MAX_PER_MINUTE,
+    max_entries=SPECULATION_MAX_ENTRIES,
+    ttl_seconds=SPECULATION_TTL_SECONDS
+) if SPECULATION_ENABLED else None
 
-        # Validate context length
-        if len(request.context) > CONTEXT_MAX_FIELDS:
-            error_msg = f"Context exceeds maximum allowed fields: {len(request.context)} > {CONTEXT_MAX_FIELDS}"
-            logger.error(error_msg)
+
+@app.post(
+    "/generate_structured",
+    response_model=StructuredGenerationResponse,
+    openapi_extra=request_body_openapi()
+)
+async def generate_structured_data(
+    http_request: Request,
+    response: Response,
+    request: FastGenerationRequest = Depends(parse_generation_request),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Generate structured data using OpenAI API
+
+    With an Idempotency-Key header, a repeated key returns the stored response of
+    the first request, or waits for it while it is still running, instead of
+    generating again. Request and response bodies may be MessagePack instead of JSON.
+    """
+    result = await run_idempotent_generation(request, response, idempotency_key)
+    return negotiate(http_request, result, response.headers)
+
+
+async def run_idempotent_generation(
+    request: FastGenerationRequest,
+    response: Response,
+    idempotency_key: Optional[str]
+) -> StructuredGenerationResponse:
+    """Run a generation, or return the stored result of the same Idempotency-Key"""
+    if not idempotency_key:
+        return await run_generation(request)
+
+    request_fingerprint = fingerprint(request)
+    entry = idempotency_store.get(idempotency_key)
+    if entry is not None:
+        stored_fingerprint, generation = entry
+        if stored_fingerprint != request_fingerprint:
+            logger.warning(f"Idempotency key {idempotency_key} reused with a different request")
             return StructuredGenerationResponse(
                 success=False,
-                message=error_msg,
-                error_code="CONTEXT_TOO_LARGE",
-                fix_suggestion=f"Reduce context fields to {CONTEXT_MAX_FIELDS} or less"
+                message="Idempotency key was already used for a different request",
+                error_code="IDEMPOTENCY_KEY_REUSED",
+                fix_suggestion="Use a new Idempotency-Key for each distinct request"
             )
+        logger.info(f"Replaying response for idempotency key {idempotency_key}")
+        response.headers["Idempotent-Replayed"] = "true"
+        return await asyncio.shield(generation)
 
-        from .openai_client import generate_structured
+    # The generation runs as its own task so it completes, and is stored, even if
+    # the client that started it disconnects
+    generation = asyncio.ensure_future(run_generation(request))
+    idempotency_store.set(idempotency_key, (request_fingerprint, generation))
+    generation.add_done_callback(lambda task: forget_failed_generation(idempotency_key, task))
+    return await asyncio.shield(generation)
 
-        def stream_response():
-            try:
-                response_stream = generate_structured(
-                    prompt=request.prompt,
-                    context=request.context,
-                    schema=request.schema,
-                    pre_log_summary=request.pre_log_summary,
-                    user_input=request.user_input,
-                    model=request.model,
-                    stream=True
-                )
 
-                for chunk in response_stream:
-                    if chunk.choices and len(chunk.choices) > 0:
-                        delta = chunk.choices[0].delta
-                        if delta and hasattr(delta, 'content') and delta.content:
-                            yield f"data: {delta.content}\n\n"
+def forget_failed_generation(idempotency_key: str, generation: asyncio.Future) -> None:
+    """Drop a key whose generation failed or was answered locally, so that a retry generates again"""
+    if generation.cancelled() or generation.exception() is not None:
+        failed = True
+    else:
+        response = generation.result()
+        # A degraded answer must not be replayed once the upstream is back
+        failed = not response.success or response.degraded
+    if failed:
+        idempotency_store.pop(idempotency_key)
+
 
+async def open_stream(request: FastGenerationRequest) -> Union[StructuredGenerationResponse, AsyncIterator[str]]:
+    """
+    Check a streaming request and start its generation
+
+    Returns:
+        The failure response when the request is rejected up front, otherwise
+        an async iterator over the generated content deltas
+    """
+    mismatch = resolve_request_context(request)
+    if mismatch:
+        return mismatch
+
+    # Validate context length
+    too_large = check_context_size(request)
+    if too_large:
+        return too_large
+
+    prompt_context = select_prompt_context(request)
+    omitted_fields = [name for name in request.context if name not in prompt_context]
+    return stream_deltas(request, prompt_context, omitted_fields)
+
+
+async def stream_deltas(
+    request: FastGenerationRequest,
+    prompt_context: Dict[str, Any],
+    omitted_fields: List[str]
+) -> AsyncIterator[str]:
+    """Generate with streaming and yield the content deltas"""
+    from .openai_client import generate_structured, build_usage_info
+
+    set_stage('queued')
+    async with generation_slot(request):
+        set_stage('streaming')
+        started = time.perf_counter()
+        response_stream = await generate_structured(
+            prompt=request.prompt,
+            context=prompt_context,
+            schema=request.schema,
+            pre_log_summary=request.pre_log_summary,
+            user_input=request.user_input,
+            model=request.model,
+            stream=True,
+            omitted_fields=omitted_fields
+        )
+
+        try:
+            async for chunk in response_stream:
+                if chunk.choices and len(chunk.choices) > 0:
+                    delta = chunk.choices[0].delta
+                    if delta and hasattr(delta, 'content') and delta.content:
+                        yield delta.content
+                # Final chunk carries the usage when stream_options.include_usage is set
+                if getattr(chunk, 'usage', None):
+                    record_usage(
+                        build_usage_info([chunk.usage], request.model or OPENAI_MODEL, time.perf_counter() - started),
+                        request.session_id
+                    )
+        finally:
+            # Also when the client leaves before the first chunk: frees the connection and rate-limit slot
+            close = getattr(response_stream, 'aclose', None)
+            if close is not None:
+                await close()
+
+
+@app.post("/generate_structured_stream", openapi_extra=request_body_openapi())
+async def generate_structured_data_stream(
+    http_request: Request,
+    request: FastGenerationRequest = Depends(parse_generation_request)
+):
+    """Generate structured data using OpenAI API with streaming (request body may be MessagePack)"""
+    try:
+        if not request.stream:
+            raise HTTPException(status_code=400, detail="This endpoint requires stream=true")
+
+        deltas = await open_stream(request)
+        if isinstance(deltas, StructuredGenerationResponse):
+            return negotiate(http_request, deltas)
+
+        async def stream_response():
+            try:
+                frames = coalesce_deltas(
+                    deltas,
+                    max_bytes=STREAM_COALESCE_MAX_BYTES,
+                    max_delay=STREAM_COALESCE_MAX_DELAY_MS / 1000,
+                    queue_size=STREAM_COALESCE_QUEUE_SIZE,
+                    stats=stream_stats
+                )
+                async for content in frames:
+                    yield sse_frame(content)
+            except SchedulerRejected as e:
+                logger.warning(f"Request rejected by scheduler: {e}")
+                yield f"data: {{\"error\": \"{str(e)}\", \"error_code\": \"{e.error_code}\"}}\n\n"
             except Exception as e:
                 logger.exception(f"Streaming failed: {e}")
                 yield f"data: {{\"error\": \"{str(e)}\"}}\n\n"
@@ -147,13 +763,46 @@ async def generate_structured_data_stream(request: StructuredGenerationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.websocket("/ws/generate")
+async def generation_channel(websocket: WebSocket):
+    """Multiplexed generation channel: many tagged requests over one connection (see ws_channel)"""
+    await GenerationChannel(websocket, run_generation, open_stream, WS_MAX_IN_FLIGHT).serve()
+
+
 @app.get("/health")
 async def health_check():
+    from .openai_client import rate_limiter
+
     return {
         "status": "healthy",
         "model": OPENAI_MODEL,
         "service": "openai-llm",
-        "context_max_fields": CONTEXT_MAX_FIELDS
+        "context_max_fields": CONTEXT_MAX_FIELDS,
+        "context_hard_max_fields": context_field_limit(),
+        "session_transcript": SESSION_TRANSCRIPT_ENABLED,
+        "degraded": degraded_mode.breaker.state != 'closed' if degraded_mode else False,
+        "rate_limits": rate_limiter.snapshot() if rate_limiter else None
+    }
+
+
+@app.get("/stats")
+async def get_stats(window: Optional[int] = None, model: Optional[str] = None, session_id: Optional[str] = None):
+    """Token usage and throughput over rolling windows, per model and optionally for one session"""
+    from .openai_client import token_budget, offloader
+
+    return {
+        "usage": usage_stats.query(window=window, model=model, session_id=session_id),
+        "adaptive_max_tokens": token_budget.snapshot(),
+        "cascade": model_cascade.snapshot() if model_cascade else None,
+        "scheduler": scheduler.snapshot() if scheduler else None,
+        "response_cache": await response_cache.snapshot() if response_cache else None,
+        "streaming": stream_stats.snapshot(),
+        "context_rules": rule_engine.snapshot() if rule_engine else None,
+        "speculation": speculator.snapshot() if speculator else None,
+        "similarity_cache": similarity_cache.snapshot() if similarity_cache else None,
+        "degraded_mode": degraded_mode.snapshot() if degraded_mode else None,
+        "event_loop": loop_lag.snapshot(),
+        "offload": offloader.snapshot()
     }
 
 
@@ -0,0 +1,297 @@
+# Adaptive upstream concurrency control driven by rate-limit headers
+import asyncio
+import logging
+import re
+import time
+from typing import Dict, Any, AsyncIterator, List, Mapping, Optional
+
+from .ttl_store import TTLStore
+
+logger = logging.getLogger(__name__)
+
+# Reset durations as sent by OpenAI, e.g. "20ms", "1s", "6m0s", "1h2m3.5s"
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+
+# Multiplicative decrease factor on 429
+DECREASE_FACTOR = 0.5
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse a rate-limit reset duration into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class Quota:
+    """Remaining upstream quota of one kind (requests or tokens) until its reset"""
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+
+    def update(self, limit: Optional[int], remaining: Optional[int], reset_seconds: Optional[float]) -> None:
+        if limit is not None:
+            self.limit = limit
+        if remaining is not None:
+            self.remaining = remaining
+            self.reset_at = time.monotonic() + reset_seconds if reset_seconds is not None else None
+
+    def available(self) -> Optional[int]:
+        """Remaining quota, or None when unknown or already reset"""
+        if self.remaining is None or self.reset_at is None or time.monotonic() >= self.reset_at:
+            return None
+        return self.remaining
+
+    def snapshot(self) -> Dict[str, Any]:
+        reset_in = max(self.reset_at - time.monotonic(), 0.0) if self.reset_at is not None else None
+        return {
+            'limit': self.limit,
+            'remaining': self.available(),
+            'reset_seconds': round(reset_in, 3) if reset_in is not None else None
+        }
+
+
+class EndpointLimiter:
+    """
+    AIMD limits on in-flight requests and tokens for one upstream model
+
+    Each accepted response raises the limits additively (about one request per
+    round of completions); a 429 halves them and blocks new requests until the
+    retry-after or reset time. Requests are also held while the reported
+    remaining quota is used up by requests already in flight, instead of being
+    sent to fail.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_concurrency: float,
+        max_concurrency: float,
+        initial_tokens: float,
+        max_wait_seconds: float
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_tokens = initial_tokens * max_concurrency / max(initial_concurrency, 1)
+        self.concurrency_limit = float(initial_concurrency)
+        self.token_limit = float(initial_tokens)
+        self.max_wait_seconds = max_wait_seconds
+        self.in_flight = 0
+        self.in_flight_tokens = 0
+        self.requests = Quota()
+        self.tokens = Quota()
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.held = 0
+        self._waiters: List[asyncio.Future] = []
+
+    def _admissible(self, tokens: int) -> Optional[float]:
+        """None when a request may start now, otherwise how long to wait at most"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        remaining_requests = self.requests.available()
+        if remaining_requests is not None and self.in_flight >= remaining_requests:
+            return max(self.requests.reset_at - now, 0.0)
+        remaining_tokens = self.tokens.available()
+        if remaining_tokens is not None and self.in_flight > 0 and self.in_flight_tokens + tokens > remaining_tokens:
+            return max(self.tokens.reset_at - now, 0.0)
+
+        if self.in_flight == 0:
+            # Never starve: a lone request always goes, whatever its token estimate
+            return None
+        if self.in_flight + 1 > self.concurrency_limit:
+            return self.max_wait_seconds
+        if self.in_flight_tokens + tokens > self.token_limit:
+            return self.max_wait_seconds
+        return None
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait for an upstream slot for a request of about tokens tokens"""
+        deadline = time.monotonic() + self.max_wait_seconds
+        wait = self._admissible(tokens)
+        if wait is not None:
+            self.held += 1
+        while wait is not None:
+            timeout = min(wait, deadline - time.monotonic())
+            if timeout <= 0:
+                logger.warning(f"Upstream {self.name}: held for {self.max_wait_seconds}s, sending anyway")
+                break
+            # Woken by any release, or once the quota reset / block is over
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._waiters.remove(waiter)
+            wait = self._admissible(tokens)
+
+        self.in_flight += 1
+        self.in_flight_tokens += tokens
+
+    def release(self, tokens: int, headers: Optional[Mapping[str, str]] = None, throttled: bool = False) -> None:
+        """Return a slot and adapt the limits to the outcome of the request"""
+        self.in_flight -= 1
+        self.in_flight_tokens -= tokens
+        if headers is not None:
+            self.observe(headers)
+
+        if throttled:
+            self.throttled += 1
+            self.concurrency_limit = max(self.concurrency_limit * DECREASE_FACTOR, 1.0)
+            self.token_limit = max(self.token_limit * DECREASE_FACTOR, float(tokens))
+            retry_after = parse_duration((headers or {}).get('retry-after'))
+            if retry_after is None:
+                resets = [quota.reset_at for quota in (self.requests, self.tokens) if quota.reset_at is not None]
+                retry_after = max(min(resets) - time.monotonic(), 0.0) if resets else 1.0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            logger.warning(
+                f"Upstream {self.name} throttled: concurrency limit {self.concurrency_limit:.1f}, "
+                f"blocked for {retry_after:.2f}s"
+            )
+        elif headers is not None:
+            self.concurrency_limit = min(self.concurrency_limit + 1.0 / self.concurrency_limit, self.max_concurrency)
+            self.token_limit = min(self.token_limit + tokens / self.concurrency_limit, self.max_tokens)
+
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        """Update the known quota from rate-limit response headers"""
+        self.requests.update(
+            _header_int(headers, 'x-ratelimit-limit-requests'),
+            _header_int(headers, 'x-ratelimit-remaining-requests'),
+            parse_duration(headers.get('x-ratelimit-reset-requests'))
+        )
+        self.tokens.update(
+            _header_int(headers, 'x-ratelimit-limit-tokens'),
+            _header_int(headers, 'x-ratelimit-remaining-tokens'),
+            parse_duration(headers.get('x-ratelimit-reset-tokens'))
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'concurrency_limit': round(self.concurrency_limit, 2),
+            'token_limit': int(self.token_limit),
+            'in_flight': self.in_flight,
+            'in_flight_tokens': self.in_flight_tokens,
+            'blocked_seconds': round(max(self.blocked_until - time.monotonic(), 0.0), 3),
+            'requests': self.requests.snapshot(),
+            'tokens': self.tokens.snapshot(),
+            'held': self.held,
+            'throttled': self.throttled
+        }
+
+
+class HeldStream:
+    """
+    Upstream chunk stream that holds a limiter slot
+
+    The slot is returned exactly once: when the stream ends or fails, or when
+    the stream is closed, also if it was never iterated.
+    """
+
+    def __init__(self, limiter: EndpointLimiter, tokens: int, stream: AsyncIterator[Any], headers: Mapping[str, str]):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.headers = headers
+        self._stream = stream
+        self._released = False
+
+    def __aiter__(self) -> 'HeldStream':
+        return self
+
+    async def __anext__(self) -> Any:
+        try:
+            return await self._stream.__anext__()
+        except BaseException:
+            # End of stream, upstream error or cancellation
+            self._release()
+            raise
+
+    async def aclose(self) -> None:
+        """Return the slot and close the upstream stream"""
+        self._release()
+        close = getattr(self._stream, 'aclose', None)
+        if close is not None:
+            await close()
+
+    def _release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.limiter.release(self.tokens, self.headers)
+
+
+class RateLimiter:
+    """Adaptive limiters keyed by upstream model"""
+
+    def __init__(
+        self,
+        initial_concurrency: int,
+        max_concurrency: int,
+        initial_tokens: int,
+        max_wait_seconds: float,
+        max_models: int,
+        ttl_seconds: float
+    ):
+        """
+        Args:
+            initial_concurrency: Starting in-flight request limit per model
+            max_concurrency: Upper bound of the in-flight request limit
+            initial_tokens: Starting in-flight token limit per model
+            max_wait_seconds: Longest time a request is held before it is sent anyway
+            max_models: Models (chosen by clients) with a tracked limiter; least recently used are dropped
+            ttl_seconds: Idle time after which a model's limiter is dropped
+        """
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.initial_tokens = initial_tokens
+        self.max_wait_seconds = max_wait_seconds
+        # A dropped limiter is still released by the requests holding it
+        self._limiters = TTLStore(max_models, ttl_seconds)
+
+    def limiter(self, model: str) -> EndpointLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limiter = EndpointLimiter(
+                model, self.initial_concurrency, self.max_concurrency, self.initial_tokens, self.max_wait_seconds
+            )
+        # Written on every use, so the TTL counts from the last request
+        self._limiters.set(model, limiter)
+        return limiter
+
+    def hold_stream(
+        self,
+        limiter: EndpointLimiter,
+        tokens: int,
+        stream: AsyncIterator[Any],
+        headers: Mapping[str, str]
+    ) -> HeldStream:
+        """Keep a stream's slot until the stream is consumed or closed"""
+        return HeldStream(limiter, tokens, stream, headers)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current limits and quota per model"""
+        return {model: limiter.snapshot() for model, limiter in self._limiters.items()}
@@ -0,0 +1,198 @@
+# Two-tier cache of generation results: in-process memory over a shared SQLite file
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Any, Optional
+
+from .ttl_store import TTLStore
+
+logger = logging.getLogger(__name__)
+
+# Size is checked against the limit every this many writes
+_EVICTION_CHECK_INTERVAL = 64
+# Last-access times are only rewritten when older than this (keeps hits read-only)
+_TOUCH_INTERVAL_SECONDS = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    checksum TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+def _checksum(payload: bytes) -> str:
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+class DiskCache:
+    """
+    SQLite-backed cache tier, safe to share between processes on one host
+
+    The database runs in WAL mode so readers in any worker never block on a
+    writer. Entries carry a checksum verified on read, expire after their TTL,
+    and the least recently used ones are evicted when the file grows past
+    max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: float):
+        """
+        Args:
+            path: Database file path
+            max_bytes: Total payload size above which entries are evicted
+            ttl_seconds: Lifetime of an entry
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    @classmethod
+    def open(cls, path: str, max_bytes: int, ttl_seconds: float) -> Optional['DiskCache']:
+        """Open the disk tier, or None (memory only) when the file cannot be created or opened"""
+        try:
+            return cls(path, max_bytes, ttl_seconds)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Response cache disk tier unavailable at {path}, using memory only: {e}")
+            return None
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT value, checksum, expires_at, accessed_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        value, checksum, expires_at, accessed_at = row
+        now = time.time()
+        if expires_at <= now:
+            connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        if _checksum(value) != checksum:
+            logger.warning(f"Response cache entry {key} failed its checksum, dropping it")
+            connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+
+        if now - accessed_at > _TOUCH_INTERVAL_SECONDS:
+            connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(zlib.decompress(value))
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        payload = zlib.compress(json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO responses (key, value, checksum, size, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, payload, _checksum(payload), len(payload), now + self.ttl_seconds, now)
+        )
+
+        self._writes += 1
+        if self._writes % _EVICTION_CHECK_INTERVAL == 1:
+            self._evict(connection, now)
+
+    def _evict(self, connection: sqlite3.Connection, now: float) -> None:
+        connection.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Drop least recently used entries down to 90% of the limit
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        keys = []
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            keys.append(key)
+            freed += size
+            if freed >= excess:
+                break
+        connection.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in keys])
+        logger.info(f"Evicted {len(keys)} response cache entries ({freed} bytes)")
+
+    def stats(self) -> Dict[str, Any]:
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        return {'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes}
+
+
+class ResponseCache:
+    """Memory tier in front of an optional disk tier shared by all workers"""
+
+    def __init__(self, memory_entries: int, ttl_seconds: float, disk: Optional[DiskCache] = None):
+        """
+        Args:
+            memory_entries: Maximum entries kept in process memory
+            ttl_seconds: Lifetime of a memory entry
+            disk: Persistent tier, or None for memory only
+        """
+        self._memory = TTLStore(memory_entries, ttl_seconds)
+        self._disk = disk
+        self._counts = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'disk_errors': 0}
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached result for key, from memory first, then disk"""
+        value = self._memory.get(key)
+        if value is not None:
+            self._counts['memory_hits'] += 1
+            return value
+
+        if self._disk is not None:
+            try:
+                value = await asyncio.to_thread(self._disk.get, key)
+            except sqlite3.Error as e:
+                self._counts['disk_errors'] += 1
+                logger.warning(f"Response cache read failed: {e}")
+                value = None
+            if value is not None:
+                self._counts['disk_hits'] += 1
+                self._memory.set(key, value)
+                return value
+
+        self._counts['misses'] += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a result in both tiers"""
+        self._memory.set(key, value)
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk.set, key, value)
+            except sqlite3.Error as e:
+                self._counts['disk_errors'] += 1
+                logger.warning(f"Response cache write failed: {e}")
+
+    async def snapshot(self) -> Dict[str, Any]:
+        """Hit counts per tier and disk usage"""
+        snapshot: Dict[str, Any] = {**self._counts, 'memory_entries': len(self._memory)}
+        if self._disk is not None:
+            try:
+                snapshot['disk'] = await asyncio.to_thread(self._disk.stats)
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache stats failed: {e}")
+        return snapshot
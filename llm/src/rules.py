@@ -0,0 +1,124 @@
+# Deterministic per-tick context rules (hunger rising, energy draining, ...)
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .fast_request import FastContextField
+
+logger = logging.getLogger(__name__)
+
+
+class ContextRule:
+    """
+    Numeric drift of one context field
+
+    Declared as {"field": "hunger", "per_hour": 5, "per_step": 0, "min": 0, "max": 100}:
+    each step the field changes by per_step plus per_hour for every hour of
+    game time elapsed, clamped to [min, max].
+    """
+
+    __slots__ = ('field', 'per_hour', 'per_step', 'minimum', 'maximum')
+
+    def __init__(self, spec: Dict[str, Any]):
+        if not isinstance(spec.get('field'), str) or not spec['field']:
+            raise ValueError(f"Rule without a field name: {spec}")
+        self.field = spec['field']
+        self.per_hour = float(spec.get('per_hour', 0))
+        self.per_step = float(spec.get('per_step', 0))
+        self.minimum = float(spec['min']) if spec.get('min') is not None else None
+        self.maximum = float(spec['max']) if spec.get('max') is not None else None
+
+    def apply(self, value: Any, elapsed_seconds: float) -> Any:
+        """The field value after one step of elapsed_seconds game time"""
+        updated = value + self.per_step + self.per_hour * elapsed_seconds / 3600
+        if self.minimum is not None:
+            updated = max(updated, self.minimum)
+        if self.maximum is not None:
+            updated = min(updated, self.maximum)
+        updated = round(updated, 2)
+        # Keep integer fields integral when the result allows
+        if isinstance(value, int) and updated == int(updated):
+            return int(updated)
+        return updated
+
+
+class RuleEngine:
+    """Applies context rules before generation and merges their changes into the result"""
+
+    def __init__(self, rules: List[ContextRule]):
+        self.rules = rules
+        self._lock = threading.Lock()
+        self.steps = 0
+        self.rule_changes = 0
+        self.model_overrides = 0
+
+    @classmethod
+    def load(cls, path: str) -> 'RuleEngine':
+        """Load rules from a JSON file holding a list of rule declarations"""
+        with open(path, encoding='utf-8') as f:
+            specs = json.load(f)
+        rules = [ContextRule(spec) for spec in specs]
+        logger.info("Loaded %d context rules from %s", len(rules), path)
+        return cls(rules)
+
+    def managed_fields(self, context: Dict[str, Any]) -> List[str]:
+        """Fields of the context updated by rules"""
+        return [rule.field for rule in self.rules if rule.field in context]
+
+    def apply(self, context: Dict[str, Any], elapsed_seconds: Optional[float]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Run one step of all rules
+
+        Args:
+            context: Current context fields (left unchanged)
+            elapsed_seconds: Game time elapsed since the previous step
+
+        Returns:
+            Tuple of (updated context, a new dict sharing the unchanged fields;
+            the changes made, as context_changes entries)
+        """
+        elapsed = elapsed_seconds or 0.0
+        updated = dict(context)
+        changes = {}
+        for rule in self.rules:
+            field = context.get(rule.field)
+            if field is None:
+                continue
+            value = field.value
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            new_value = rule.apply(value, elapsed)
+            if new_value == value:
+                continue
+            updated[rule.field] = FastContextField(value=new_value, type=field.type, description=field.description)
+            changes[rule.field] = {'value': new_value, 'type': field.type}
+            if field.description:
+                changes[rule.field]['description'] = field.description
+        with self._lock:
+            self.steps += 1
+            self.rule_changes += len(changes)
+        return updated, changes
+
+    def merge(self, result: Dict[str, Any], changes: Dict[str, Any]) -> None:
+        """Add rule changes to result['context_changes']; changes made by the model take precedence"""
+        context_changes = result.get('context_changes')
+        if not isinstance(context_changes, dict):
+            return
+        overrides = 0
+        for name, change in changes.items():
+            if name in context_changes:
+                overrides += 1
+            else:
+                context_changes[name] = change
+        with self._lock:
+            self.model_overrides += overrides
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'rules': len(self.rules),
+                'steps': self.steps,
+                'rule_changes': self.rule_changes,
+                'model_overrides': self.model_overrides
+            }
@@ -0,0 +1,234 @@
+# Fair scheduling of generations across sessions with priority classes
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, Deque, List, Optional, Tuple
+
+from .ttl_store import TTLStore
+
+logger = logging.getLogger(__name__)
+
+# Highest priority first
+PRIORITY_CLASSES = ['interactive', 'background', 'batch']
+
+
+class SchedulerRejected(Exception):
+    """A request was refused by the scheduler"""
+
+    def __init__(self, error_code: str, message: str):
+        super().__init__(message)
+        self.error_code = error_code
+
+
+class TokenBucket:
+    """Request rate limit of one key"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.burst)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class ClassQueue:
+    """
+    Weighted start-time fair queue of one priority class
+
+    Each key is a flow; a request's start tag is the later of the class virtual
+    time and the finish tag of the previous request of its flow, and its finish
+    tag adds its cost (1 / the key's weight). A key with many queued requests
+    thus only gets its weighted share while others are waiting.
+    """
+
+    def __init__(self, window: int):
+        self.virtual_time = 0.0
+        self._heap: List[Tuple[float, int, str, asyncio.Future, float]] = []
+        self._finish: Dict[str, float] = {}
+        self._pending: Dict[str, int] = {}
+        self._sequence = itertools.count()
+        self.waits: Deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, key: str, waiter: asyncio.Future, cost: float = 1.0) -> None:
+        start = max(self.virtual_time, self._finish.get(key, 0.0))
+        self._finish[key] = start + cost
+        self._pending[key] = self._pending.get(key, 0) + 1
+        heapq.heappush(self._heap, (start, next(self._sequence), key, waiter, time.monotonic()))
+
+    def pop(self) -> Optional[asyncio.Future]:
+        """Next waiter still waiting, or None when the queue is drained"""
+        while self._heap:
+            start, _, key, waiter, enqueued_at = heapq.heappop(self._heap)
+            self.virtual_time = max(self.virtual_time, start)
+            self._pending[key] -= 1
+            if not self._pending[key]:
+                del self._pending[key]
+                # Idle flows restart from the virtual time
+                if self._finish.get(key, 0.0) <= self.virtual_time:
+                    self._finish.pop(key, None)
+            if not waiter.done():
+                self.waits.append(time.monotonic() - enqueued_at)
+                return waiter
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.waits)
+
+        def percentile(value: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(value * len(ordered)))], 4) if ordered else 0.0
+
+        return {
+            'queued': len(self._heap),
+            'flows': len(self._pending),
+            'wait_p50': percentile(0.5),
+            'wait_p95': percentile(0.95),
+            'wait_p99': percentile(0.99)
+        }
+
+
+class FairScheduler:
+    """
+    Bounds concurrent generations and orders waiting ones fairly
+
+    Waiting requests are served by strict priority between classes and by
+    weighted fair queuing between keys (session or tenant) within a class. Each
+    explicit key is also limited by a token bucket.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        key_rate: float,
+        key_burst: float,
+        max_keys: int,
+        max_queue_seconds: float,
+        weights: Optional[Dict[str, float]] = None,
+        window: int = 1000
+    ):
+        """
+        Args:
+            max_concurrency: Maximum generations running at once
+            key_rate: Requests per second allowed per key (0 disables the limit)
+            key_burst: Token bucket size per key
+            max_keys: Maximum number of keys with a tracked bucket
+            max_queue_seconds: Longest time a request may wait for a slot
+            weights: Fair-queuing weight per key; unlisted keys weigh 1
+            window: Number of recent queue waits kept per class
+        """
+        self.max_concurrency = max_concurrency
+        self.key_rate = key_rate
+        self.key_burst = key_burst
+        self.max_queue_seconds = max_queue_seconds
+        self.weights = dict(weights or {})
+        invalid = [key for key, weight in self.weights.items() if weight <= 0]
+        if invalid:
+            raise ValueError(f"Scheduler weights must be positive: {invalid}")
+        self.running = 0
+        self.rejected: Dict[str, int] = {}
+        self._buckets = TTLStore(max_keys, key_burst / key_rate if key_rate > 0 else 1)
+        self._queues = {name: ClassQueue(window) for name in PRIORITY_CLASSES}
+
+    def _reject(self, error_code: str, message: str) -> SchedulerRejected:
+        self.rejected[error_code] = self.rejected.get(error_code, 0) + 1
+        return SchedulerRejected(error_code, message)
+
+    def _check_rate(self, key: str) -> None:
+        if self.key_rate <= 0:
+            return
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.key_rate, self.key_burst)
+        allowed = bucket.take()
+        self._buckets.set(key, bucket)
+        if not allowed:
+            raise self._reject('RATE_LIMITED', f"Too many requests for {key}")
+
+    async def acquire(self, key: Optional[str], priority: str = 'interactive') -> None:
+        """
+        Wait for a generation slot
+
+        Args:
+            key: Session or tenant key; requests without a key share one flow and no rate limit
+            priority: Priority class
+
+        Raises:
+            SchedulerRejected: Rate limited, unknown priority, or queued for too long
+        """
+        queue = self._queues.get(priority)
+        if queue is None:
+            raise self._reject('INVALID_PRIORITY', f"Unknown priority class: {priority}")
+        if key:
+            self._check_rate(key)
+
+        if self.running < self.max_concurrency and not any(len(q) for q in self._queues.values()):
+            self.running += 1
+            queue.waits.append(0.0)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.push(key or '', waiter, 1 / self.weights.get(key or '', 1.0))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_queue_seconds)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                raise self._reject('QUEUE_TIMEOUT', f"Waited more than {self.max_queue_seconds}s for a slot")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the caller went away
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+
+    def release(self) -> None:
+        """Hand the slot to the next waiting request, or free it"""
+        for name in PRIORITY_CLASSES:
+            waiter = self._queues[name].pop()
+            if waiter is not None:
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+    def idle_slots(self) -> int:
+        """Slots free right now (none while requests are waiting)"""
+        if any(len(queue) for queue in self._queues.values()):
+            return 0
+        return self.max_concurrency - self.running
+
+    def queued(self) -> int:
+        """Requests waiting for a slot, over all classes"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    @asynccontextmanager
+    async def slot(self, key: Optional[str], priority: str = 'interactive') -> AsyncIterator[None]:
+        """Hold a generation slot for the duration of the block"""
+        await self.acquire(key, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Running count, per-class queue waits and rejections"""
+        return {
+            'running': self.running,
+            'max_concurrency': self.max_concurrency,
+            'classes': {name: queue.snapshot() for name, queue in self._queues.items()},
+            'rejected': dict(self.rejected)
+        }
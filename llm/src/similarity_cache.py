@@ -0,0 +1,182 @@
+# Near-duplicate input cache: character n-gram similarity over a fixed-size NumPy index
+import random
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Deque, Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+# Apostrophes are kept so "don't" stays one (negating) word
+_PUNCTUATION = re.compile(r"[^\w\s']")
+
+# Words that flip the meaning of an otherwise similar input
+NEGATIONS = frozenset({
+    'no', 'not', 'never', 'none', 'nothing', 'nobody', 'nowhere', 'neither', 'nor', 'without', 'dont', 'cant', 'wont'
+})
+
+
+def normalize_input(user_input: Optional[str]) -> str:
+    """Lowercase, drop punctuation other than apostrophes and collapse whitespace"""
+    text = (user_input or '').lower().replace('\u2019', "'")
+    return ' '.join(_PUNCTUATION.sub(' ', text).split())
+
+
+def meaning_tokens(text: str) -> FrozenSet[str]:
+    """
+    Negations and numbers of a normalized input
+
+    Two inputs are only matched when these are the same, since a single such
+    word ("don't", "5" against "50") changes the meaning while barely
+    changing the n-gram vector.
+    """
+    return frozenset(
+        word for word in text.split()
+        if word in NEGATIONS or word.endswith("n't") or any(char.isdigit() for char in word)
+    )
+
+
+def ngram_vector(text: str, ngram: int, dimensions: int) -> np.ndarray:
+    """Unit-length vector of hashed character n-gram counts"""
+    padded = f" {text} "
+    indices = [
+        zlib.crc32(padded[i:i + ngram].encode('utf-8')) % dimensions
+        for i in range(max(len(padded) - ngram + 1, 1))
+    ]
+    vector = np.bincount(indices, minlength=dimensions).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SimilarityCache:
+    """
+    Results of earlier generations, matched by similar input for the same context
+
+    Entries live in preallocated arrays: one n-gram vector row per entry plus
+    the entry's group (the fingerprint of everything in the request except
+    the input), expiry and last use. A lookup scores all live rows of the
+    group with one matrix product; rows whose negations and numbers differ
+    from the input's are not considered. When the index is full the least
+    recently used row is replaced, so memory stays at max_entries * dimensions
+    floats.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        dimensions: int,
+        ngram: int,
+        threshold: float,
+        ttl_seconds: float,
+        sample_rate: float,
+        max_samples: int = 50
+    ):
+        """
+        Args:
+            max_entries: Index capacity
+            dimensions: Hashed n-gram vector size
+            ngram: Character n-gram length
+            threshold: Lowest cosine similarity served as a hit
+            ttl_seconds: Lifetime of an entry
+            sample_rate: Fraction of non-exact hits kept for review
+            max_samples: Most recent sampled matches kept
+        """
+        self.dimensions = dimensions
+        self.ngram = ngram
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        # Group 0 marks a free row
+        self._groups = np.zeros(max_entries, dtype=np.int64)
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._inputs: List[Optional[str]] = [None] * max_entries
+        self._meanings: List[FrozenSet[str]] = [frozenset()] * max_entries
+        self._results: List[Any] = [None] * max_entries
+        self._samples: Deque[Dict[str, Any]] = deque(maxlen=max_samples)
+        self._counts = {'exact_hits': 0, 'similar_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    @staticmethod
+    def _group_id(group: str) -> int:
+        # 60 bits of the fingerprint; never 0
+        return int(group[:15], 16) | 1
+
+    def get(self, group: str, user_input: Optional[str]) -> Optional[Dict[str, Any]]:
+        """The result of the most similar earlier input of the group, if similar enough"""
+        text = normalize_input(user_input)
+        if not text:
+            return None
+        query = ngram_vector(text, self.ngram, self.dimensions)
+        meaning = meaning_tokens(text)
+        now = time.monotonic()
+
+        with self._lock:
+            rows = np.flatnonzero((self._groups == self._group_id(group)) & (self._expires > now))
+            rows = rows[[self._meanings[row] == meaning for row in rows]]
+            if rows.size == 0:
+                self._counts['misses'] += 1
+                return None
+            scores = self._vectors[rows] @ query
+            best = int(scores.argmax())
+            score = float(scores[best])
+            if score < self.threshold:
+                self._counts['misses'] += 1
+                return None
+
+            row = int(rows[best])
+            self._last_used[row] = now
+            matched = self._inputs[row]
+            if matched == text:
+                self._counts['exact_hits'] += 1
+            else:
+                self._counts['similar_hits'] += 1
+                # Kept for review of false matches
+                if random.random() < self.sample_rate:
+                    self._samples.append({'input': text, 'matched': matched, 'score': round(score, 3)})
+            return self._results[row]
+
+    def set(self, group: str, user_input: Optional[str], result: Dict[str, Any]) -> None:
+        """Store the result of a generation"""
+        text = normalize_input(user_input)
+        if not text:
+            return
+        vector = ngram_vector(text, self.ngram, self.dimensions)
+        group_id = self._group_id(group)
+        now = time.monotonic()
+
+        with self._lock:
+            same = np.flatnonzero((self._groups == group_id) & (self._expires > now))
+            row = next((int(r) for r in same if self._inputs[r] == text), None)
+            if row is None:
+                free = np.flatnonzero((self._groups == 0) | (self._expires <= now))
+                if free.size:
+                    row = int(free[0])
+                else:
+                    row = int(self._last_used.argmin())
+                    self._counts['evictions'] += 1
+            self._vectors[row] = vector
+            self._groups[row] = group_id
+            self._expires[row] = now + self.ttl_seconds
+            self._last_used[row] = now
+            self._inputs[row] = text
+            self._meanings[row] = meaning_tokens(text)
+            self._results[row] = result
+            self._counts['stores'] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Hit counts and sampled non-exact matches"""
+        now = time.monotonic()
+        with self._lock:
+            hits = self._counts['exact_hits'] + self._counts['similar_hits']
+            lookups = hits + self._counts['misses']
+            return {
+                **self._counts,
+                'entries': int(np.count_nonzero((self._groups != 0) & (self._expires > now))),
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+                'threshold': self.threshold,
+                'similar_match_samples': list(self._samples)
+            }
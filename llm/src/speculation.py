@@ -0,0 +1,214 @@
+# Speculative pre-generation of likely next player inputs
+import asyncio
+import contextvars
+import dataclasses
+import logging
+import threading
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from .fast_request import FastContextField, FastGenerationRequest, FastPreLogSummary
+from .fingerprint import fingerprint
+from .logging_config import new_request_id, request_id_var
+from .models import StructuredGenerationResponse
+from .scheduler import FairScheduler, TokenBucket
+from .ttl_store import TTLStore
+
+logger = logging.getLogger(__name__)
+
+# Weight of a session's own history against inputs of all sessions
+SESSION_WEIGHT = 3
+
+
+def canonical_input(user_input: Optional[str]) -> str:
+    """
+    Input as counted and keyed for speculation: case and spacing ignored
+
+    Stricter than similarity_cache.normalize_input, which also drops
+    punctuation; a speculative result is served only on an exact match.
+    """
+    return ' '.join((user_input or '').lower().split())
+
+
+def apply_changes(context: Dict[str, Any], changes: Any) -> Dict[str, Any]:
+    """The context a client holds after applying a result's context_changes"""
+    updated = dict(context)
+    if isinstance(changes, dict):
+        for name, change in changes.items():
+            if change is None:
+                updated.pop(name, None)
+            elif isinstance(change, dict):
+                updated[name] = FastContextField(
+                    value=change.get('value'), type=change.get('type'), description=change.get('description')
+                )
+    return updated
+
+
+class InputFrequencyModel:
+    """Counts of normalized player inputs, over all sessions and per session"""
+
+    def __init__(self, max_inputs: int, max_sessions: int, ttl_seconds: float, min_count: int):
+        """
+        Args:
+            max_inputs: Distinct inputs counted over all sessions
+            max_sessions: Sessions with their own counts
+            ttl_seconds: Idle time after which a session's counts are dropped
+            min_count: Times an input must have been seen before it is predicted
+        """
+        self.max_inputs = max_inputs
+        self.min_count = min_count
+        self._lock = threading.Lock()
+        self._global: Counter = Counter()
+        self._sessions = TTLStore(max_sessions, ttl_seconds)
+
+    def record(self, session_id: str, user_input: str) -> None:
+        with self._lock:
+            self._global[user_input] += 1
+            if len(self._global) > self.max_inputs:
+                # Keep the most frequent half
+                self._global = Counter(dict(self._global.most_common(self.max_inputs // 2)))
+            counts = self._sessions.get(session_id) or Counter()
+            counts[user_input] += 1
+        self._sessions.set(session_id, counts)
+
+    def predict(self, session_id: str, k: int) -> List[str]:
+        """The k most likely next inputs of a session"""
+        with self._lock:
+            session_counts = self._sessions.get(session_id) or Counter()
+            scores = Counter({
+                text: count for text, count in self._global.items() if count >= self.min_count
+            })
+            for text, count in session_counts.items():
+                if text in scores:
+                    scores[text] += SESSION_WEIGHT * count
+        return [text for text, _ in scores.most_common(k)]
+
+
+class Speculator:
+    """
+    Pre-generates the likely next inputs of a session on spare capacity
+
+    After a step, the top predicted inputs are generated in the background
+    against the context the client will hold once it applies the step's
+    changes. Results are kept briefly, keyed by session, resulting context and
+    input, and each is served at most once. Speculation runs in the lowest
+    priority class, only while the scheduler (when scheduling is on) has more
+    than reserve_slots idle slots, with at most max_concurrency generations at
+    once and at most rate_per_minute started per minute.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[FastGenerationRequest], Awaitable[StructuredGenerationResponse]],
+        scheduler: Optional[FairScheduler],
+        model: InputFrequencyModel,
+        top_k: int,
+        max_concurrency: int,
+        reserve_slots: int,
+        rate_per_minute: float,
+        max_entries: int,
+        ttl_seconds: float
+    ):
+        self.generate = generate
+        self.scheduler = scheduler
+        self.model = model
+        self.top_k = top_k
+        self.max_concurrency = max_concurrency
+        self.reserve_slots = reserve_slots
+        self._budget = TokenBucket(rate_per_minute / 60, max(rate_per_minute / 6, 1))
+        self._results = TTLStore(max_entries, ttl_seconds)
+        self._pending: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = {'started': 0, 'stored': 0, 'hits': 0, 'misses': 0, 'skipped_busy': 0, 'skipped_budget': 0}
+
+    @staticmethod
+    def key(session_id: str, request: FastGenerationRequest, context: Dict[str, Any], user_input: str) -> str:
+        # pre_log_summary is left out: the next step's summary also covers this step's event
+        return fingerprint({
+            'session_id': session_id,
+            'prompt': request.prompt,
+            'context': context,
+            'schema': request.schema,
+            'model': request.model,
+            'elapsed_seconds': request.elapsed_seconds,
+            'user_input': canonical_input(user_input)
+        })
+
+    def take(self, request: FastGenerationRequest) -> Optional[Dict[str, Any]]:
+        """The pre-generated result for a request, if there is one (served once)"""
+        result = self._results.pop(self.key(request.session_id, request, request.context, request.user_input))
+        self.stats['hits' if result is not None else 'misses'] += 1
+        return result
+
+    def after_step(self, request: FastGenerationRequest, result: Dict[str, Any]) -> None:
+        """Record the step's input and speculate on the next one"""
+        user_input = canonical_input(request.user_input)
+        if user_input:
+            self.model.record(request.session_id, user_input)
+
+        next_context = apply_changes(request.context, result.get('context_changes'))
+        pre_log_summary = self._next_summary(request.pre_log_summary, result.get('event_description'))
+        for prediction in self.model.predict(request.session_id, self.top_k):
+            key = self.key(request.session_id, request, next_context, prediction)
+            if key in self._pending:
+                continue
+            busy = self.scheduler is not None and self.scheduler.idle_slots() <= self.reserve_slots
+            if len(self._tasks) >= self.max_concurrency or busy:
+                self.stats['skipped_busy'] += 1
+                break
+            if not self._budget.take():
+                self.stats['skipped_budget'] += 1
+                break
+
+            speculative = dataclasses.replace(
+                request,
+                context=next_context,
+                pre_log_summary=pre_log_summary,
+                user_input=prediction,
+                stream=False,
+                # No session: speculation must not touch the transcript or context cache
+                session_id=None,
+                context_version=None,
+                base_context_version=None,
+                removed_context_fields=None,
+                priority='batch',
+                tenant_id=f"speculation:{request.session_id}"
+            )
+            self._pending.add(key)
+            self.stats['started'] += 1
+            # Fresh context: the background work must not report as the triggering request
+            task = asyncio.get_running_loop().create_task(
+                self._run(key, speculative), context=contextvars.Context()
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _next_summary(pre_log_summary: Optional[FastPreLogSummary], event: Any) -> Optional[FastPreLogSummary]:
+        """Approximate the summary the client sends next: this step's event appended to the recent events"""
+        if pre_log_summary is None or not isinstance(event, str):
+            return pre_log_summary
+        return FastPreLogSummary(summary=pre_log_summary.summary, recent_events=pre_log_summary.recent_events + [event])
+
+    async def _run(self, key: str, request: FastGenerationRequest) -> None:
+        request_id_var.set(f"spec-{new_request_id()}")
+        try:
+            response = await self.generate(request)
+            # Degraded answers are stand-ins, not worth serving later
+            if response.success and not response.degraded and response.result is not None:
+                self._results.set(key, response.result)
+                self.stats['stored'] += 1
+                logger.info("Pre-generated a result for %r", request.user_input)
+        except Exception as e:
+            logger.warning("Speculative generation failed: %s", e)
+        finally:
+            self._pending.discard(key)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return dict(
+            self.stats,
+            running=len(self._tasks),
+            cached=len(self._results),
+            hit_rate=round(self.stats['hits'] / lookups, 3) if lookups else 0.0
+        )
@@ -0,0 +1,181 @@
+# Coalescing of streamed content deltas into fewer SSE frames
+import asyncio
+import re
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+# Characters that can change the JSON nesting / string state
+_STRUCTURAL = re.compile(r'[{}\[\]",\\]')
+
+_END = object()
+
+
+class _Failure:
+    __slots__ = ('error',)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class FieldBoundaryTracker:
+    """
+    Follows a streamed JSON object and reports where top-level fields end
+
+    Only structural characters are inspected, so deltas of plain text cost a
+    single regex scan.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        # Escape pending from a backslash at the end of the previous delta
+        self.escaped = False
+
+    def feed(self, delta: str) -> bool:
+        """Consume a delta; True when a top-level field (or the whole object) ends in it"""
+        boundary = False
+        skip_at = 0 if self.escaped else -1
+        self.escaped = False
+        for match in _STRUCTURAL.finditer(delta):
+            position = match.start()
+            if position == skip_at:
+                continue
+            char = match.group()
+            if self.in_string:
+                if char == '\\':
+                    skip_at = position + 1
+                    self.escaped = skip_at == len(delta)
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in '{[':
+                self.depth += 1
+            elif char in '}]':
+                self.depth -= 1
+                boundary = boundary or self.depth == 0
+            elif char == ',' and self.depth == 1:
+                boundary = True
+        return boundary
+
+
+class StreamStats:
+    """Frame counts and sizes of coalesced streams"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.streams = 0
+        self.deltas = 0
+        self.frames = 0
+        self.bytes = 0
+
+    def record(self, deltas: int, frames: int, size: int) -> None:
+        with self._lock:
+            self.streams += 1
+            self.deltas += deltas
+            self.frames += frames
+            self.bytes += size
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'streams': self.streams,
+                'frames': self.frames,
+                'deltas': self.deltas,
+                'frames_per_stream': round(self.frames / self.streams, 1) if self.streams else 0.0,
+                'deltas_per_frame': round(self.deltas / self.frames, 1) if self.frames else 0.0,
+                'avg_frame_bytes': round(self.bytes / self.frames, 1) if self.frames else 0.0
+            }
+
+
+def sse_frame(content: str) -> str:
+    """One SSE event; multi-line content is split over several data lines"""
+    if '\n' not in content:
+        return f"data: {content}\n\n"
+    return ''.join(f"data: {line}\n" for line in content.split('\n')) + '\n'
+
+
+async def coalesce_deltas(
+    deltas: AsyncIterator[str],
+    max_bytes: int,
+    max_delay: float,
+    queue_size: int,
+    stats: Optional[StreamStats] = None
+) -> AsyncIterator[str]:
+    """
+    Merge content deltas into larger chunks
+
+    A chunk is emitted once max_bytes are buffered, when the oldest buffered
+    delta is max_delay seconds old, or when a top-level JSON field ends. The
+    upstream is read by a separate task into a queue of queue_size deltas, so
+    a slow consumer gets larger chunks and, once the queue is full, pauses the
+    upstream stream instead of buffering without limit. Errors of the upstream
+    stream are raised after the buffered content has been emitted.
+
+    Args:
+        deltas: Upstream content deltas
+        max_bytes: Buffered UTF-8 bytes that force a chunk out
+        max_delay: Longest time in seconds a delta waits in the buffer
+        queue_size: Deltas read ahead of the consumer
+        stats: Receives the delta / chunk counts of the stream
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def produce():
+        try:
+            async for delta in deltas:
+                await queue.put(delta)
+            await queue.put(_END)
+        except Exception as e:
+            await queue.put(_Failure(e))
+
+    producer = asyncio.create_task(produce())
+    tracker = FieldBoundaryTracker()
+    buffer: List[str] = []
+    buffered_bytes = 0
+    deadline = 0.0
+    delta_count = frame_count = total_bytes = 0
+    getter: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(queue.get())
+            if buffer:
+                # Keep the same pending get across timeouts so no delta is lost
+                await asyncio.wait((getter,), timeout=max(0.0, deadline - loop.time()))
+                if not getter.done():
+                    frame_count += 1
+                    total_bytes += buffered_bytes
+                    yield ''.join(buffer)
+                    buffer, buffered_bytes = [], 0
+                    continue
+            item = await getter
+            getter = None
+
+            if item is _END or isinstance(item, _Failure):
+                if buffer:
+                    frame_count += 1
+                    total_bytes += buffered_bytes
+                    yield ''.join(buffer)
+                    buffer = []
+                if isinstance(item, _Failure):
+                    raise item.error
+                break
+
+            delta_count += 1
+            if not buffer:
+                deadline = loop.time() + max_delay
+            buffer.append(item)
+            buffered_bytes += len(item.encode('utf-8'))
+            if tracker.feed(item) or buffered_bytes >= max_bytes or max_delay <= 0:
+                frame_count += 1
+                total_bytes += buffered_bytes
+                yield ''.join(buffer)
+                buffer, buffered_bytes = [], 0
+    finally:
+        if getter is not None:
+            getter.cancel()
+        producer.cancel()
+        if stats is not None:
+            stats.record(delta_count, frame_count, total_bytes)
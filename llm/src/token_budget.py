@@ -0,0 +1,94 @@
+# Adaptive max_tokens per schema and model
+import logging
+import math
+import threading
+from collections import deque
+from typing import Dict, Any, Deque, Optional
+
+from .fingerprint import fingerprint
+from .ttl_store import TTLStore
+
+logger = logging.getLogger(__name__)
+
+
+class _KeyBudget:
+    """Recent completion token counts of one key and the limit learned from them"""
+
+    __slots__ = ('samples', 'limit')
+
+    def __init__(self, window: int):
+        self.samples: Deque[int] = deque(maxlen=window)
+        self.limit: Optional[int] = None
+
+
+class TokenBudget:
+    """Learns output lengths per (schema, model) and derives max_tokens from them"""
+
+    def __init__(
+        self,
+        max_tokens: int,
+        min_tokens: int,
+        percentile: float,
+        margin_tokens: int,
+        window: int,
+        min_samples: int,
+        max_keys: int,
+        ttl_seconds: float
+    ):
+        """
+        Args:
+            max_tokens: Upper bound, used until enough samples are observed
+            min_tokens: Lower bound for the learned limit
+            percentile: Percentile (0-1) of observed completion tokens to reserve
+            margin_tokens: Safety margin added to the percentile
+            window: Number of recent samples kept per key
+            min_samples: Samples required before the learned limit is used
+            max_keys: Keys (schema and client-chosen model) tracked; least recently used are dropped
+            ttl_seconds: Time without samples after which a key is dropped
+        """
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+        self.percentile = percentile
+        self.margin_tokens = margin_tokens
+        self.window = window
+        self.min_samples = min_samples
+        self._budgets = TTLStore(max_keys, ttl_seconds)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(schema: Dict[str, Any], model: str) -> str:
+        """Budget key of a compiled schema and model"""
+        schema_def = {name: [field.type, field.description] for name, field in schema.items()}
+        return f"{model}:{fingerprint(schema_def)}"
+
+    def limit(self, key: str) -> int:
+        """max_tokens to request for key"""
+        budget = self._budgets.get(key)
+        if budget is None or budget.limit is None:
+            return self.max_tokens
+        return budget.limit
+
+    def record(self, key: str, completion_tokens: int) -> None:
+        """Record the completion tokens of a response that was not cut off"""
+        with self._lock:
+            budget = self._budgets.get(key) or _KeyBudget(self.window)
+            budget.samples.append(completion_tokens)
+            self._budgets.set(key, budget)
+
+            if len(budget.samples) < self.min_samples:
+                return
+            ordered = sorted(budget.samples)
+            index = min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)
+            learned = ordered[max(index, 0)] + self.margin_tokens
+            budget.limit = max(self.min_tokens, min(self.max_tokens, learned))
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Current limits and sample counts per key"""
+        with self._lock:
+            return {
+                key: {
+                    'max_tokens': budget.limit if budget.limit is not None else self.max_tokens,
+                    'samples': len(budget.samples)
+                }
+                for key, budget in self._budgets.items()
+            }
@@ -0,0 +1,20 @@
+# Token estimation helpers
+from typing import Dict, List
+
+# Rough average for English/JSON text with BPE tokenizers
+CHARS_PER_TOKEN = 4
+
+# Per-message overhead of the chat format (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a text without loading a tokenizer"""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Estimate the prompt token count of a chat message list"""
+    return sum(estimate_tokens(message.get('content', '')) + MESSAGE_OVERHEAD_TOKENS for message in messages)
@@ -0,0 +1,232 @@
+# Per-session append-only chat transcripts
+import json
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from .openai_client import build_context_block, build_user_prompt, context_field_parts
+from .tokens import estimate_tokens, estimate_message_tokens, MESSAGE_OVERHEAD_TOKENS
+from .ttl_store import TTLStore
+
+logger = logging.getLogger(__name__)
+
+FieldSnapshot = Tuple[Any, Optional[str], Optional[str]]
+
+
+def snapshot_context(context: Dict[str, Any]) -> Dict[str, FieldSnapshot]:
+    """Capture context fields as comparable (value, type, description) tuples"""
+    return {name: context_field_parts(field) for name, field in context.items()}
+
+
+def apply_context_changes(snapshot: Dict[str, FieldSnapshot], changes: Any) -> Dict[str, FieldSnapshot]:
+    """Return a copy of snapshot with generated context_changes applied"""
+    updated = dict(snapshot)
+    if not isinstance(changes, dict):
+        return updated
+
+    for name, change in changes.items():
+        if change is None:
+            updated.pop(name, None)
+        elif isinstance(change, dict) and 'value' in change:
+            updated[name] = (change.get('value'), change.get('type'), change.get('description'))
+    return updated
+
+
+def build_delta_prompt(
+    previous: Dict[str, FieldSnapshot],
+    current: Dict[str, FieldSnapshot],
+    prompt: Optional[str] = None,
+    user_input: str = None,
+    all_field_names: Optional[Set[str]] = None,
+    encoding: str = None
+) -> str:
+    """
+    Build a user prompt that only carries what changed since the previous turn
+
+    current may be a relevance-selected subset of the context; fields missing
+    from it are only reported as removed when they are not in all_field_names.
+    """
+    delta_prompt = f"{prompt}\n\n" if prompt else ""
+
+    changed = {}
+    described_fields = set()
+    for field_name, (value, field_type, description) in current.items():
+        previous_field = previous.get(field_name)
+        if previous_field == (value, field_type, description):
+            continue
+        changed[field_name] = {'value': value, 'type': field_type, 'description': description}
+        # Descriptions are only repeated for new fields or when they change
+        if previous_field is not None and previous_field[2] == description:
+            described_fields.add(field_name)
+    removed = [
+        field_name for field_name in previous
+        if field_name not in current and (all_field_names is None or field_name not in all_field_names)
+    ]
+
+    if changed:
+        delta_prompt += build_context_block(
+            changed, encoding, described_fields, header="Game state changes since last turn", legend=False
+        )
+    if removed:
+        delta_prompt += f"Removed state fields: {', '.join(removed)}\n\n"
+    if not changed and not removed:
+        delta_prompt += "Game state unchanged since last turn.\n\n"
+
+    if user_input:
+        delta_prompt += f"User action: {user_input}\n\n"
+
+    return delta_prompt
+
+
+class SessionTranscript:
+    """Append-only message history of one session"""
+
+    def __init__(self, system_prompt: str):
+        self.system_prompt = system_prompt
+        self.messages: List[Dict[str, str]] = [{'role': 'system', 'content': system_prompt}]
+        self.tokens = estimate_message_tokens(self.messages)
+        self.prompt: Optional[str] = None
+        self.snapshot: Dict[str, FieldSnapshot] = {}
+        self.version = 0
+
+
+class TranscriptTurn:
+    """A pending turn; it only becomes part of the transcript once committed"""
+
+    def __init__(
+        self,
+        session_id: str,
+        transcript: SessionTranscript,
+        base_messages: List[Dict[str, str]],
+        user_message: Dict[str, str],
+        snapshot: Dict[str, FieldSnapshot],
+        prompt: str,
+        compacted: bool
+    ):
+        self.session_id = session_id
+        self.transcript = transcript
+        self.base_messages = base_messages
+        self.user_message = user_message
+        self.snapshot = snapshot
+        self.prompt = prompt
+        self.compacted = compacted
+        self.base_version = transcript.version
+
+    @property
+    def messages(self) -> List[Dict[str, str]]:
+        """Messages to send upstream for this turn"""
+        return self.base_messages + [self.user_message]
+
+
+class TranscriptStore:
+    """Bounded store of session transcripts with token-threshold compaction"""
+
+    def __init__(self, max_sessions: int, ttl_seconds: float, max_tokens: int):
+        """
+        Args:
+            max_sessions: Maximum number of transcripts kept in memory
+            ttl_seconds: Idle time after which a transcript is dropped
+            max_tokens: Estimated transcript size at which it is compacted
+        """
+        self.max_tokens = max_tokens
+        self._transcripts = TTLStore(max_sessions, ttl_seconds)
+        self._lock = threading.Lock()
+
+    def begin_turn(
+        self,
+        session_id: str,
+        system_prompt: str,
+        prompt: str,
+        context: Dict[str, Any],
+        pre_log_summary: Any = None,
+        user_input: str = None,
+        all_field_names: Optional[Set[str]] = None
+    ) -> TranscriptTurn:
+        """
+        Prepare the messages for the next turn of a session
+
+        The first turn, and the first turn after compaction, carries the full
+        game state and summary. Later turns only append the context delta and
+        the user action, so the upstream sees an unchanged prefix.
+
+        Args:
+            session_id: Session key
+            system_prompt: Static system prompt for the session
+            prompt: Generation prompt
+            context: Current game context (possibly a relevance-selected subset)
+            pre_log_summary: Historical events summary
+            user_input: User's current input
+            all_field_names: Names of all fields of the full context, when context is a subset
+
+        Returns:
+            Pending turn to pass upstream and later commit
+        """
+        snapshot = snapshot_context(context)
+
+        with self._lock:
+            transcript = self._transcripts.get(session_id)
+            if transcript is None or transcript.system_prompt != system_prompt:
+                transcript = SessionTranscript(system_prompt)
+                self._transcripts.set(session_id, transcript)
+
+            compacted = len(transcript.messages) > 1 and transcript.tokens > self.max_tokens
+            if compacted:
+                logger.info(f"Compacting transcript for session {session_id} ({transcript.tokens} tokens)")
+
+            if len(transcript.messages) == 1 or compacted:
+                base_messages = transcript.messages[:1]
+                omitted_fields = sorted(all_field_names - snapshot.keys()) if all_field_names else None
+                user_content = build_user_prompt(prompt, context, pre_log_summary, user_input, omitted_fields)
+            else:
+                base_messages = list(transcript.messages)
+                changed_prompt = prompt if prompt != transcript.prompt else None
+                user_content = build_delta_prompt(
+                    transcript.snapshot, snapshot, changed_prompt, user_input, all_field_names
+                )
+                # Keep what the model has already seen of fields that were not selected this turn
+                if all_field_names is not None:
+                    snapshot = {
+                        **{name: field for name, field in transcript.snapshot.items() if name in all_field_names},
+                        **snapshot
+                    }
+
+            return TranscriptTurn(
+                session_id=session_id,
+                transcript=transcript,
+                base_messages=base_messages,
+                user_message={'role': 'user', 'content': user_content},
+                snapshot=snapshot,
+                prompt=prompt,
+                compacted=compacted
+            )
+
+    def commit(self, turn: TranscriptTurn, result: Dict[str, Any]) -> None:
+        """Append a successful turn and its compact assistant output to the transcript"""
+        assistant_content = json.dumps(result, ensure_ascii=False, separators=(',', ':'))
+
+        with self._lock:
+            transcript = turn.transcript
+            if transcript.version != turn.base_version:
+                # Another turn of this session was committed meanwhile; this one
+                # no longer extends the transcript prefix
+                logger.warning(f"Skipping stale transcript turn for session {turn.session_id}")
+                return
+
+            if turn.compacted:
+                transcript.tokens = estimate_message_tokens(turn.base_messages)
+            transcript.messages = turn.base_messages + [
+                turn.user_message,
+                {'role': 'assistant', 'content': assistant_content}
+            ]
+            transcript.tokens += (
+                estimate_tokens(turn.user_message['content'])
+                + estimate_tokens(assistant_content)
+                + 2 * MESSAGE_OVERHEAD_TOKENS
+            )
+            transcript.snapshot = apply_context_changes(turn.snapshot, result.get('context_changes'))
+            transcript.prompt = turn.prompt
+            transcript.version += 1
+
+    def reset(self, session_id: str) -> None:
+        """Forget the transcript of a session"""
+        self._transcripts.pop(session_id)
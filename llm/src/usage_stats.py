@@ -0,0 +1,128 @@
+# Rolling token usage and throughput statistics
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+from .ttl_store import TTLStore
+
+# (timestamp, prompt, completion, reasoning, cached, upstream_seconds)
+Sample = Tuple[float, int, int, int, int, float]
+
+
+def _percentile(ordered: List[float], percentile: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+
+
+def summarize(samples: List[Sample]) -> Dict[str, Any]:
+    """Aggregate usage samples"""
+    prompt = sum(sample[1] for sample in samples)
+    completion = sum(sample[2] for sample in samples)
+    seconds = sorted(sample[5] for sample in samples)
+    upstream_seconds = sum(seconds)
+    return {
+        'requests': len(samples),
+        'prompt_tokens': prompt,
+        'completion_tokens': completion,
+        'reasoning_tokens': sum(sample[3] for sample in samples),
+        'cached_tokens': sum(sample[4] for sample in samples),
+        'upstream_seconds_avg': round(upstream_seconds / len(samples), 3) if samples else 0.0,
+        'upstream_seconds_p50': round(_percentile(seconds, 0.5), 3),
+        'upstream_seconds_p95': round(_percentile(seconds, 0.95), 3),
+        'completion_tokens_per_second': round(completion / upstream_seconds, 1) if upstream_seconds else 0.0
+    }
+
+
+class UsageStats:
+    """Per-model and per-session usage samples aggregated over rolling windows"""
+
+    def __init__(
+        self,
+        windows: List[int],
+        max_samples: int,
+        max_sessions: int,
+        max_models: int,
+        model_ttl_seconds: float
+    ):
+        """
+        Args:
+            windows: Rolling window lengths in seconds
+            max_samples: Maximum samples kept per model or session
+            max_sessions: Maximum number of sessions tracked
+            max_models: Maximum number of models tracked
+            model_ttl_seconds: Time without a sample after which a model is dropped
+        """
+        self.windows = sorted(windows)
+        self.max_samples = max_samples
+        self._models = TTLStore(max_models, model_ttl_seconds)
+        self._sessions = TTLStore(max_sessions, self.windows[-1])
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        reasoning_tokens: int = 0,
+        cached_tokens: int = 0,
+        upstream_seconds: float = 0.0,
+        session_id: Optional[str] = None
+    ) -> None:
+        """Record the usage of one generation"""
+        sample = (time.time(), prompt_tokens, completion_tokens, reasoning_tokens, cached_tokens, upstream_seconds)
+        with self._lock:
+            samples = self._models.get(model)
+            if samples is None:
+                samples = deque(maxlen=self.max_samples)
+            samples.append(sample)
+            self._models.set(model, samples)
+
+            if session_id:
+                session_samples = self._sessions.get(session_id)
+                if session_samples is None:
+                    session_samples = deque(maxlen=self.max_samples)
+                session_samples.append(sample)
+                # Refresh the TTL on every write
+                self._sessions.set(session_id, session_samples)
+
+    def query(
+        self,
+        window: Optional[int] = None,
+        model: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Aggregate usage per model (and for one session when session_id is given)
+
+        Args:
+            window: Window in seconds; all configured windows when omitted
+            model: Restrict to one model
+            session_id: Also aggregate this session
+
+        Returns:
+            Aggregates keyed by window, then by model / session
+        """
+        now = time.time()
+        windows = [window] if window else self.windows
+
+        with self._lock:
+            model_samples = {
+                name: list(samples) for name, samples in self._models.items() if model is None or name == model
+            }
+            session_samples = list(self._sessions.get(session_id) or []) if session_id else None
+
+        stats = {}
+        for length in windows:
+            since = now - length
+            window_stats = {
+                'models': {
+                    name: summarize([sample for sample in samples if sample[0] >= since])
+                    for name, samples in model_samples.items()
+                }
+            }
+            if session_samples is not None:
+                window_stats['session'] = summarize([sample for sample in session_samples if sample[0] >= since])
+            stats[f"{length}s"] = window_stats
+        return stats
@@ -1,9 +1,11 @@
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from .models import ValidationResult, SchemaField
 
 logger = logging.getLogger(__name__)
 
+CONTEXT_FIELD_TYPES = ('number', 'string', 'object', 'array')
+
 
 def validate_schema(
     result: Dict[str, Any],
@@ -64,6 +66,159 @@ def _is_type_compatible(value: Any, expected_type: str) -> bool:
     return isinstance(value, expected_python_type)
 
 
+def check_quality(result: Dict[str, Any], schema: Dict[str, SchemaField]) -> List[str]:
+    """
+    Cheap plausibility checks beyond the schema (context_changes entries are
+    checked by validate_context_changes)
+
+    Args:
+        result: Generated data
+        schema: Expected schema definition
+
+    Returns:
+        Descriptions of the issues found
+    """
+    issues = []
+
+    for field_name, field_def in schema.items():
+        if field_def.type == 'string':
+            value = result.get(field_name)
+            if isinstance(value, str) and not value.strip():
+                issues.append(f"'{field_name}' is empty")
+
+    return issues
+
+
+def _is_context_value(value: Any, field_type: str) -> bool:
+    """Whether value is valid for a context field type (booleans are not numbers)"""
+    if field_type == 'number':
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    return _is_type_compatible(value, field_type)
+
+
+def _infer_context_type(value: Any) -> Optional[str]:
+    for field_type in CONTEXT_FIELD_TYPES:
+        if _is_context_value(value, field_type):
+            return field_type
+    return None
+
+
+def validate_context_changes(
+    result: Dict[str, Any],
+    context: Dict[str, Any],
+    max_fields: int
+) -> Tuple[Dict[str, Any], List[ValidationResult]]:
+    """
+    Validate and normalize result['context_changes'] against the current context
+
+    Repairs, applied to a copy of the result:
+    - a bare value is wrapped as {value, type, description}
+    - a missing type or description is taken from the current field (the
+      type of a new field is inferred from its value)
+    - changes equal to the current field, and removals of absent fields,
+      are dropped
+
+    Args:
+        result: Generated data
+        context: Current context fields
+        max_fields: Most context fields allowed once the changes are applied
+
+    Returns:
+        The result with normalized context_changes (result itself when there
+        is nothing to normalize), and errors for entries that cannot be
+        repaired (no value, unknown type, value not matching its type) and
+        for exceeding max_fields
+    """
+    changes = result.get('context_changes')
+    if not isinstance(changes, dict):
+        # A wrong type is reported by validate_schema
+        return result, []
+
+    from .openai_client import context_field_parts
+
+    errors = []
+    normalized = {}
+    added = removed = 0
+    for field_name, change in changes.items():
+        current = context.get(field_name)
+        current_value, current_type, current_description = (
+            context_field_parts(current) if current is not None else (None, None, None)
+        )
+        label = f"context_changes.{field_name}"
+
+        if change is None:
+            if current is not None:
+                normalized[field_name] = None
+                removed += 1
+            continue
+        if not field_name.strip():
+            errors.append(ValidationResult(
+                field="context_changes",
+                expected="non-empty field names",
+                received="empty name"
+            ))
+            continue
+
+        if not isinstance(change, dict):
+            change = {'value': change}
+        elif 'value' not in change:
+            errors.append(ValidationResult(
+                field=label,
+                expected="{value, type, description}",
+                received="object without value"
+            ))
+            continue
+
+        value = change['value']
+        field_type = change.get('type') or current_type or _infer_context_type(value)
+        if field_type is None:
+            # A new field whose value fits no context type (a boolean, null)
+            errors.append(ValidationResult(
+                field=f"{label}.value",
+                expected=" | ".join(CONTEXT_FIELD_TYPES),
+                received=type(value).__name__
+            ))
+            continue
+        if field_type not in CONTEXT_FIELD_TYPES:
+            errors.append(ValidationResult(
+                field=f"{label}.type",
+                expected=" | ".join(CONTEXT_FIELD_TYPES),
+                received=repr(field_type)
+            ))
+            continue
+        if not _is_context_value(value, field_type):
+            errors.append(ValidationResult(
+                field=f"{label}.value",
+                expected=field_type,
+                received=type(value).__name__
+            ))
+            continue
+
+        description = change.get('description') or current_description
+        unchanged = (value, field_type, description) == (current_value, current_type, current_description)
+        if current is not None and unchanged:
+            continue
+
+        entry = {'value': value, 'type': field_type}
+        if description:
+            entry['description'] = description
+        normalized[field_name] = entry
+        if current is None:
+            added += 1
+
+    field_count = len(context) + added - removed
+    if field_count > max_fields:
+        errors.append(ValidationResult(
+            field="context_changes",
+            expected=f"at most {max_fields} context fields after the changes",
+            received=f"{field_count} fields"
+        ))
+
+    if len(normalized) != len(changes):
+        logger.info("Dropped %d no-op or invalid context changes", len(changes) - len(normalized))
+    return {**result, 'context_changes': normalized}, errors
+
+
 def generate_fix_suggestion(errors: List[ValidationResult]) -> str:
     """Generate fix suggestion based on validation errors"""
     if not errors:
@@ -0,0 +1,77 @@
+# MessagePack content negotiation for the generation endpoints
+from typing import Any, Callable, Coroutine, Mapping, Optional
+
+import msgpack
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Media types accepted for MessagePack bodies
+MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"}
+# Scope key of the decoded MessagePack body
+_DECODED_BODY_KEY = "wire_format.decoded_body"
+
+
+def _media_type(header: Optional[str]) -> str:
+    return (header or "").split(";", 1)[0].strip().lower()
+
+
+def decoded_body(request: Request) -> Any:
+    """The decoded body of a MessagePack request, or None for other requests"""
+    return request.scope.get(_DECODED_BODY_KEY)
+
+
+def accepts_msgpack(request: Request) -> bool:
+    """Whether the client asked for a MessagePack response"""
+    accept = request.headers.get("accept", "")
+    return any(_media_type(part) in MSGPACK_MEDIA_TYPES for part in accept.split(","))
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+class MsgPackRoute(APIRoute):
+    """
+    Route that also accepts MessagePack request bodies
+
+    The body is decoded once and handed to FastAPI as the request's parsed
+    JSON, so validation is identical for both formats.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            if _media_type(request.headers.get("content-type")) in MSGPACK_MEDIA_TYPES:
+                body = await request.body()
+                try:
+                    decoded = msgpack.unpackb(body, raw=False) if body else None
+                except (msgpack.UnpackException, ValueError) as e:
+                    raise HTTPException(status_code=400, detail=f"Invalid MessagePack body ({type(e).__name__})")
+                # Present the request as JSON with its body already parsed
+                headers = [(name, value) for name, value in request.scope["headers"] if name != b"content-type"]
+                scope = {**request.scope, "headers": headers + [(b"content-type", b"application/json")]}
+                scope[_DECODED_BODY_KEY] = decoded
+                request = Request(scope, request.receive)
+                request._body = body
+                request._json = decoded
+            return await handler(request)
+
+        return route_handler
+
+
+def negotiate(request: Request, content: BaseModel, headers: Optional[Mapping[str, str]] = None) -> Any:
+    """Return content as MessagePack when the client accepts it, otherwise leave it to FastAPI"""
+    if not accepts_msgpack(request):
+        return content
+    response = MsgPackResponse(content.model_dump(mode="json"))
+    if headers:
+        for name, value in headers.items():
+            if name.lower() not in ("content-length", "content-type"):
+                response.headers[name] = value
+    return response
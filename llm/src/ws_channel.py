@@ -0,0 +1,218 @@
+# Multiplexed WebSocket channel for generation traffic
+#
+# Messages are JSON objects in text frames or MessagePack maps in binary frames;
+# replies to a request use the frame type the request arrived in.
+#
+# Client -> service:
+#   {"type": "generate", "id": ..., "request": {...}, "window": 64, "request_id": ...}
+#       Start a generation. request is the /generate_structured body; with
+#       "stream": true the content is sent as deltas. window (optional) is the
+#       number of deltas the service may send before waiting for credit.
+#   {"type": "credit", "id": ..., "credits": n}    Allow n more deltas
+#   {"type": "cancel", "id": ...}                  Stop a generation
+#
+# Service -> client:
+#   {"type": "delta", "id": ..., "content": "..."} Streamed content
+#   {"type": "end", "id": ...}                     Stream finished
+#   {"type": "result", "id": ..., "response": {...}}
+#       Final response (StructuredGenerationResponse), also sent for streaming
+#       requests rejected before generation (context mismatch, too large)
+#   {"type": "cancelled", "id": ...}
+#   {"type": "error", "id": ..., "error_code": ..., "message": ..., "details": [...]}
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Union
+
+import msgpack
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+
+from .fast_request import FastGenerationRequest, validate_request
+from .logging_config import new_request_id, request_id_var
+from .models import StructuredGenerationResponse
+from .scheduler import SchedulerRejected
+
+logger = logging.getLogger(__name__)
+
+Generate = Callable[[FastGenerationRequest], Awaitable[StructuredGenerationResponse]]
+OpenStream = Callable[
+    [FastGenerationRequest], Awaitable[Union[StructuredGenerationResponse, AsyncIterator[str]]]
+]
+
+
+class Exchange:
+    """One generation request in flight on a channel"""
+
+    __slots__ = ('exchange_id', 'binary', 'credits', 'credit_granted', 'task')
+
+    def __init__(self, exchange_id: Any, binary: bool, window: Optional[int]):
+        self.exchange_id = exchange_id
+        self.binary = binary
+        # None: no flow control
+        self.credits = window
+        self.credit_granted = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def grant(self, credits: int) -> None:
+        if self.credits is not None:
+            self.credits += credits
+            self.credit_granted.set()
+
+    async def take_credit(self) -> None:
+        """Wait until one more delta may be sent"""
+        if self.credits is None:
+            return
+        while self.credits <= 0:
+            self.credit_granted.clear()
+            await self.credit_granted.wait()
+        self.credits -= 1
+
+
+class GenerationChannel:
+    """Serves many concurrent, ID-tagged generation requests over one WebSocket"""
+
+    def __init__(self, websocket: WebSocket, generate: Generate, open_stream: OpenStream, max_in_flight: int):
+        """
+        Args:
+            websocket: The connection
+            generate: Runs a non-streaming request to its final response
+            open_stream: Starts a streaming request; returns the failure response or the content deltas
+            max_in_flight: Most requests in flight at once on this connection
+        """
+        self.websocket = websocket
+        self.generate = generate
+        self.open_stream = open_stream
+        self.max_in_flight = max_in_flight
+        self._exchanges: Dict[Any, Exchange] = {}
+        self._send_lock = asyncio.Lock()
+
+    async def serve(self) -> None:
+        """Accept the connection and dispatch its messages until it closes"""
+        await self.websocket.accept()
+        logger.info("Generation channel opened")
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                binary = message.get('bytes') is not None
+                try:
+                    payload = msgpack.unpackb(message['bytes'], raw=False) if binary else json.loads(message['text'])
+                except (msgpack.UnpackException, ValueError) as e:
+                    await self.send_error(None, binary, 'INVALID_MESSAGE', f"Undecodable message ({type(e).__name__})")
+                    continue
+                await self.dispatch(payload, binary)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for exchange in list(self._exchanges.values()):
+                exchange.task.cancel()
+            logger.info("Generation channel closed (%d requests cancelled)", len(self._exchanges))
+
+    async def dispatch(self, payload: Any, binary: bool) -> None:
+        if not isinstance(payload, dict):
+            await self.send_error(None, binary, 'INVALID_MESSAGE', "Messages must be objects")
+            return
+
+        message_type = payload.get('type')
+        exchange_id = payload.get('id')
+        if exchange_id is None or isinstance(exchange_id, (dict, list)):
+            await self.send_error(None, binary, 'INVALID_MESSAGE', "Messages need a string or number id")
+            return
+
+        if message_type == 'generate':
+            await self.start(exchange_id, payload, binary)
+        elif message_type == 'cancel':
+            exchange = self._exchanges.get(exchange_id)
+            if exchange:
+                exchange.task.cancel()
+        elif message_type == 'credit':
+            exchange = self._exchanges.get(exchange_id)
+            credits = payload.get('credits')
+            if exchange and isinstance(credits, int) and credits > 0:
+                exchange.grant(credits)
+        else:
+            await self.send_error(exchange_id, binary, 'INVALID_MESSAGE', f"Unknown message type: {message_type}")
+
+    async def start(self, exchange_id: Any, payload: Dict[str, Any], binary: bool) -> None:
+        if exchange_id in self._exchanges:
+            await self.send_error(exchange_id, binary, 'DUPLICATE_ID', "A request with this id is in flight")
+            return
+        if len(self._exchanges) >= self.max_in_flight:
+            await self.send_error(
+                exchange_id, binary, 'TOO_MANY_REQUESTS', f"At most {self.max_in_flight} requests may be in flight"
+            )
+            return
+        try:
+            request = validate_request(payload.get('request'))
+        except ValidationError as e:
+            await self.send_error(
+                exchange_id, binary, 'INVALID_REQUEST', "Request validation failed",
+                details=jsonable_encoder(e.errors(include_url=False))
+            )
+            return
+
+        window = payload.get('window')
+        exchange = Exchange(exchange_id, binary, window if isinstance(window, int) and window > 0 else None)
+        self._exchanges[exchange_id] = exchange
+        exchange.task = asyncio.create_task(self.run(exchange, request, payload.get('request_id')))
+
+    async def run(self, exchange: Exchange, request: FastGenerationRequest, request_id: Optional[str]) -> None:
+        """Serve one request to completion, cancellation or failure"""
+        request_id_var.set(request_id if isinstance(request_id, str) else new_request_id())
+        try:
+            if not request.stream:
+                response = await self.generate(request)
+                await self.send(exchange, {'type': 'result', 'response': response.model_dump(mode='json')})
+                return
+
+            deltas = await self.open_stream(request)
+            if isinstance(deltas, StructuredGenerationResponse):
+                await self.send(exchange, {'type': 'result', 'response': deltas.model_dump(mode='json')})
+                return
+            async for content in deltas:
+                await exchange.take_credit()
+                await self.send(exchange, {'type': 'delta', 'content': content})
+            await self.send(exchange, {'type': 'end'})
+
+        except asyncio.CancelledError:
+            logger.info("Channel request %s cancelled", exchange.exchange_id)
+            await self.send(exchange, {'type': 'cancelled'})
+        except SchedulerRejected as e:
+            logger.warning(f"Request rejected by scheduler: {e}")
+            await self.send_error(exchange.exchange_id, exchange.binary, e.error_code, str(e))
+        except Exception as e:
+            logger.exception(f"Channel request {exchange.exchange_id} failed: {e}")
+            await self.send_error(exchange.exchange_id, exchange.binary, 'API_ERROR', str(e))
+        finally:
+            self._exchanges.pop(exchange.exchange_id, None)
+
+    async def send(self, exchange: Exchange, message: Dict[str, Any]) -> None:
+        await self._send(dict(message, id=exchange.exchange_id), exchange.binary)
+
+    async def send_error(
+        self,
+        exchange_id: Any,
+        binary: bool,
+        error_code: str,
+        message: str,
+        details: Optional[list] = None
+    ) -> None:
+        error = {'type': 'error', 'id': exchange_id, 'error_code': error_code, 'message': message}
+        if details is not None:
+            error['details'] = details
+        await self._send(error, binary)
+
+    async def _send(self, message: Dict[str, Any], binary: bool) -> None:
+        # One frame at a time; awaiting the send applies the connection's backpressure
+        try:
+            async with self._send_lock:
+                if binary:
+                    await self.websocket.send_bytes(msgpack.packb(message, use_bin_type=True))
+                else:
+                    await self.websocket.send_text(json.dumps(message, ensure_ascii=False))
+        except (WebSocketDisconnect, RuntimeError):
+            # Connection gone: the receive loop cancels what is left
+            pass
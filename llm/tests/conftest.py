@@ -0,0 +1,9 @@
+"""Unit test setup: import the service as `src` without a live upstream"""
+
+import os
+import sys
+
+# The service configuration requires an API key at import time
+os.environ.setdefault("OPENAI_API_KEY", "unit-test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,64 @@
+"""Model cascade escalation"""
+
+import asyncio
+
+import pytest
+
+from src.cascade import ModelCascade
+
+
+def make_generate(outputs):
+    """Generation stub returning (or raising) outputs[model]; records the models called"""
+    calls = []
+
+    async def generate(model):
+        calls.append(model)
+        output = outputs[model]
+        if isinstance(output, Exception):
+            raise output
+        return output, f"usage-{model}"
+
+    return generate, calls
+
+
+def check(result):
+    return [] if result.get("ok") else ["not ok"]
+
+
+def test_first_accepted_tier_wins():
+    cascade = ModelCascade(["small", "large"])
+    generate, calls = make_generate({"small": {"ok": True}, "large": {"ok": True}})
+    result, usage = asyncio.run(cascade.run(generate, check))
+    assert (result, usage, calls) == ({"ok": True}, "usage-small", ["small"])
+    assert cascade.snapshot()["small"]["accepted"] == 1
+
+
+def test_escalates_on_failed_checks_and_errors():
+    cascade = ModelCascade(["small", "medium", "large"])
+    generate, calls = make_generate({
+        "small": {"ok": False},
+        "medium": ValueError("bad json"),
+        "large": {"ok": True}
+    })
+    result, usage = asyncio.run(cascade.run(generate, check))
+    assert usage == "usage-large"
+    assert calls == ["small", "medium", "large"]
+    stats = cascade.snapshot()
+    assert stats["small"]["rejections"] == {"checks": 1}
+    assert stats["medium"]["rejections"] == {"invalid_json": 1}
+    assert stats["large"]["hit_rate"] == 1.0
+
+
+def test_last_tier_result_is_returned_as_is():
+    cascade = ModelCascade(["small", "large"])
+    generate, _ = make_generate({"small": {"ok": False}, "large": {"ok": False}})
+    result, usage = asyncio.run(cascade.run(generate, check))
+    assert (result, usage) == ({"ok": False}, "usage-large")
+
+
+def test_last_tier_error_propagates():
+    cascade = ModelCascade(["small", "large"])
+    generate, _ = make_generate({"small": RuntimeError("down"), "large": RuntimeError("down")})
+    with pytest.raises(RuntimeError):
+        asyncio.run(cascade.run(generate, check))
+    assert cascade.snapshot()["large"]["rejections"] == {"error": 1}
@@ -0,0 +1,109 @@
+"""Circuit breaker and upstream failure classification of degraded mode"""
+
+import asyncio
+import time
+
+import openai
+import pytest
+
+from src.degraded import CircuitBreaker, is_upstream_failure, local_result
+from src.fast_request import FastContextField, FastGenerationRequest, FastSchemaField
+
+
+def upstream_error(cls, status_code=None):
+    """An OpenAI error without the HTTP request and response it normally wraps"""
+    error = cls.__new__(cls)
+    if status_code is not None:
+        error.status_code = status_code
+    return error
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record(False, 0.1)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, open_seconds=60, slow_seconds=0)
+    breaker.record(False, 0.1)
+    breaker.record(False, 0.1)
+    breaker.record(True, 0.1)
+    breaker.record(False, 0.1)
+    breaker.record(False, 0.1)
+    assert breaker.allow()
+
+    breaker.record(False, 0.1)
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.snapshot()['trips'] == 1
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker(failure_threshold=2, open_seconds=60, slow_seconds=1)
+    breaker.record(True, 5)
+    breaker.record(True, 5)
+    assert breaker.state == 'open'
+
+
+def test_half_open_probe_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=2, open_seconds=0.05, slow_seconds=0)
+    trip(breaker)
+    time.sleep(0.1)
+
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    # One probe at a time
+    assert not breaker.allow()
+
+    breaker.record(True, 0.1)
+    assert breaker.state == 'closed'
+    assert breaker.allow()
+
+
+def test_failed_probe_opens_again():
+    breaker = CircuitBreaker(failure_threshold=2, open_seconds=0.05, slow_seconds=0)
+    trip(breaker)
+    time.sleep(0.1)
+    assert breaker.allow()
+
+    breaker.record(False, 0.1)
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.snapshot()['trips'] == 2
+
+
+@pytest.mark.parametrize("error", [
+    upstream_error(openai.APIConnectionError),
+    upstream_error(openai.APITimeoutError),
+    upstream_error(openai.APIStatusError, 503),
+    upstream_error(openai.RateLimitError, 429),
+    asyncio.TimeoutError(),
+], ids=lambda error: type(error).__name__)
+def test_upstream_failures(error):
+    assert is_upstream_failure(error)
+
+
+@pytest.mark.parametrize("error", [
+    upstream_error(openai.BadRequestError, 400),
+    upstream_error(openai.AuthenticationError, 401),
+    ValueError("Invalid JSON response"),
+    KeyError("choices"),
+    TypeError("unsupported operand"),
+], ids=lambda error: type(error).__name__)
+def test_other_errors_are_not_upstream_failures(error):
+    assert not is_upstream_failure(error)
+
+
+def test_local_result_fills_the_schema_without_changes():
+    request = FastGenerationRequest(
+        prompt="Narrate the step",
+        context={"location": FastContextField(value="forest", type="string")},
+        schema={
+            "event_description": FastSchemaField(type="string", description="What happened"),
+            "context_changes": FastSchemaField(type="object", description="Changed fields"),
+        },
+        user_input="search for berries"
+    )
+    result = local_result(request)
+    assert result["context_changes"] == {}
+    assert "berries" in result["event_description"] and "forest" in result["event_description"]
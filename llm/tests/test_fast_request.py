@@ -0,0 +1,66 @@
+"""Decoded request objects match the documented request models"""
+
+import dataclasses
+import json
+
+import pytest
+from pydantic import TypeAdapter
+
+from src import models
+from src.fast_request import (
+    FastContextField, FastGenerationRequest, FastPreLogSummary, FastSchemaField, _inline_refs, decode_request
+)
+
+PAIRS = [
+    (FastContextField, models.ContextField),
+    (FastPreLogSummary, models.PreLogSummary),
+    (FastSchemaField, models.SchemaField),
+    (FastGenerationRequest, models.StructuredGenerationRequest),
+]
+
+
+def comparable_schema(schema):
+    """JSON schema with references inlined and titles dropped"""
+    def strip(node):
+        if isinstance(node, dict):
+            return {key: strip(value) for key, value in node.items() if key != 'title'}
+        if isinstance(node, list):
+            return [strip(item) for item in node]
+        return node
+    return strip(_inline_refs(schema, schema.get('$defs', {})))
+
+
+@pytest.mark.parametrize("fast, model", PAIRS, ids=lambda cls: cls.__name__)
+def test_fields_and_defaults_match(fast, model):
+    fast_fields = {
+        field.name: None if field.default is dataclasses.MISSING else field.default
+        for field in dataclasses.fields(fast)
+    }
+    model_fields = {
+        name: None if info.is_required() else info.default
+        for name, info in model.model_fields.items()
+    }
+    assert fast_fields == model_fields
+
+
+@pytest.mark.parametrize("fast, model", PAIRS, ids=lambda cls: cls.__name__)
+def test_schemas_match(fast, model):
+    fast_schema = comparable_schema(TypeAdapter(fast).json_schema())
+    model_schema = comparable_schema(model.model_json_schema())
+    fast_schema['properties'] = dict(sorted(fast_schema['properties'].items()))
+    model_schema['properties'] = dict(sorted(model_schema['properties'].items()))
+    assert fast_schema == model_schema
+
+
+def test_decodes_like_the_model():
+    body = {
+        "prompt": "p",
+        "context": {"health": {"value": 80, "type": "number", "description": "Health"}},
+        "schema": {"event_description": {"type": "string", "description": "d"}},
+        "pre_log_summary": {"summary": "s", "recent_events": ["e"]},
+        "user_input": "look",
+        "priority": "batch"
+    }
+    fast = decode_request(json.dumps(body).encode())
+    model = models.StructuredGenerationRequest(**body)
+    assert dataclasses.asdict(fast) == model.model_dump()
@@ -0,0 +1,82 @@
+"""Prompt size of the verbose and compact context encodings"""
+
+from src.openai_client import build_context_block, build_user_prompt
+from src.tokens import estimate_tokens
+from src.transcript import build_delta_prompt, snapshot_context
+
+
+def build_context(discoveries: int = 8):
+    context = {
+        "health": {"value": 85, "type": "number", "description": "Health"},
+        "energy": {"value": 70, "type": "number", "description": "Energy level"},
+        "location": {"value": "Crashed Spaceship", "type": "string", "description": "Current location"},
+        "inventory": {"value": ["medical kit", "flashlight"], "type": "array", "description": "Items carried"},
+        "ship_status": {
+            "value": {"hull": 35, "engine": "destroyed", "beacon": {"power": 5, "active": False}},
+            "type": "object",
+            "description": "Condition of the crashed spaceship"
+        },
+    }
+    for index in range(discoveries):
+        context[f"discovery_{index}"] = {
+            "value": {"name": f"Alien artifact {index}", "studied": index % 2 == 0},
+            "type": "object",
+            "description": f"Details about discovered artifact number {index}"
+        }
+    return context
+
+
+def changed_turn():
+    """Snapshots of two turns: energy and inventory changed, scanner added"""
+    context = build_context()
+    previous = snapshot_context(context)
+    context["energy"] = dict(context["energy"], value=60)
+    context["inventory"] = dict(context["inventory"], value=["medical kit"])
+    context["scanner"] = {"value": "charged", "type": "string", "description": "Handheld scanner state"}
+    return previous, snapshot_context(context)
+
+
+def test_compact_snapshot_is_smaller():
+    context = build_context()
+    verbose = build_user_prompt("Narrate.", context, user_input="look around", encoding="verbose")
+    compact = build_user_prompt("Narrate.", context, user_input="look around", encoding="compact")
+    assert estimate_tokens(compact) < estimate_tokens(verbose)
+
+
+def test_compact_snapshot_drops_redundant_descriptions():
+    block = build_context_block(build_context(0), "compact")
+    assert "health|85\n" in block
+    assert "energy|70|Energy level\n" in block
+
+
+def test_delta_turn_is_smaller_than_snapshot_turn():
+    previous, current = changed_turn()
+    snapshot = build_context_block(build_context(), "compact")
+    delta = build_delta_prompt(previous, current, user_input="look around", encoding="compact")
+    assert estimate_tokens(delta) * 4 < estimate_tokens(snapshot)
+
+
+def test_compact_delta_is_not_larger_than_verbose_delta():
+    previous, current = changed_turn()
+    verbose = build_delta_prompt(previous, current, user_input="look around", encoding="verbose")
+    compact = build_delta_prompt(previous, current, user_input="look around", encoding="compact")
+    assert estimate_tokens(compact) <= estimate_tokens(verbose)
+
+
+def test_delta_turn_has_no_column_legend():
+    previous, current = changed_turn()
+    delta = build_delta_prompt(previous, current, encoding="compact")
+    assert "(field|value|description)" not in delta
+    assert "Game state changes since last turn:\n" in delta
+
+
+def test_delta_turn_describes_only_new_or_changed_descriptions():
+    previous, current = changed_turn()
+    delta = build_delta_prompt(previous, current, encoding="compact")
+    assert "energy|60\n" in delta
+    assert 'inventory|["medical kit"]\n' in delta
+    assert "scanner|charged|Handheld scanner state\n" in delta
+
+    previous["energy"] = (70, "number", "Stamina")
+    delta = build_delta_prompt(previous, current, encoding="compact")
+    assert "energy|60|Energy level\n" in delta
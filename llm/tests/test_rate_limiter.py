@@ -0,0 +1,145 @@
+"""Adaptive upstream rate limiting"""
+
+import asyncio
+import time
+
+from src.rate_limiter import EndpointLimiter, RateLimiter, parse_duration
+
+HEADERS = {'x-ratelimit-remaining-requests': '100', 'x-ratelimit-reset-requests': '1s'}
+
+
+async def chunks(count):
+    for index in range(count):
+        yield index
+
+
+def test_parse_duration():
+    assert parse_duration("20ms") == 0.02
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("1h2m3.5s") == 3723.5
+    assert parse_duration("2") == 2
+    assert parse_duration("soon") is None
+
+
+def test_success_increases_limits_additively():
+    limiter = EndpointLimiter('model', 4, 8, 1000, 1)
+
+    async def run():
+        await limiter.acquire(100)
+        limiter.release(100, HEADERS)
+
+    asyncio.run(run())
+    assert limiter.concurrency_limit == 4.25
+    assert limiter.token_limit > 1000
+    assert limiter.in_flight == 0
+
+
+def test_increase_is_capped():
+    limiter = EndpointLimiter('model', 8, 8, 1000, 1)
+
+    async def run():
+        for _ in range(10):
+            await limiter.acquire(10)
+            limiter.release(10, HEADERS)
+
+    asyncio.run(run())
+    assert limiter.concurrency_limit == 8
+
+
+def test_throttling_halves_limits_and_blocks():
+    limiter = EndpointLimiter('model', 4, 8, 1000, 1)
+
+    async def run():
+        await limiter.acquire(100)
+        limiter.release(100, {'retry-after': '0.2'}, throttled=True)
+
+    asyncio.run(run())
+    assert limiter.concurrency_limit == 2
+    assert limiter.token_limit == 500
+    assert limiter.throttled == 1
+    assert 0.1 < limiter.blocked_until - time.monotonic() <= 0.2
+
+
+def test_requests_are_held_while_blocked():
+    limiter = EndpointLimiter('model', 4, 8, 1000, 1)
+    limiter.blocked_until = time.monotonic() + 0.1
+
+    async def run():
+        started = time.monotonic()
+        await limiter.acquire(10)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.09
+    assert limiter.held == 1
+
+
+def test_requests_above_the_limit_wait_for_a_release():
+    limiter = EndpointLimiter('model', 1, 8, 1000, 1)
+
+    async def run():
+        await limiter.acquire(10)
+        second = asyncio.ensure_future(limiter.acquire(10))
+        await asyncio.sleep(0.01)
+        assert not second.done()
+        limiter.release(10)
+        await asyncio.wait_for(second, 0.5)
+
+    asyncio.run(run())
+    assert limiter.in_flight == 1
+
+
+def test_held_stream_releases_when_consumed():
+    limiter = EndpointLimiter('model', 4, 8, 1000, 1)
+    rate_limiter = RateLimiter(4, 8, 1000, 1, max_models=4, ttl_seconds=60)
+
+    async def run():
+        await limiter.acquire(10)
+        stream = rate_limiter.hold_stream(limiter, 10, chunks(3), HEADERS)
+        return [chunk async for chunk in stream]
+
+    assert asyncio.run(run()) == [0, 1, 2]
+    assert limiter.in_flight == 0
+
+
+def test_held_stream_releases_when_closed_before_iteration():
+    limiter = EndpointLimiter('model', 4, 8, 1000, 1)
+    rate_limiter = RateLimiter(4, 8, 1000, 1, max_models=4, ttl_seconds=60)
+
+    async def run():
+        await limiter.acquire(10)
+        stream = rate_limiter.hold_stream(limiter, 10, chunks(3), HEADERS)
+        assert limiter.in_flight == 1
+        await stream.aclose()
+        await stream.aclose()
+
+    asyncio.run(run())
+    assert limiter.in_flight == 0
+    assert limiter.in_flight_tokens == 0
+
+
+def test_held_stream_releases_when_the_consumer_is_cancelled():
+    limiter = EndpointLimiter('model', 4, 8, 1000, 1)
+    rate_limiter = RateLimiter(4, 8, 1000, 1, max_models=4, ttl_seconds=60)
+
+    async def slow():
+        await asyncio.sleep(10)
+        yield 0
+
+    async def run():
+        await limiter.acquire(10)
+        stream = rate_limiter.hold_stream(limiter, 10, slow(), HEADERS)
+        consumer = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+
+    asyncio.run(run())
+    assert limiter.in_flight == 0
+
+
+def test_limiters_are_bounded():
+    rate_limiter = RateLimiter(4, 8, 1000, 1, max_models=2, ttl_seconds=60)
+    for model in ("a", "b", "c"):
+        rate_limiter.limiter(model)
+    assert set(rate_limiter.snapshot()) == {"b", "c"}
+    assert rate_limiter.limiter("c") is rate_limiter.limiter("c")
@@ -0,0 +1,72 @@
+"""Response cache disk tier"""
+
+import asyncio
+import os
+
+from src import openai_client, openai_service
+from src.fast_request import FastContextField, FastGenerationRequest, FastSchemaField
+from src.response_cache import DiskCache, ResponseCache
+from src.rules import RuleEngine
+
+SURVIVAL_RULES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rules", "survival.json")
+
+
+def test_disk_tier_survives_a_new_memory_tier(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = ResponseCache(memory_entries=10, ttl_seconds=60, disk=DiskCache.open(path, 1 << 20, 60))
+    asyncio.run(first.set("k", {"event_description": "ok"}))
+
+    second = ResponseCache(memory_entries=10, ttl_seconds=60, disk=DiskCache.open(path, 1 << 20, 60))
+    assert asyncio.run(second.get("k")) == {"event_description": "ok"}
+
+
+def test_snapshot_reports_the_disk_tier(tmp_path):
+    cache = ResponseCache(
+        memory_entries=10, ttl_seconds=60, disk=DiskCache.open(str(tmp_path / "cache.sqlite3"), 1 << 20, 60)
+    )
+    asyncio.run(cache.set("k", {"event_description": "ok"}))
+    snapshot = asyncio.run(cache.snapshot())
+    assert snapshot["memory_entries"] == 1
+    assert snapshot["disk"]["entries"] == 1
+
+
+def test_unusable_path_falls_back_to_memory(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    assert DiskCache.open(str(blocker / "cache.sqlite3"), 1 << 20, 60) is None
+
+
+def test_cache_hit_gets_the_rule_changes_of_its_own_request(monkeypatch):
+    calls = []
+
+    async def generate_structured(**kwargs):
+        calls.append(kwargs)
+        return {"event_description": "You rest.", "context_changes": {}}, None
+
+    monkeypatch.setattr(openai_client, "generate_structured", generate_structured)
+    monkeypatch.setattr(openai_service, "response_cache", ResponseCache(memory_entries=10, ttl_seconds=60))
+    monkeypatch.setattr(openai_service, "rule_engine", RuleEngine.load(SURVIVAL_RULES))
+    monkeypatch.setattr(openai_service, "similarity_cache", None)
+
+    def request(hunger, elapsed_seconds):
+        return FastGenerationRequest(
+            prompt="Narrate the step",
+            context={"hunger": FastContextField(value=hunger, type="number", description="Hunger")},
+            schema={
+                "event_description": FastSchemaField(type="string", description="What happened"),
+                "context_changes": FastSchemaField(type="object", description="Changed fields"),
+            },
+            user_input="rest",
+            elapsed_seconds=elapsed_seconds
+        )
+
+    # Already at the maximum: no rule change, cached as is
+    first = asyncio.run(openai_service.run_generation(request(100, 3600)))
+    assert first.result["context_changes"] == {}
+
+    # Same context once the rules ran, so it hits the entry of the first request
+    second = asyncio.run(openai_service.run_generation(request(96, 3600)))
+    assert second.message == "Generation completed (cached)"
+    assert second.result["context_changes"] == {"hunger": {"value": 100, "type": "number", "description": "Hunger"}}
+    assert len(calls) == 1
+    assert first.result["context_changes"] == {}
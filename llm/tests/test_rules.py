@@ -0,0 +1,96 @@
+"""Context rule application and merging"""
+
+import os
+
+import pytest
+
+from src.fast_request import FastContextField
+from src.rules import ContextRule, RuleEngine
+
+SURVIVAL_RULES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rules", "survival.json")
+
+
+def field(value, field_type="number", description=None):
+    return FastContextField(value=value, type=field_type, description=description)
+
+
+def test_rule_drifts_per_hour_and_per_step():
+    rule = ContextRule({"field": "hunger", "per_hour": 4, "per_step": 1})
+    assert rule.apply(10, 1800) == 13
+    assert rule.apply(10.5, 0) == 11.5
+
+
+def test_rule_clamps_to_bounds():
+    rule = ContextRule({"field": "energy", "per_hour": -3, "min": 0, "max": 100})
+    assert rule.apply(2, 3600) == 0
+    assert ContextRule({"field": "hunger", "per_hour": 4, "max": 100}).apply(99, 3600) == 100
+
+
+def test_rule_keeps_integers_integral_when_possible():
+    rule = ContextRule({"field": "thirst", "per_hour": 6})
+    assert isinstance(rule.apply(10, 3600), int)
+    assert rule.apply(10, 600) == 11
+    assert rule.apply(10, 60) == 10.1
+
+
+def test_rule_needs_a_field_name():
+    with pytest.raises(ValueError):
+        ContextRule({"per_hour": 1})
+
+
+def test_engine_applies_rules_to_numeric_fields_only():
+    engine = RuleEngine([
+        ContextRule({"field": "hunger", "per_hour": 4}),
+        ContextRule({"field": "mood", "per_hour": 1}),
+        ContextRule({"field": "alive", "per_hour": 1}),
+        ContextRule({"field": "thirst", "per_hour": 6}),
+    ])
+    context = {
+        "hunger": field(10, description="Hunger"),
+        "mood": field("calm", "string"),
+        "alive": field(True),
+    }
+
+    updated, changes = engine.apply(context, 3600)
+
+    assert changes == {"hunger": {"value": 14, "type": "number", "description": "Hunger"}}
+    assert updated["hunger"].value == 14
+    assert updated["mood"] is context["mood"] and updated["alive"] is context["alive"]
+    assert context["hunger"].value == 10
+    assert engine.managed_fields(context) == ["hunger", "mood", "alive"]
+
+
+def test_engine_skips_fields_that_do_not_change():
+    engine = RuleEngine([ContextRule({"field": "energy", "per_hour": -3, "min": 0})])
+    updated, changes = engine.apply({"energy": field(0)}, 3600)
+    assert changes == {}
+    _, changes = engine.apply({"energy": field(50)}, None)
+    assert changes == {}
+    assert engine.snapshot()["steps"] == 2
+
+
+def test_merge_keeps_changes_made_by_the_model():
+    engine = RuleEngine([])
+    result = {"context_changes": {"hunger": {"value": 0, "type": "number"}}}
+    engine.merge(result, {
+        "hunger": {"value": 14, "type": "number"},
+        "thirst": {"value": 16, "type": "number"},
+    })
+    assert result["context_changes"] == {
+        "hunger": {"value": 0, "type": "number"},
+        "thirst": {"value": 16, "type": "number"},
+    }
+    assert engine.snapshot()["model_overrides"] == 1
+
+
+def test_merge_ignores_results_without_context_changes():
+    result = {"event_description": "ok"}
+    RuleEngine([]).merge(result, {"hunger": {"value": 14, "type": "number"}})
+    assert result == {"event_description": "ok"}
+
+
+def test_survival_rules_load():
+    engine = RuleEngine.load(SURVIVAL_RULES)
+    assert [rule.field for rule in engine.rules] == ["hunger", "thirst", "energy"]
+    _, changes = engine.apply({"hunger": field(50), "energy": field(50)}, 7200)
+    assert changes["hunger"]["value"] == 58 and changes["energy"]["value"] == 44
@@ -0,0 +1,124 @@
+"""Fair scheduling of generations"""
+
+import asyncio
+
+import pytest
+
+from src.scheduler import FairScheduler, SchedulerRejected
+
+
+async def run_in_order(scheduler, requests):
+    """Queue requests behind a held slot; return the order they were granted in"""
+    order = []
+
+    async def generation(name, key, priority):
+        async with scheduler.slot(key, priority):
+            order.append(name)
+
+    await scheduler.acquire(None)
+    tasks = []
+    for name, key, priority in requests:
+        tasks.append(asyncio.ensure_future(generation(name, key, priority)))
+        # Fix the arrival order
+        await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_keys_are_served_fairly():
+    scheduler = FairScheduler(max_concurrency=1, key_rate=0, key_burst=10, max_keys=100, max_queue_seconds=1)
+    requests = [("a1", "a", "interactive"), ("a2", "a", "interactive"), ("a3", "a", "interactive"),
+                ("b1", "b", "interactive"), ("c1", "c", "interactive")]
+    order = asyncio.run(run_in_order(scheduler, requests))
+    assert order == ["a1", "b1", "c1", "a2", "a3"]
+
+
+def test_weighted_keys_get_a_larger_share():
+    scheduler = FairScheduler(
+        max_concurrency=1, key_rate=0, key_burst=10, max_keys=100, max_queue_seconds=1, weights={"a": 2}
+    )
+    requests = [(f"a{index}", "a", "interactive") for index in range(1, 5)]
+    requests += [("b1", "b", "interactive"), ("b2", "b", "interactive")]
+    order = asyncio.run(run_in_order(scheduler, requests))
+    assert order == ["a1", "b1", "a2", "a3", "b2", "a4"]
+
+
+def test_weights_must_be_positive():
+    with pytest.raises(ValueError):
+        FairScheduler(max_concurrency=1, key_rate=0, key_burst=10, max_keys=100, max_queue_seconds=1, weights={"a": 0})
+
+
+def test_higher_priority_classes_go_first():
+    scheduler = FairScheduler(max_concurrency=1, key_rate=0, key_burst=10, max_keys=100, max_queue_seconds=1)
+    requests = [("batch", "a", "batch"), ("background", "b", "background"), ("interactive", "c", "interactive")]
+    order = asyncio.run(run_in_order(scheduler, requests))
+    assert order == ["interactive", "background", "batch"]
+
+
+def test_queue_timeout():
+    scheduler = FairScheduler(max_concurrency=1, key_rate=0, key_burst=10, max_keys=100, max_queue_seconds=0.05)
+
+    async def run():
+        await scheduler.acquire("a")
+        with pytest.raises(SchedulerRejected) as rejected:
+            await scheduler.acquire("b")
+        assert rejected.value.error_code == "QUEUE_TIMEOUT"
+        scheduler.release()
+
+    asyncio.run(run())
+    assert scheduler.running == 0
+    assert scheduler.rejected == {"QUEUE_TIMEOUT": 1}
+
+
+def test_timed_out_waiter_does_not_take_a_slot():
+    scheduler = FairScheduler(max_concurrency=1, key_rate=0, key_burst=10, max_keys=100, max_queue_seconds=0.05)
+
+    async def run():
+        await scheduler.acquire("a")
+        with pytest.raises(SchedulerRejected):
+            await scheduler.acquire("b")
+        scheduler.release()
+        await asyncio.wait_for(scheduler.acquire("c"), 0.5)
+
+    asyncio.run(run())
+    assert scheduler.running == 1
+
+
+def test_key_rate_limit():
+    scheduler = FairScheduler(max_concurrency=10, key_rate=1, key_burst=2, max_keys=100, max_queue_seconds=1)
+
+    async def run():
+        await scheduler.acquire("a")
+        await scheduler.acquire("a")
+        with pytest.raises(SchedulerRejected) as rejected:
+            await scheduler.acquire("a")
+        assert rejected.value.error_code == "RATE_LIMITED"
+        await scheduler.acquire("b")
+
+    asyncio.run(run())
+
+
+def test_unknown_priority_is_rejected():
+    scheduler = FairScheduler(max_concurrency=1, key_rate=0, key_burst=10, max_keys=100, max_queue_seconds=1)
+    with pytest.raises(SchedulerRejected) as rejected:
+        asyncio.run(scheduler.acquire("a", "urgent"))
+    assert rejected.value.error_code == "INVALID_PRIORITY"
+
+
+def test_idle_slots_and_queued():
+    scheduler = FairScheduler(max_concurrency=2, key_rate=0, key_burst=10, max_keys=100, max_queue_seconds=1)
+
+    async def run():
+        await scheduler.acquire("a")
+        assert scheduler.idle_slots() == 1
+        await scheduler.acquire("b")
+        waiter = asyncio.ensure_future(scheduler.acquire("c"))
+        await asyncio.sleep(0)
+        assert scheduler.queued() == 1
+        assert scheduler.idle_slots() == 0
+        scheduler.release()
+        await waiter
+        assert scheduler.queued() == 0
+
+    asyncio.run(run())
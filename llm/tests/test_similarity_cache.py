@@ -0,0 +1,72 @@
+"""Near-duplicate input cache matching"""
+
+import pytest
+
+from src.config import SIMILARITY_CACHE_THRESHOLD
+from src.similarity_cache import SimilarityCache, meaning_tokens, ngram_vector, normalize_input
+
+GROUP = "0123456789abcdef0123456789abcdef"
+RESULT = {"event_description": "ok"}
+
+
+def make_cache(threshold=SIMILARITY_CACHE_THRESHOLD):
+    return SimilarityCache(
+        max_entries=16, dimensions=512, ngram=3, threshold=threshold, ttl_seconds=60, sample_rate=1.0
+    )
+
+
+def score(first, second):
+    return float(ngram_vector(normalize_input(first), 3, 512) @ ngram_vector(normalize_input(second), 3, 512))
+
+
+def test_normalize_keeps_apostrophes():
+    assert normalize_input("  Don’t OPEN the chest!! ") == "don't open the chest"
+    assert meaning_tokens("don't give 5 coins") == {"don't", "5"}
+
+
+def test_case_and_punctuation_are_an_exact_hit():
+    cache = make_cache()
+    cache.set(GROUP, "Go north.", RESULT)
+    assert cache.get(GROUP, "go  NORTH") is RESULT
+    assert cache.snapshot()["exact_hits"] == 1
+
+
+@pytest.mark.parametrize("stored, query", [
+    ("open the chest", "don't open the chest"),
+    ("don't open the chest", "open the chest"),
+    ("give 5 coins", "give 50 coins"),
+    ("talk to the old man", "talk to the old woman"),
+])
+def test_inputs_with_another_meaning_miss(stored, query):
+    cache = make_cache()
+    cache.set(GROUP, stored, RESULT)
+    assert cache.get(GROUP, query) is None
+
+
+def test_differing_negation_or_number_misses_even_when_very_similar():
+    cache = make_cache(threshold=0.5)
+    cache.set(GROUP, "give 5 coins to the merchant", RESULT)
+    cache.set(GROUP, "never trust the merchant", RESULT)
+    assert cache.get(GROUP, "give 50 coins to the merchant") is None
+    assert cache.get(GROUP, "trust the merchant") is None
+
+
+def test_hit_and_miss_at_the_threshold():
+    stored, query = "talk to the merchant about the sword", "talk to the merchant about the swords"
+    similarity = score(stored, query)
+    assert SIMILARITY_CACHE_THRESHOLD <= similarity < 1
+
+    cache = make_cache(threshold=similarity - 1e-4)
+    cache.set(GROUP, stored, RESULT)
+    assert cache.get(GROUP, query) is RESULT
+    assert cache.snapshot()["similar_match_samples"][0]["matched"] == stored
+
+    cache = make_cache(threshold=similarity + 1e-4)
+    cache.set(GROUP, stored, RESULT)
+    assert cache.get(GROUP, query) is None
+
+
+def test_other_groups_do_not_match():
+    cache = make_cache()
+    cache.set(GROUP, "go north", RESULT)
+    assert cache.get("f" * 32, "go north") is None
@@ -0,0 +1,119 @@
+"""Speculative pre-generation: input prediction, serving and expiry"""
+
+import asyncio
+import time
+
+from src.fast_request import FastContextField, FastGenerationRequest, FastSchemaField
+from src.models import StructuredGenerationResponse
+from src.speculation import InputFrequencyModel, Speculator, canonical_input
+
+SCHEMA = {
+    "event_description": FastSchemaField(type="string", description="What happened"),
+    "context_changes": FastSchemaField(type="object", description="Changed fields"),
+}
+RESULT = {
+    "event_description": "You walk north.",
+    "context_changes": {"location": {"value": "forest", "type": "string"}},
+}
+
+
+def make_model(min_count=1):
+    return InputFrequencyModel(max_inputs=100, max_sessions=10, ttl_seconds=60, min_count=min_count)
+
+
+def make_speculator(ttl_seconds=60):
+    generated = []
+
+    async def generate(request):
+        generated.append(request.user_input)
+        return StructuredGenerationResponse(success=True, message="ok", result={"event_description": request.user_input})
+
+    speculator = Speculator(
+        generate=generate,
+        scheduler=None,
+        model=make_model(),
+        top_k=1,
+        max_concurrency=2,
+        reserve_slots=0,
+        rate_per_minute=60,
+        max_entries=10,
+        ttl_seconds=ttl_seconds
+    )
+    return speculator, generated
+
+
+def step(user_input, location="camp"):
+    return FastGenerationRequest(
+        prompt="Narrate the step",
+        context={"location": FastContextField(value=location, type="string")},
+        schema=SCHEMA,
+        user_input=user_input,
+        session_id="s1"
+    )
+
+
+async def speculate(speculator, request, result):
+    speculator.after_step(request, result)
+    await asyncio.gather(*speculator._tasks)
+
+
+def test_model_predicts_inputs_seen_often_enough():
+    model = make_model(min_count=2)
+    model.record("a", "look")
+    model.record("b", "north")
+    model.record("b", "north")
+    assert model.predict("a", 2) == ["north"]
+
+
+def test_model_prefers_the_sessions_own_inputs():
+    model = make_model()
+    for _ in range(3):
+        model.record("a", "north")
+    model.record("b", "rest")
+    model.record("b", "rest")
+    assert model.predict("b", 1) == ["rest"]
+    assert model.predict("a", 1) == ["north"]
+
+
+def test_canonical_input_ignores_case_and_spacing_only():
+    assert canonical_input("  Go  North ") == "go north"
+    assert canonical_input("don't go!") == "don't go!"
+    assert canonical_input(None) == ""
+
+
+def test_prediction_is_generated_for_the_next_context_and_served_once():
+    speculator, generated = make_speculator()
+    asyncio.run(speculate(speculator, step("Go North"), RESULT))
+
+    assert generated == ["go north"]
+    # The next step holds the context after the changes of the first
+    assert speculator.take(step("go  north", location="forest")) == {"event_description": "go north"}
+    assert speculator.take(step("go north", location="forest")) is None
+    assert speculator.snapshot()["hits"] == 1
+
+
+def test_prediction_for_another_context_is_not_served():
+    speculator, _ = make_speculator()
+    asyncio.run(speculate(speculator, step("go north"), RESULT))
+    assert speculator.take(step("go north", location="camp")) is None
+
+
+def test_prediction_expires():
+    speculator, _ = make_speculator(ttl_seconds=0.05)
+    asyncio.run(speculate(speculator, step("go north"), RESULT))
+    time.sleep(0.1)
+    assert speculator.take(step("go north", location="forest")) is None
+    assert speculator.snapshot()["misses"] == 1
+
+
+def test_transcript_sessions_are_not_speculated(monkeypatch):
+    from src import openai_service
+
+    speculator, _ = make_speculator()
+    monkeypatch.setattr(openai_service, "speculator", speculator)
+    monkeypatch.setattr(openai_service, "SESSION_TRANSCRIPT_ENABLED", False)
+    assert openai_service.speculates(step("go north"))
+
+    # A speculative prompt carries no transcript, and serving one would skip the transcript turn
+    monkeypatch.setattr(openai_service, "SESSION_TRANSCRIPT_ENABLED", True)
+    assert not openai_service.speculates(step("go north"))
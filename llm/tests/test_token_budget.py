@@ -0,0 +1,38 @@
+"""Adaptive max_tokens"""
+
+from src.token_budget import TokenBudget
+
+
+def test_limit_is_max_tokens_until_enough_samples():
+    budget = TokenBudget(
+        max_tokens=2000, min_tokens=100, percentile=0.9, margin_tokens=50,
+        window=10, min_samples=5, max_keys=3, ttl_seconds=60
+    )
+    for _ in range(4):
+        budget.record("k", 300)
+    assert budget.limit("k") == 2000
+    budget.record("k", 300)
+    assert budget.limit("k") == 350
+
+
+def test_limit_is_clamped():
+    budget = TokenBudget(
+        max_tokens=2000, min_tokens=100, percentile=0.9, margin_tokens=50,
+        window=10, min_samples=5, max_keys=3, ttl_seconds=60
+    )
+    for _ in range(5):
+        budget.record("low", 10)
+        budget.record("high", 5000)
+    assert budget.limit("low") == 100
+    assert budget.limit("high") == 2000
+
+
+def test_keys_are_bounded():
+    budget = TokenBudget(
+        max_tokens=2000, min_tokens=100, percentile=0.9, margin_tokens=50,
+        window=10, min_samples=5, max_keys=3, ttl_seconds=60
+    )
+    for index in range(10):
+        budget.record(f"model-{index}", 300)
+    assert len(budget.snapshot()) == 3
+    assert set(budget.snapshot()) == {"model-7", "model-8", "model-9"}
@@ -0,0 +1,19 @@
+"""Rolling usage statistics"""
+
+from src.usage_stats import UsageStats
+
+
+def test_models_are_bounded():
+    stats = UsageStats(windows=[60], max_samples=10, max_sessions=10, max_models=2, model_ttl_seconds=60)
+    for model in ("a", "b", "c"):
+        stats.record(model, prompt_tokens=100, completion_tokens=10)
+
+    models = stats.query()["60s"]["models"]
+    assert sorted(models) == ["b", "c"]
+    assert models["c"]["prompt_tokens"] == 100
+
+
+def test_idle_models_expire():
+    stats = UsageStats(windows=[60], max_samples=10, max_sessions=10, max_models=2, model_ttl_seconds=0)
+    stats.record("a", prompt_tokens=100, completion_tokens=10)
+    assert stats.query()["60s"]["models"] == {}
@@ -0,0 +1,85 @@
+"""Validation and normalization of context_changes"""
+
+import copy
+
+from src.fast_request import FastContextField
+from src.validator import validate_context_changes
+
+CONTEXT = {
+    "hunger": FastContextField(value=40, type="number", description="Hunger"),
+    "location": FastContextField(value="camp", type="string", description="Where the player is"),
+}
+
+
+def normalize(changes, context=CONTEXT, max_fields=10):
+    return validate_context_changes({"event_description": "ok", "context_changes": changes}, context, max_fields)
+
+
+def test_bare_value_is_wrapped_with_the_current_type_and_description():
+    result, errors = normalize({"hunger": 45})
+    assert errors == []
+    assert result["context_changes"] == {"hunger": {"value": 45, "type": "number", "description": "Hunger"}}
+
+
+def test_type_of_a_new_field_is_inferred():
+    result, errors = normalize({"torch": "lit", "arrows": {"value": 12}, "bag": ["rope"]})
+    assert errors == []
+    assert result["context_changes"] == {
+        "torch": {"value": "lit", "type": "string"},
+        "arrows": {"value": 12, "type": "number"},
+        "bag": {"value": ["rope"], "type": "array"},
+    }
+
+
+def test_no_op_changes_and_absent_removals_are_dropped():
+    result, errors = normalize({"hunger": 40, "location": {"value": "camp"}, "ghost": None, "hunger_": None})
+    assert errors == []
+    assert result["context_changes"] == {}
+
+    result, _ = normalize({"location": None})
+    assert result["context_changes"] == {"location": None}
+
+
+def test_type_mismatch_is_reported():
+    _, errors = normalize({"hunger": "starving"})
+    assert [(error.field, error.expected, error.received) for error in errors] == [
+        ("context_changes.hunger.value", "number", "str")
+    ]
+
+    _, errors = normalize({"mood": {"value": 1, "type": "feeling"}})
+    assert errors[0].field == "context_changes.mood.type"
+
+
+def test_value_without_a_context_type_reports_its_own_type():
+    _, errors = normalize({"door_open": True})
+    assert [(error.field, error.received) for error in errors] == [("context_changes.door_open.value", "bool")]
+
+
+def test_object_without_value_is_reported():
+    _, errors = normalize({"hunger": {"type": "number"}})
+    assert errors[0].received == "object without value"
+
+
+def test_field_limit_counts_additions_and_removals():
+    _, errors = normalize({"torch": "lit", "rope": "long"}, max_fields=3)
+    assert [error.field for error in errors] == ["context_changes"]
+    assert errors[0].received == "4 fields"
+
+    _, errors = normalize({"torch": "lit", "rope": "long", "location": None}, max_fields=3)
+    assert errors == []
+
+
+def test_callers_result_is_left_unchanged():
+    original = {"event_description": "ok", "context_changes": {"hunger": 45, "location": "camp"}}
+    before = copy.deepcopy(original)
+
+    result, _ = validate_context_changes(original, CONTEXT, 10)
+
+    assert original == before
+    assert result is not original
+    assert result["context_changes"] == {"hunger": {"value": 45, "type": "number", "description": "Hunger"}}
+
+
+def test_result_without_change_object_is_returned_as_is():
+    original = {"event_description": "ok", "context_changes": "none"}
+    assert validate_context_changes(original, CONTEXT, 10) == (original, [])